@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+"""
+Times diff_timelines() over a simulated feed cycle: every station's new
+TAF compared against its previous one.
+
+Usage: python benchmarks/diff_timelines.py [number of stations]
+"""
+
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+
+import pytaf
+
+
+OLD = """TAF KIAH 230259Z 2303/2406 16010KT P6SM VCSH FEW028 SCT050 BKN250 FM230900
+  18007KT P6SM -RA VCTS SCT015 BKN035CB
+ TEMPO 2311/2314 TSRA FM231600 32010KT P6SM SCT250 FM240000
+  34004KT P6SM SKC="""
+
+NEW = """TAF KIAH 230559Z 2306/2406 16010KT P6SM VCSH FEW028 SCT050 BKN250 FM230900
+  18007KT P6SM -RA VCTS SCT015 BKN008CB
+ TEMPO 2311/2314 TSRA FM231600 32010KT P6SM SCT250 FM240000
+  34004KT P6SM SKC="""
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    old = pytaf.Decoder(pytaf.TAF(OLD), datetime(2016, 11, 23, 2, 59))
+    new = pytaf.Decoder(pytaf.TAF(NEW), datetime(2016, 11, 23, 5, 59))
+
+    started = time.perf_counter()
+    for i in range(count):
+        pytaf.diff_timelines(old, new)
+    elapsed = time.perf_counter() - started
+
+    print("stations:  %d" % count)
+    print("elapsed:   %.3f s (%.1f us per station)" % (elapsed, 1e6 * elapsed / count))
+
+
+if __name__ == "__main__":
+    main()
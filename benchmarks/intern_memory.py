@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""
+Measures heap retained by parsed and decoded TAFs with and without
+string interning of parsed values and feature keys.
+
+Usage: python benchmarks/intern_memory.py [number of reports]
+
+Every report is built as a fresh string object, as it would be when read
+from a feed or an archive, so without interning each parsed group keeps
+its own copies of ICAO codes, layer codes, units and numeric substrings.
+"""
+
+import os
+import sys
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+
+import pytaf
+import pytaf.taf
+import pytaf.tafdecoder
+
+
+SAMPLE = """TAF KIAH 230259Z 2303/2406 16010KT P6SM VCSH FEW028 SCT050 BKN250 FM230900
+ 18007KT P6SM -RA VCTS SCT015 BKN035CB
+TEMPO 2311/2314 TSRA FM231600 32010KT P6SM SCT250 FM240000
+ 34004KT P6SM SKC="""
+
+STATIONS = ["KIAH", "KDEN", "KMSP", "KEWR", "KORD", "KATL", "KSEA", "KBOS"]
+
+
+def build(count):
+    result = []
+    for i in range(count):
+        # Fresh string objects for every report
+        raw = SAMPLE.replace("KIAH", STATIONS[i % len(STATIONS)]) + " " * (i % 3)
+        t = pytaf.TAF(raw)
+        result.append((t, pytaf.Decoder(t, datetime(2016, 11, 23, 2, 59))))
+    return result
+
+
+def measure(count):
+    tracemalloc.start()
+    kept = build(count)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return current
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    interned = measure(count)
+
+    identity = lambda s: s
+    pytaf.taf._intern = identity
+    pytaf.tafdecoder._intern = identity
+    pytaf.tafdecoder._feature_keys.clear()
+    plain = measure(count)
+
+    print("reports:            %d" % count)
+    print("without interning:  %.1f KiB (%.0f bytes/report)" % (plain / 1024.0, plain / float(count)))
+    print("with interning:     %.1f KiB (%.0f bytes/report)" % (interned / 1024.0, interned / float(count)))
+    print("saved:              %.1f%%" % (100.0 * (plain - interned) / plain))
+
+
+if __name__ == "__main__":
+    main()
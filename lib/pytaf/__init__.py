@@ -1,3 +1,14 @@
 import re
 from .taf import TAF, MalformedTAF
-from .tafdecoder import Decoder, DecodeError
+from .tafdecoder import Decoder, DecodeError, iter_decode_tafs, FragmentCache, fragment_cache
+from .archive import Archive, ArchiveError
+from .dedup import Deduplicator, fingerprint
+from .diff import diff_timelines, TimelineChange
+from .alerts import AlertEngine, Rule, Alert, AlertError
+from .category import flight_category, category_timelines, CategoryTimeline
+from .timeline import Timeline
+from .snapshot import SnapshotPublisher, SnapshotReader, SnapshotError
+from .tail import Tailer
+from .probability import BranchTable
+from .shard import ShardRouter, ShardError
+from .climatology import Climatology
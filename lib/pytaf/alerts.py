@@ -0,0 +1,215 @@
+import operator
+import re
+
+from .diff import flatten
+
+
+# Comparison operators of alert conditions and BranchTable.probability()
+OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+_clause_pattern = re.compile(r"^\s*(?P<feature>[A-Za-z_][A-Za-z0-9_]*)\s*(?:(?P<op><=|>=|==|!=|<|>)\s*(?P<value>-?\d+(?:\.\d+)?))?\s*$")
+
+
+class AlertError(Exception):
+    def __init__(self, msg):
+        self.strerror = msg
+
+
+class Rule(object):
+    """ Alert rule over TafGroup.normalized features
+
+    Rules are written as expressions over normalized keys, in knots, meters
+    and feet whatever units the report used:
+
+        "ceiling_ft < 500"                       (lowest BKN/OVC layer below 500 ft)
+        "wind_gust_diff_kt > 15"
+        "wx_modifier_TS and wx_intensity_heavy or wx_modifier_FZ"
+        "windshear"
+
+    A bare feature name is true when the feature is present and non-zero,
+    a comparison is false when the feature is missing. "and" binds tighter
+    than "or". The expression is compiled once, into a list of alternatives,
+    each of them a list of (feature, operator, value) conditions.
+    """
+
+    def __init__(self, name, expression):
+        self.name = name
+        self.expression = expression
+        self.alternatives = self._compile(expression)
+
+    @staticmethod
+    def _compile(expression):
+        alternatives = []
+        for alternative in re.split(r"\s+or\s+", expression.strip()):
+            conditions = []
+            for clause in re.split(r"\s+and\s+", alternative):
+                m = _clause_pattern.match(clause)
+                if not m:
+                    raise AlertError("Invalid rule condition: %s" % clause)
+                op = m.group("op")
+                if op:
+                    value = float(m.group("value"))
+                    conditions.append((m.group("feature"), OPERATORS[op], value))
+                else:
+                    conditions.append((m.group("feature"), None, None))
+            alternatives.append(conditions)
+        return alternatives
+
+    @property
+    def features(self):
+        """ Set of normalized feature keys the rule depends on """
+        return set(feature for conditions in self.alternatives for feature, op, value in conditions)
+
+    def anchors(self):
+        """ One feature per alternative that must be present for it to hold """
+        return [conditions[0][0] for conditions in self.alternatives]
+
+    def matches(self, forecast):
+        for conditions in self.alternatives:
+            for feature, op, value in conditions:
+                current = forecast.get(feature)
+                if current is None:
+                    break
+                if op is None:
+                    if not current:
+                        break
+                elif not op(current, value):
+                    break
+            else:
+                return True
+        return False
+
+    def __repr__(self):
+        return "<Rule %s: %s>" % (self.name, self.expression)
+
+
+class Alert(object):
+    """ A triggered rule: the first time it holds for a station and for how long """
+
+    __slots__ = ("rule", "station", "start", "duration")
+
+    def __init__(self, rule, station, start, duration):
+        self.rule = rule
+        self.station = station
+        self.start = start
+        self.duration = duration
+
+    @property
+    def end(self):
+        return self.start + self.duration
+
+    def __repr__(self):
+        return "<Alert %s %s at %s for %s>" % (self.rule.name, self.station,
+                                               self.start.strftime('%d %H:%M'), self.duration)
+
+
+class AlertEngine(object):
+    """ Evaluates a set of rules against the timelines of many stations
+
+    Rules are indexed by the features they depend on, so a station's
+    timeline is only checked against rules that can possibly hold for it.
+    Results are cached per station and recomputed only when the station
+    gets a different report.
+    """
+
+    def __init__(self, rules=()):
+        self._rules = []
+        self._index = {}      # feature -> rules anchored on it
+        self._stations = {}   # icao -> (report signature, alerts)
+        for rule in rules:
+            self.add_rule(rule)
+
+    def add_rule(self, rule):
+        self._rules.append(rule)
+        for feature in set(rule.anchors()):
+            self._index.setdefault(feature, []).append(rule)
+        # Cached results no longer cover all rules
+        self._stations.clear()
+
+    @property
+    def rules(self):
+        return list(self._rules)
+
+    def _candidates(self, segments):
+        present = set()
+        for start, end, group in segments:
+            for key, value in group.normalized.items():
+                if value is not None:
+                    present.add(key)
+
+        seen = set()
+        candidates = []
+        for feature in present.intersection(self._index):
+            for rule in self._index[feature]:
+                if id(rule) not in seen:
+                    seen.add(id(rule))
+                    candidates.append(rule)
+        return candidates
+
+    def evaluate(self, station, decoder):
+        """ Evaluates all rules against a decoded timeline, bypassing the cache """
+        segments = flatten(decoder.groups)
+        alerts = []
+        for rule in self._candidates(segments):
+            start = None
+            end = None
+            for segment_start, segment_end, group in segments:
+                if rule.matches(group.normalized):
+                    if start is None:
+                        start = segment_start
+                    elif end != segment_start:
+                        break
+                    end = segment_end
+                elif start is not None:
+                    break
+            if start is not None:
+                alerts.append(Alert(rule, station, start, end - start))
+
+        alerts.sort(key=lambda alert: (alert.start, alert.rule.name))
+        return alerts
+
+    def update(self, station, decoder):
+        """ Checks a station's current report
+
+        Returns:
+            (changed, alerts), where changed is False if the report
+            is the one the cached alerts were computed from
+        """
+        signature = (decoder._taf.get_taf(), decoder.issued_timestamp)
+        cached = self._stations.get(station)
+        if cached is not None and cached[0] == signature:
+            return (False, cached[1])
+
+        alerts = self.evaluate(station, decoder)
+        self._stations[station] = (signature, alerts)
+        return (True, alerts)
+
+    def update_many(self, decoders):
+        """ Checks a feed cycle worth of reports (a dict of station -> Decoder)
+
+        Returns:
+            Dict of station -> alerts, for stations whose reports changed
+        """
+        result = {}
+        for station, decoder in decoders.items():
+            changed, alerts = self.update(station, decoder)
+            if changed:
+                result[station] = alerts
+        return result
+
+    def alerts(self, station):
+        """ Returns the cached alerts of a station """
+        cached = self._stations.get(station)
+        if cached is None:
+            return []
+        return cached[1]
+
+    def forget(self, station):
+        self._stations.pop(station, None)
@@ -0,0 +1,265 @@
+import json
+import sqlite3
+from calendar import timegm
+from datetime import datetime, timedelta
+
+from .dedup import fingerprint
+from .tafdecoder import Decoder
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS reports (
+        id          INTEGER PRIMARY KEY,
+        icao        TEXT    NOT NULL,
+        issued      INTEGER NOT NULL,
+        kind        TEXT    NOT NULL,
+        digest      BLOB    NOT NULL,
+        valid_from  INTEGER,
+        valid_till  INTEGER,
+        raw         TEXT    NOT NULL,
+        UNIQUE (icao, issued, kind)
+    );
+
+    CREATE TABLE IF NOT EXISTS groups (
+        report_id   INTEGER NOT NULL REFERENCES reports (id),
+        seq         INTEGER NOT NULL,
+        icao        TEXT    NOT NULL,
+        type        TEXT    NOT NULL,
+        start_time  INTEGER NOT NULL,
+        end_time    INTEGER NOT NULL,
+        lead_start  INTEGER NOT NULL,
+        lead_end    INTEGER NOT NULL,
+        forecast    TEXT    NOT NULL,
+        PRIMARY KEY (report_id, seq)
+    );
+
+    CREATE INDEX IF NOT EXISTS reports_station_issued ON reports (icao, issued);
+    CREATE INDEX IF NOT EXISTS groups_station_time ON groups (icao, start_time, end_time);
+    CREATE INDEX IF NOT EXISTS groups_station_lead ON groups (icao, lead_start, lead_end);
+"""
+
+
+def _to_epoch(timestamp):
+    if timestamp is None:
+        return None
+    return timegm(timestamp.timetuple())
+
+
+def _from_epoch(seconds):
+    if seconds is None:
+        return None
+    return _EPOCH + timedelta(seconds=seconds)
+
+
+class ArchiveError(Exception):
+    def __init__(self, msg):
+        self.strerror = msg
+
+
+class ArchivedGroup(object):
+    """ A decoded group interval as stored in the archive """
+
+    def __init__(self, icao, issued, type, start_time, end_time, forecast, kind=None):
+        self.icao = icao
+        self.issued = issued
+        self.type = type
+        self.start_time = start_time
+        self.end_time = end_time
+        self.forecast = forecast
+        self.kind = kind    # "AMD", "COR", "RTD" or None for a regular report
+
+    @property
+    def lead_time(self):
+        """ Time between issuance and the start of the group """
+        return self.start_time - self.issued
+
+    def __repr__(self):
+        return "%s %s %s-%s %s" % (self.icao, self.issued.strftime('%d%H%MZ'),
+                                   self.start_time.strftime('%d %H:%M'),
+                                   self.end_time.strftime('%d %H:%M'), self.type)
+
+
+class Archive(object):
+    """ Persistent index of decoded TAF timelines
+
+    Group intervals and their forecast features are stored in a SQLite
+    database keyed by station ICAO code, issuance time and validity,
+    so historical questions ("what did the TAF issued at X forecast
+    for KDEN at T?") are answered without re-parsing raw reports.
+    All timestamps are naive UTC datetimes, like the ones Decoder produces.
+
+    Reports are keyed by station, issuance time and kind (regular, AMD,
+    COR, RTD), so an amendment issued the same minute as the report it
+    amends is kept next to it, and supersedes it in get_group(). A
+    regular report already archived is never replaced; an AMD or COR
+    report with the key of an archived one but different text replaces
+    it (a correction re-sent under the same header).
+    """
+
+    def __init__(self, path=":memory:", batch_size=500):
+        """
+        Opens (and creates, if needed) an archive.
+
+        Args:
+            path: SQLite database file name, in-memory database by default
+            batch_size: number of reports inserted per transaction by add_many()
+        """
+
+        self._batch_size = batch_size
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, decoder):
+        """ Appends a single decoded report in its own transaction
+
+        Returns:
+            True if the report was stored (or replaced an archived AMD/COR
+            report), False if it was already archived
+        """
+        with self._conn:
+            return self._insert(decoder)
+
+    def add_many(self, decoders):
+        """ Bulk inserts decoded reports, batch_size reports per transaction
+
+        Returns:
+            Number of newly stored (or replaced) reports
+        """
+        added = 0
+        batch = []
+        for decoder in decoders:
+            batch.append(decoder)
+            if len(batch) >= self._batch_size:
+                added += self._insert_batch(batch)
+                batch = []
+        if batch:
+            added += self._insert_batch(batch)
+        return added
+
+    def _insert_batch(self, batch):
+        added = 0
+        with self._conn:
+            for decoder in batch:
+                if self._insert(decoder):
+                    added += 1
+        return added
+
+    def _insert(self, decoder):
+        if not isinstance(decoder, Decoder):
+            raise ArchiveError("Argument is not a TAF decoder object")
+        if not getattr(decoder, "groups", None):
+            raise ArchiveError("Decoder has no decoded groups")
+
+        taf = decoder._taf
+        icao = taf.get_header()["icao_code"]
+        issued = _to_epoch(decoder.issued_timestamp)
+        raw = taf.get_taf()
+        fp = fingerprint(raw)
+        kind = fp.kind or ""
+
+        # Regular reports are stored once, AMD/COR reports with new text replace the archived ones
+        cursor = self._conn.execute(
+            "INSERT INTO reports (icao, issued, kind, digest, valid_from, valid_till, raw)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (icao, issued, kind) DO UPDATE SET digest = excluded.digest,"
+            " valid_from = excluded.valid_from, valid_till = excluded.valid_till, raw = excluded.raw"
+            " WHERE excluded.kind IN ('AMD', 'COR') AND digest != excluded.digest",
+            (icao, issued, kind, fp.digest, _to_epoch(decoder.start_time), _to_epoch(decoder.end_time), raw))
+        if cursor.rowcount == 0:
+            return False
+
+        report_id = self._conn.execute("SELECT id FROM reports WHERE icao = ? AND issued = ? AND kind = ?",
+                                       (icao, issued, kind)).fetchone()[0]
+        self._conn.execute("DELETE FROM groups WHERE report_id = ?", (report_id,))
+        rows = []
+        for seq, group in enumerate(decoder.groups):
+            start = _to_epoch(group.start_time)
+            end = _to_epoch(group.end_time)
+            rows.append((report_id, seq, icao, group.type, start, end,
+                         (start - issued) // 60, (end - issued) // 60,
+                         json.dumps(group.forecast)))
+        self._conn.executemany(
+            "INSERT INTO groups (report_id, seq, icao, type, start_time, end_time,"
+            " lead_start, lead_end, forecast) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return True
+
+    def _groups(self, where, params):
+        query = ("SELECT g.icao, r.issued, g.type, g.start_time, g.end_time, g.forecast, r.kind"
+                 " FROM groups g JOIN reports r ON r.id = g.report_id"
+                 " WHERE %s ORDER BY r.issued, r.id, g.seq" % where)
+        return [ArchivedGroup(icao, _from_epoch(issued), type, _from_epoch(start),
+                              _from_epoch(end), json.loads(forecast), kind or None)
+                for icao, issued, type, start, end, forecast, kind in self._conn.execute(query, params)]
+
+    def issuances(self, icao, start=None, end=None):
+        """ Returns issuance times of archived reports for a station, oldest first """
+        where = "icao = ?"
+        params = [icao]
+        if start is not None:
+            where += " AND issued >= ?"
+            params.append(_to_epoch(start))
+        if end is not None:
+            where += " AND issued < ?"
+            params.append(_to_epoch(end))
+        rows = self._conn.execute("SELECT DISTINCT issued FROM reports WHERE %s ORDER BY issued" % where, params)
+        return [_from_epoch(issued) for (issued,) in rows]
+
+    def latest_issuance(self, icao, before):
+        """ Returns the issuance time of the newest report issued at or before the given time """
+        row = self._conn.execute("SELECT MAX(issued) FROM reports WHERE icao = ? AND issued <= ?",
+                                 (icao, _to_epoch(before))).fetchone()
+        return _from_epoch(row[0])
+
+    def get_group(self, icao, issued, timestamp):
+        """ Returns the group of the report issued at (or last before) issued that contains timestamp
+
+        This answers "what did the TAF in force at time X forecast for the station at time T".
+        Like Decoder.get_group(), the first matching group in report order wins. Of
+        the reports issued at the same time, the AMD or COR one stored last is in force.
+        """
+        issued = self.latest_issuance(icao, issued)
+        if issued is None:
+            return None
+        report_id = self._conn.execute(
+            "SELECT id FROM reports WHERE icao = ? AND issued = ? ORDER BY kind IN ('AMD', 'COR') DESC, id DESC",
+            (icao, _to_epoch(issued))).fetchone()[0]
+        at = _to_epoch(timestamp)
+        groups = self._groups("g.report_id = ? AND g.start_time <= ? AND g.end_time > ?",
+                              (report_id, at, at))
+        if groups:
+            return groups[0]
+        return None
+
+    def query(self, icao, start, end):
+        """ Returns all archived groups for a station that overlap [start, end) """
+        return self._groups("g.icao = ? AND g.start_time < ? AND g.end_time > ?",
+                            (icao, _to_epoch(end), _to_epoch(start)))
+
+    def query_lead_time(self, icao, min_lead, max_lead, start=None, end=None):
+        """ Returns groups starting between min_lead and max_lead (timedeltas) after issuance
+
+        Optionally restricted to groups overlapping [start, end).
+        """
+        where = "g.icao = ? AND g.lead_start >= ? AND g.lead_start <= ?"
+        params = [icao, min_lead // timedelta(minutes=1), max_lead // timedelta(minutes=1)]
+        if start is not None:
+            where += " AND g.end_time > ?"
+            params.append(_to_epoch(start))
+        if end is not None:
+            where += " AND g.start_time < ?"
+            params.append(_to_epoch(end))
+        return self._groups(where, params)
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
@@ -0,0 +1,203 @@
+from .diff import flatten
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+VFR = "VFR"
+MVFR = "MVFR"
+IFR = "IFR"
+LIFR = "LIFR"
+
+# Ordered from best to worst, the index is the severity
+CATEGORIES = [VFR, MVFR, IFR, LIFR]
+
+METERS_PER_SM = 1609.344
+
+# Stand-in for "no ceiling" / "unrestricted visibility" in numeric columns
+UNLIMITED = float("inf")
+
+
+def _decoded(group, *fields):
+    # False if any of fields was left out when decoding (see Decoder fields=)
+    decoded = group.fields
+    return decoded is None or all(field in decoded for field in fields)
+
+
+def _conditions(group):
+    # (forecast, ceiling in feet) a group forecasts: the branch of a PROB group,
+    # whose merged forecast keeps the prevailing values below 50%
+    if group.branch_forecast is not None:
+        return (group.branch_forecast, group.branch_ceiling_ft)
+    return (group.forecast, group.ceiling_ft)
+
+
+def group_ceiling(group):
+    """ Ceiling of a decoded group in feet: lowest BKN/OVC layer or vertical visibility
+
+    The ceiling of a PROB group is the one of its branch (see TafGroup.branch_forecast).
+    None if clouds or visibility (which holds vertical visibility) were not decoded.
+    """
+    if not _decoded(group, "clouds", "visibility"):
+        return None
+    forecast, ceiling = _conditions(group)
+    vv = forecast.get("visibility_vertical_ft")
+    if vv is not None:
+        vv = vv * 100
+        if ceiling is None or vv < ceiling:
+            ceiling = vv
+    if ceiling is None:
+        return UNLIMITED
+    return ceiling
+
+
+def group_visibility(group):
+    """ Prevailing visibility of a decoded group in statute miles, None if visibility was not decoded
+
+    Like the ceiling, the visibility of a PROB group is the one of its branch.
+    """
+    if not _decoded(group, "visibility"):
+        return None
+    forecast = _conditions(group)[0]
+    visibility = forecast.get("visibility_SM")
+    if visibility is not None:
+        return visibility
+    visibility = forecast.get("visibility_M")
+    if visibility is not None:
+        return visibility / METERS_PER_SM
+    return UNLIMITED
+
+
+def severities(ceilings, visibilities):
+    """ Computes category severities (indexes into CATEGORIES) for columns of ceilings and visibilities
+
+    Args:
+        ceilings: sequence of ceilings in feet (UNLIMITED if there is none)
+        visibilities: sequence of visibilities in statute miles
+
+        None stands for a value that is not known (not decoded)
+
+    Returns:
+        List of severities, 0 (VFR) to 3 (LIFR), None where a value is not known
+    """
+    if numpy is not None and len(ceilings) > 64:
+        c = numpy.asarray([UNLIMITED if value is None else value for value in ceilings], dtype=float)
+        v = numpy.asarray([UNLIMITED if value is None else value for value in visibilities], dtype=float)
+        by_ceiling = numpy.select([c < 500, c < 1000, c <= 3000], [3, 2, 1], 0)
+        by_visibility = numpy.select([v < 1, v < 3, v <= 5], [3, 2, 1], 0)
+        result = numpy.maximum(by_ceiling, by_visibility).tolist()
+        for i, (c, v) in enumerate(zip(ceilings, visibilities)):
+            if c is None or v is None:
+                result[i] = None
+        return result
+
+    result = []
+    for c, v in zip(ceilings, visibilities):
+        if c is None or v is None:
+            result.append(None)
+        elif c < 500 or v < 1:
+            result.append(3)
+        elif c < 1000 or v < 3:
+            result.append(2)
+        elif c <= 3000 or v <= 5:
+            result.append(1)
+        else:
+            result.append(0)
+    return result
+
+
+def flight_category(group):
+    """ Flight category of a single decoded group, None if clouds or visibility were not decoded """
+    severity = severities([group_ceiling(group)], [group_visibility(group)])[0]
+    if severity is None:
+        return None
+    return CATEGORIES[severity]
+
+
+class CategoryTimeline(object):
+    """ Run-length encoded flight category timelines of a station
+
+    Attributes:
+        station: ICAO code
+        prevailing: list of (start, end, category) runs of the prevailing
+                    (main, FM and BECMG) groups, ignoring TEMPO/PROB overlays
+        worst: list of (start, end, category) runs of the worse of
+               the prevailing conditions and any overlay in effect
+
+    The category is None where clouds or visibility were not decoded.
+    """
+
+    __slots__ = ("station", "prevailing", "worst")
+
+    def __init__(self, station, prevailing, worst):
+        self.station = station
+        self.prevailing = prevailing
+        self.worst = worst
+
+    def category_at(self, timestamp, worst=False):
+        for start, end, category in (self.worst if worst else self.prevailing):
+            if start <= timestamp < end:
+                return category
+        return None
+
+    def __repr__(self):
+        return "<CategoryTimeline %s %s>" % (self.station, self.worst)
+
+
+def _runs(segments, severity):
+    runs = []
+    for (start, end, group), value in zip(segments, severity):
+        category = None if value is None else CATEGORIES[value]
+        if runs and runs[-1][2] == category and runs[-1][1] == start:
+            runs[-1] = (runs[-1][0], end, category)
+        else:
+            runs.append((start, end, category))
+    return runs
+
+
+def category_timelines(decoders):
+    """ Computes flight category timelines for a batch of decoded TAFs
+
+    Ceilings and visibilities of all segments of all reports are collected
+    into flat columns and classified in one pass (with NumPy, if installed),
+    then split back per station and run-length encoded.
+
+    Args:
+        decoders: iterable of Decoder objects
+
+    Returns:
+        List of CategoryTimeline objects in input order
+    """
+    stations = []
+    ceilings = []
+    visibilities = []
+    for decoder in decoders:
+        segments = flatten(decoder.groups)
+        stations.append((decoder._taf.get_header()["icao_code"], segments))
+        # Each segment contributes two rows: its prevailing group, then the segment's own group
+        for start, end, group in segments:
+            # BECMG changes the prevailing conditions for good, it is not an overlay here
+            base = group if group.type.startswith("BECMG") else group.prevailing
+            for g in (base, group):
+                ceilings.append(group_ceiling(g))
+                visibilities.append(group_visibility(g))
+
+    severity = severities(ceilings, visibilities)
+
+    result = []
+    row = 0
+    for station, segments in stations:
+        prevailing = []
+        worst = []
+        for i in range(len(segments)):
+            prevailing.append(severity[row])
+            if severity[row] is None or severity[row + 1] is None:
+                worst.append(None)
+            else:
+                worst.append(max(severity[row], severity[row + 1]))
+            row += 2
+        result.append(CategoryTimeline(station, _runs(segments, prevailing), _runs(segments, worst)))
+
+    return result
@@ -0,0 +1,223 @@
+import argparse
+import csv
+import io
+import multiprocessing
+import sys
+import time
+from datetime import datetime
+
+from .taf import TAF, MalformedTAF
+from .tafdecoder import Decoder, DecodeError
+from .reader import read_reports
+from .dedup import Deduplicator
+from .profiles import FIELDS, check_fields
+from .serialize import format_time
+
+
+FORMATS = ["text", "jsonl", "csv"]
+
+# Numeric features get their own CSV column, all flag-like
+# features (wx_*, clouds_layer_*, clouds_type_*) go to "flags"
+CSV_COLUMNS = ["station", "issued", "type", "start", "end", "prob",
+               "wind_dir", "wind_dir_variable", "wind_speed_KT", "wind_speed_MPS",
+               "wind_gust_KT", "wind_gust_MPS", "wind_gust_diff_KT", "wind_gust_diff_MPS",
+               "wind_crosswind_cos", "wind_crosswind_sin",
+               "visibility_SM", "visibility_M", "visibility_vertical_ft",
+               "sky_clear", "clouds_num_layers", "clouds_ceiling_ft", "clouds_ceiling_max_ft",
+               "windshear", "windshear_alt_ft", "windshear_dir", "windshear_speed_KT", "windshear_speed_MPS",
+               "weather", "flags"]
+
+NORMALIZED_CSV_COLUMNS = ["station", "issued", "type", "start", "end", "prob",
+                          "wind_dir_deg", "wind_dir_variable", "wind_speed_kt", "wind_gust_kt", "wind_gust_diff_kt",
+                          "wind_crosswind_cos_kt", "wind_crosswind_sin_kt",
+                          "visibility_m", "vertical_visibility_ft",
+                          "sky_clear", "clouds_num_layers", "clouds_base_ft", "clouds_top_layer_ft", "ceiling_ft",
+                          "windshear", "windshear_alt_ft", "windshear_dir_deg", "windshear_speed_kt",
+                          "weather", "flags"]
+
+_options = {}
+
+
+def _init_worker(options):
+    _options.update(options)
+
+
+def _features(group):
+    if _options.get("normalize"):
+        return group.normalized
+    return group.forecast
+
+
+def _csv_columns(normalize):
+    if normalize:
+        return NORMALIZED_CSV_COLUMNS
+    return CSV_COLUMNS
+
+
+def _format_text(decoder):
+    return decoder.decode_taf() + "\n"
+
+
+def _format_jsonl(decoder):
+    return decoder.to_json(normalized=bool(_options.get("normalize"))).decode("utf-8") + "\n"
+
+
+def _format_csv(decoder):
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    columns = _csv_columns(_options.get("normalize"))
+    station = decoder._taf.get_header()["icao_code"]
+    issued = format_time(decoder.issued_timestamp)
+    for group in decoder.groups:
+        row = {"station": station, "issued": issued, "type": group.type,
+               "start": format_time(group.start_time), "end": format_time(group.end_time)}
+        flags = []
+        for key, value in _features(group).items():
+            if key in columns:
+                row[key] = value
+            elif value:
+                flags.append(key)
+        row["flags"] = ";".join(sorted(flags))
+        writer.writerow([row.get(column, "") for column in columns])
+    return out.getvalue()
+
+
+_formatters = {
+    "text": _format_text,
+    "jsonl": _format_jsonl,
+    "csv": _format_csv,
+}
+
+
+def decode_report(report):
+    """ Parses and decodes one report
+
+    Returns:
+        (True, formatted output) or (False, error message)
+    """
+    try:
+        taf = TAF(report, fields=_options.get("fields"))
+        decoder = Decoder(taf, _options.get("timestamp"))
+        if not getattr(decoder, "groups", None):
+            raise DecodeError("No decodable groups")
+        return (True, _formatters[_options.get("format", "text")](decoder))
+    except (MalformedTAF, DecodeError) as e:
+        return (False, e.strerror)
+    except Exception as e:
+        return (False, "%s: %s" % (e.__class__.__name__, e))
+
+
+def _summary(report):
+    first_line = report.split("\n", 1)[0]
+    if len(first_line) > 60:
+        first_line = first_line[:57] + "..."
+    return first_line
+
+
+def run(paths, out, err, format="text", jobs=1, timestamp=None, chunksize=64, unique=False,
+        normalize=False, fields=None):
+    """ Decodes all reports from paths, writes results to out and errors to err
+
+    With unique=True, repeated copies of a report are skipped before parsing.
+    With normalize=True, jsonl and csv output unit-normalized features.
+    With fields (e.g. ["wind", "clouds"]), only these fields are parsed and decoded.
+
+    Returns:
+        (number of decoded reports, number of errors)
+    """
+    options = {"format": format, "timestamp": timestamp, "normalize": normalize,
+               "fields": check_fields(fields)}
+
+    if format == "csv":
+        csv.writer(out, lineterminator="\n").writerow(_csv_columns(normalize))
+
+    reports = read_reports(paths)
+    if unique:
+        reports = Deduplicator().filter(reports)
+    decoded = 0
+    errors = 0
+
+    if jobs > 1:
+        pool = multiprocessing.Pool(jobs, initializer=_init_worker, initargs=(options,))
+        # Keep the raw report next to the result for error messages
+        results = pool.imap(_decode_with_report, reports, chunksize)
+    else:
+        pool = None
+        _init_worker(options)
+        results = map(_decode_with_report, reports)
+
+    try:
+        for report, (ok, result) in results:
+            if ok:
+                decoded += 1
+                out.write(result)
+            else:
+                errors += 1
+                err.write("error: %s: %s\n" % (result, _summary(report)))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    return decoded, errors
+
+
+def _decode_with_report(report):
+    return report, decode_report(report)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="pytaf",
+                                     description="Bulk TAF decoder. Reads files, directories or stdin (gzip is detected automatically).")
+    parser.add_argument("paths", nargs="*", default=["-"], help="Input files or directories, \"-\" for stdin (default)")
+    parser.add_argument("-f", "--format", choices=FORMATS, default="text", help="Output format (default: text)")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Number of worker processes (default: 1)")
+    parser.add_argument("-o", "--output", default="-", help="Output file (default: stdout)")
+    parser.add_argument("-n", "--normalize", action="store_true",
+                        help="Output unit-normalized features (kt, m, ft) in jsonl and csv")
+    parser.add_argument("-u", "--unique", action="store_true", help="Skip repeated copies of the same report")
+    parser.add_argument("-d", "--date", help="Year and month reports were issued in, YYYY-MM (default: current)")
+    parser.add_argument("--fields", help="Comma separated fields to decode, out of %s (default: all)" %
+                        ", ".join(sorted(FIELDS)))
+    args = parser.parse_args(argv)
+
+    fields = None
+    if args.fields:
+        try:
+            fields = check_fields([field.strip() for field in args.fields.split(",") if field.strip()])
+        except ValueError as e:
+            parser.error(str(e))
+
+    timestamp = None
+    if args.date:
+        try:
+            timestamp = datetime.strptime(args.date, "%Y-%m")
+        except ValueError:
+            parser.error("invalid date: %s" % args.date)
+
+    if args.output == "-":
+        out = sys.stdout
+    else:
+        out = open(args.output, "w")
+
+    started = time.time()
+    try:
+        decoded, errors = run(args.paths, out, sys.stderr, format=args.format,
+                              jobs=max(1, args.jobs), timestamp=timestamp, unique=args.unique,
+                              normalize=args.normalize, fields=fields)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.time() - started
+
+    rate = (decoded + errors) / elapsed if elapsed > 0 else 0.0
+    sys.stderr.write("%d reports decoded, %d errors in %.2f s (%.0f reports/s)\n" %
+                     (decoded, errors, elapsed, rate))
+
+    if errors and not decoded:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,334 @@
+"""
+Streaming forecast climatology.
+
+Decoded reports are sampled every whole hour of their timeline (the group
+Decoder.get_group() would return) and each sample is added to the
+accumulators of its bucket, by default (station, month, hour of day):
+
+    clim = Climatology(max_lead=6)
+    clim.add_many(decoders)
+    stats = clim[("KDEN", 1, 12)]
+    stats.category_frequencies()      # {"VFR": 0.81, "MVFR": 0.11, ...}
+    stats.ceilings.quantile(0.1)      # feet
+
+Accumulators only hold counts (category counts, fixed-bin histograms,
+quantile sketch buckets), so memory does not grow with the number of
+reports, and merging the Climatology objects built by parallel workers
+(they pickle) gives exactly what one pass over all reports would.
+"""
+
+import math
+from datetime import timedelta
+
+from .category import CATEGORIES, UNLIMITED, group_ceiling, group_visibility, severities
+from .diff import flatten
+
+
+# Relative error of ceiling quantiles
+RELATIVE_ACCURACY = 0.01
+
+# Gust speed histogram: 5 knot bins from 0 to 100 knots
+GUST_BINS = (0, 5, 20)
+
+# Fields samples are made of (flight categories need clouds and visibility)
+REQUIRED_FIELDS = ("wind", "visibility", "clouds", "weather")
+
+
+class Histogram(object):
+    """ Counts of values in fixed-width bins
+
+    counts[0] holds values below start, counts[-1] values at or above
+    start + width * bins.
+    """
+
+    def __init__(self, start, width, bins):
+        self.start = start
+        self.width = width
+        self.bins = bins
+        self.counts = [0] * (bins + 2)
+
+    def add(self, value, count=1):
+        index = int(math.floor((value - self.start) / float(self.width))) + 1
+        self.counts[min(max(index, 0), self.bins + 1)] += count
+
+    @property
+    def total(self):
+        return sum(self.counts)
+
+    def edges(self):
+        """ Returns the bin edges, bins + 1 values """
+        return [self.start + i * self.width for i in range(self.bins + 1)]
+
+    def merge(self, other):
+        if (self.start, self.width, self.bins) != (other.start, other.width, other.bins):
+            raise ValueError("Can't merge histograms with different bins")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        return self
+
+    def __eq__(self, other):
+        return isinstance(other, Histogram) and \
+            (self.start, self.width, self.bins, self.counts) == (other.start, other.width, other.bins, other.counts)
+
+    def __repr__(self):
+        return "<Histogram %s+%sx%d %s>" % (self.start, self.width, self.bins, self.counts)
+
+
+class QuantileSketch(object):
+    """ Quantile sketch with relative error guarantees (DDSketch)
+
+    Positive values are counted in logarithmic buckets, so any quantile is
+    returned within relative_accuracy of the true one; zero (and below) and
+    infinite values are counted apart. Merging adds bucket counts, which is
+    exact: a merged sketch is the sketch of all values.
+    """
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.buckets = {}       # bucket index -> count
+        self.zeros = 0
+        self.infinite = 0
+        self.count = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value, count=1):
+        if value == UNLIMITED:
+            self.infinite += count
+        elif value <= 0:
+            self.zeros += count
+        else:
+            index = int(math.ceil(math.log(value) / self._log_gamma))
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += count
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """ Returns the q-quantile (0 <= q <= 1), None if empty """
+        if not self.count:
+            return None
+        # The extremes are known exactly
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                value = 2 * self._gamma ** index / (self._gamma + 1)
+                return min(max(value, self.min), self.max)
+        return UNLIMITED
+
+    def merge(self, other):
+        if self.relative_accuracy != other.relative_accuracy:
+            raise ValueError("Can't merge sketches with different accuracy")
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zeros += other.zeros
+        self.infinite += other.infinite
+        self.count += other.count
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+        return self
+
+    def __eq__(self, other):
+        return isinstance(other, QuantileSketch) and \
+            (self.relative_accuracy, self.buckets, self.zeros, self.infinite, self.count, self.min, self.max) == \
+            (other.relative_accuracy, other.buckets, other.zeros, other.infinite, other.count, other.min, other.max)
+
+    def __repr__(self):
+        return "<QuantileSketch %d values>" % self.count
+
+
+class BucketStats(object):
+    """ Accumulated samples of one bucket
+
+    Attributes:
+        samples: number of hourly samples
+        categories: sample count per flight category (pytaf.category.CATEGORIES order)
+        gusts: Histogram of gust speeds in knots, of the samples with gusts
+        weather: sample count per wx_* feature
+        ceilings: QuantileSketch of ceilings in feet (UNLIMITED when there is none)
+    """
+
+    def __init__(self, gust_bins=GUST_BINS, relative_accuracy=RELATIVE_ACCURACY):
+        self.samples = 0
+        self.categories = [0] * len(CATEGORIES)
+        self.gusts = Histogram(*gust_bins)
+        self.weather = {}
+        self.ceilings = QuantileSketch(relative_accuracy)
+
+    def add(self, severity, gust, weather, ceiling, count=1):
+        self.samples += count
+        self.categories[severity] += count
+        if gust is not None:
+            self.gusts.add(gust, count)
+        for key in weather:
+            self.weather[key] = self.weather.get(key, 0) + count
+        self.ceilings.add(ceiling, count)
+
+    def merge(self, other):
+        self.samples += other.samples
+        self.categories = [a + b for a, b in zip(self.categories, other.categories)]
+        self.gusts.merge(other.gusts)
+        for key, count in other.weather.items():
+            self.weather[key] = self.weather.get(key, 0) + count
+        self.ceilings.merge(other.ceilings)
+        return self
+
+    def category_frequencies(self):
+        return {category: count / float(self.samples) if self.samples else 0.0
+                for category, count in zip(CATEGORIES, self.categories)}
+
+    def weather_frequencies(self):
+        return {key: count / float(self.samples) for key, count in self.weather.items()}
+
+    def gust_frequency(self):
+        """ Share of samples with gusts """
+        return self.gusts.total / float(self.samples) if self.samples else 0.0
+
+    def __eq__(self, other):
+        return isinstance(other, BucketStats) and \
+            (self.samples, self.categories, self.gusts, self.weather, self.ceilings) == \
+            (other.samples, other.categories, other.gusts, other.weather, other.ceilings)
+
+    def __repr__(self):
+        return "<BucketStats %d samples>" % self.samples
+
+
+def station_month_hour(station, timestamp):
+    """ Default bucket of a sample: (station, month, hour of day) """
+    return (station, timestamp.month, timestamp.hour)
+
+
+def _features(group):
+    # Sample values of a group, computed once for all the hours it covers. A
+    # PROB group is sampled with its branch, what it forecasts if it happens.
+    ceiling = group_ceiling(group)
+    severity = severities([ceiling], [group_visibility(group)])[0]
+    if group.branch_forecast is not None:
+        forecast, normalized = group.branch_forecast, group.branch_normalized
+    else:
+        forecast, normalized = group.forecast, group.normalized
+    gust = normalized.get("wind_gust_kt")
+    weather = [key for key, value in forecast.items() if value and key.startswith("wx_")]
+    return (severity, gust, weather, ceiling)
+
+
+class Climatology(object):
+    """ Mergeable per-bucket statistics of decoded reports """
+
+    def __init__(self, max_lead=None, bucket=station_month_hour, gust_bins=GUST_BINS,
+                 relative_accuracy=RELATIVE_ACCURACY):
+        """
+        Args:
+            max_lead: only sample hours less than max_lead (timedelta or hours) after
+                      issuance, e.g. the issuance interval so that every hour is
+                      counted from the latest report only; all hours if None
+            bucket: function (station, sample time) -> bucket key, must be a
+                    module level function for the object to pickle
+            gust_bins: (start, width, bins) of the gust histograms, in knots
+            relative_accuracy: relative error of ceiling quantiles
+        """
+        if max_lead is not None and not isinstance(max_lead, timedelta):
+            max_lead = timedelta(hours=max_lead)
+        self.max_lead = max_lead
+        self.bucket = bucket
+        self.gust_bins = tuple(gust_bins)
+        self.relative_accuracy = relative_accuracy
+        self.buckets = {}
+        self.reports = 0
+
+    def add(self, decoder, station=None):
+        """ Adds the hourly samples of a decoded report
+
+        Raises:
+            ValueError: the report was decoded without some of REQUIRED_FIELDS
+        """
+        fields = decoder.fields
+        if fields is not None:
+            missing = [field for field in REQUIRED_FIELDS if field not in fields]
+            if missing:
+                raise ValueError("Climatology needs decoded %s" % ", ".join(missing))
+        groups = getattr(decoder, "groups", None)
+        if not groups:
+            return
+        if station is None:
+            station = decoder._taf.get_header()["icao_code"]
+        last = None
+        if self.max_lead is not None:
+            last = decoder.issued_timestamp + self.max_lead
+
+        self.reports += 1
+        hour = timedelta(hours=1)
+        for start, end, group in flatten(groups):
+            if last is not None and end > last:
+                end = last
+            sample = start.replace(minute=0, second=0, microsecond=0)
+            if sample < start:
+                sample += hour
+            if sample >= end:
+                continue
+            severity, gust, weather, ceiling = _features(group)
+            while sample < end:
+                self._stats(self.bucket(station, sample)).add(severity, gust, weather, ceiling)
+                sample += hour
+
+    def add_many(self, decoders):
+        for decoder in decoders:
+            self.add(decoder)
+        return self
+
+    def _stats(self, key):
+        stats = self.buckets.get(key)
+        if stats is None:
+            stats = self.buckets[key] = BucketStats(self.gust_bins, self.relative_accuracy)
+        return stats
+
+    def merge(self, other):
+        """ Adds the statistics of another Climatology (e.g. of another worker) """
+        if (self.max_lead, self.bucket, self.gust_bins, self.relative_accuracy) != \
+                (other.max_lead, other.bucket, other.gust_bins, other.relative_accuracy):
+            raise ValueError("Can't merge climatologies with different settings")
+        for key, stats in other.buckets.items():
+            self._stats(key).merge(stats)
+        self.reports += other.reports
+        return self
+
+    def __getitem__(self, key):
+        return self.buckets[key]
+
+    def __contains__(self, key):
+        return key in self.buckets
+
+    def __len__(self):
+        return len(self.buckets)
+
+    def __eq__(self, other):
+        return isinstance(other, Climatology) and self.buckets == other.buckets and self.reports == other.reports
+
+    def rows(self, quantiles=(0.1, 0.5, 0.9)):
+        """ Yields one flat dict per bucket, sorted by key, e.g. to build a dataframe
+
+        Keys are "key", "samples", the flight categories (frequencies),
+        "gusts" (frequency), "ceiling_p10", "ceiling_p50", ... (feet) and
+        the wx_* features (frequencies).
+        """
+        for key in sorted(self.buckets):
+            stats = self.buckets[key]
+            row = {"key": key, "samples": stats.samples, "gusts": stats.gust_frequency()}
+            row.update(stats.category_frequencies())
+            for q in quantiles:
+                row["ceiling_p%d" % round(q * 100)] = stats.ceilings.quantile(q)
+            row.update(stats.weather_frequencies())
+            yield row
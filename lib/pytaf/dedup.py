@@ -0,0 +1,166 @@
+import hashlib
+import re
+import time
+from collections import OrderedDict
+
+
+NEW = "new"
+REPEAT = "repeat"
+AMENDMENT = "amendment"
+
+_report_types = ("AMD", "COR", "RTD")
+_icao_pattern = re.compile(r"^[A-Z]{4}$")
+_issued_pattern = re.compile(r"^\d{6}Z$")
+_validity_pattern = re.compile(r"^\d{4}/\d{4}$|^\d{6}$")
+
+
+class Fingerprint(object):
+    """ Canonical identity of a TAF report computed without parsing it
+
+    Attributes:
+        icao: station ICAO code (None if not recognized)
+        issued: issuance token, e.g. "291134Z" (None if missing)
+        kind: "AMD", "COR", "RTD" or None for a regular report
+        validity: validity token, e.g. "2912/3018" (None if missing)
+        digest: hash of the whitespace-normalized report tokens
+    """
+
+    __slots__ = ("icao", "issued", "kind", "validity", "digest")
+
+    def __init__(self, icao, issued, kind, validity, digest):
+        self.icao = icao
+        self.issued = issued
+        self.kind = kind
+        self.validity = validity
+        self.digest = digest
+
+    def __eq__(self, other):
+        return isinstance(other, Fingerprint) and self.digest == other.digest
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.digest)
+
+    def __repr__(self):
+        return "<Fingerprint %s %s %s %s>" % (self.icao, self.issued, self.kind or "", self.digest.hex()[:12])
+
+
+def fingerprint(report):
+    """ Computes the Fingerprint of a raw report
+
+    Line wrapping, repeated whitespace and the "=" terminator do not
+    change the fingerprint, so copies of the same report received
+    from different feeds compare equal.
+    """
+    tokens = report.replace("=", " ").split()
+
+    # Leading "TAF" markers are optional (and sometimes duplicate)
+    start = 0
+    while start < len(tokens) and tokens[start] == "TAF":
+        start += 1
+    tokens = tokens[start:]
+
+    position = 0
+    kind = None
+    icao = None
+    issued = None
+    validity = None
+
+    if position < len(tokens) and tokens[position] in _report_types:
+        kind = tokens[position]
+        position += 1
+    if position < len(tokens) and _icao_pattern.match(tokens[position]):
+        icao = tokens[position]
+        position += 1
+    if position < len(tokens) and _issued_pattern.match(tokens[position]):
+        issued = tokens[position]
+        position += 1
+    if position < len(tokens) and _validity_pattern.match(tokens[position]):
+        validity = tokens[position]
+
+    digest = hashlib.blake2b(" ".join(tokens).encode("ascii", "replace"), digest_size=16).digest()
+    return Fingerprint(icao, issued, kind, validity, digest)
+
+
+class Deduplicator(object):
+    """ Suppresses redundant copies of reports before they are parsed
+
+    Keeps a bounded set of recently seen fingerprints. Entries expire
+    ttl seconds after they were last seen, and the oldest entries are
+    dropped when more than max_size are remembered.
+    """
+
+    def __init__(self, max_size=100000, ttl=36 * 3600, clock=time.monotonic):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._clock = clock
+        self._seen = OrderedDict()  # digest -> (last seen, fingerprint)
+        self._latest = {}           # icao -> latest fingerprint seen for the station
+
+    def classify(self, report):
+        """ Records a report and tells what it is
+
+        Returns:
+            (status, fingerprint, previous) tuple, where status is
+            REPEAT for an identical copy of a remembered report,
+            AMENDMENT for an AMD/COR/RTD report, NEW otherwise,
+            and previous is the last other Fingerprint seen for the station
+            (e.g. the report an amendment replaces), or None
+        """
+        now = self._clock()
+        self._expire(now)
+
+        fp = fingerprint(report)
+        previous = self._latest.get(fp.icao)
+        if previous is not None and previous.digest not in self._seen:
+            previous = None
+
+        if fp.digest in self._seen:
+            self._seen.move_to_end(fp.digest)
+            # Keep the remembered fingerprint, it is the one _latest refers to
+            self._seen[fp.digest] = (now, self._seen[fp.digest][1])
+            if previous is not None and previous.digest == fp.digest:
+                previous = None
+            return (REPEAT, fp, previous)
+
+        self._seen[fp.digest] = (now, fp)
+        if len(self._seen) > self._max_size:
+            self._forget(*self._seen.popitem(last=False))
+        if fp.icao is not None:
+            self._latest[fp.icao] = fp
+
+        if fp.kind is not None:
+            return (AMENDMENT, fp, previous)
+        return (NEW, fp, previous)
+
+    def is_new(self, report):
+        """ Records a report, returns False if it is a repeat of a remembered one """
+        return self.classify(report)[0] != REPEAT
+
+    def filter(self, reports):
+        """ Yields only reports with new content (new issuances and amendments) """
+        for report in reports:
+            if self.is_new(report):
+                yield report
+
+    def _expire(self, now):
+        while self._seen:
+            digest, (seen, fp) = next(iter(self._seen.items()))
+            if now - seen < self._ttl:
+                break
+            self._forget(digest, self._seen[digest])
+
+    def _forget(self, digest, entry):
+        self._seen.pop(digest, None)
+        fp = entry[1]
+        latest = self._latest.get(fp.icao)
+        if latest is not None and latest.digest == digest:
+            del self._latest[fp.icao]
+
+    def __len__(self):
+        return len(self._seen)
+
+    def __contains__(self, report):
+        return fingerprint(report).digest in self._seen
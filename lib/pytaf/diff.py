@@ -0,0 +1,137 @@
+from .tafdecoder import Decoder
+
+
+class TimelineChange(object):
+    """ Features that differ between two timelines over [start, end)
+
+    Attributes:
+        start, end: changed time range
+        changes: dict of feature name -> (old value, new value),
+                 None stands for a feature missing from one side
+    """
+
+    __slots__ = ("start", "end", "changes")
+
+    def __init__(self, start, end, changes):
+        self.start = start
+        self.end = end
+        self.changes = changes
+
+    def __eq__(self, other):
+        return (isinstance(other, TimelineChange) and self.start == other.start
+                and self.end == other.end and self.changes == other.changes)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "%s-%s %s" % (self.start.strftime('%d %H:%M'), self.end.strftime('%d %H:%M'), self.changes)
+
+
+def _groups(timeline):
+    if isinstance(timeline, Decoder):
+        return timeline.groups
+    return timeline
+
+
+def flatten(groups):
+    """ Resolves a decoded group list into non-overlapping segments
+
+    Where groups overlap (e.g. a PROB group inside a TEMPO period),
+    the segment gets the first group in list order, just like
+    Decoder.get_group() picks it.
+
+    Returns:
+        List of (start, end, group) tuples sorted by time
+    """
+    boundaries = set()
+    for group in groups:
+        boundaries.add(group.start_time)
+        boundaries.add(group.end_time)
+    boundaries = sorted(boundaries)
+
+    order = sorted(range(len(groups)), key=lambda i: groups[i].start_time)
+    segments = []
+    active = []
+    next_group = 0
+    for start, end in zip(boundaries, boundaries[1:]):
+        while next_group < len(order) and groups[order[next_group]].start_time <= start:
+            active.append(order[next_group])
+            next_group += 1
+        active = [i for i in active if groups[i].end_time > start]
+        if not active:
+            continue
+
+        group = groups[min(active)]
+        if segments and segments[-1][2] is group and segments[-1][1] == start:
+            segments[-1] = (segments[-1][0], end, group)
+        else:
+            segments.append((start, end, group))
+
+    return segments
+
+
+def _compare(old, new, keys):
+    if old is new:
+        return {}
+    if keys is None:
+        keys = set(old)
+        keys.update(new)
+    changes = {}
+    for key in keys:
+        old_value = old.get(key)
+        new_value = new.get(key)
+        if old_value != new_value:
+            changes[key] = (old_value, new_value)
+    return changes
+
+
+def diff_timelines(old, new, keys=None, normalized=False):
+    """ Compares two decoded timelines of a station
+
+    Both timelines (Decoder objects or decoded group lists) are flattened
+    and merged in one pass over their sorted intervals. Only the time
+    covered by both of them is compared.
+
+    Args:
+        old, new: previous and current timeline
+        keys: optional collection of forecast keys to compare, all by default
+        normalized: compare TafGroup.normalized (ceiling_ft, visibility_m,
+                    wind_speed_kt, ...) rather than the forecast dicts, so
+                    the real ceiling is compared and reports using
+                    different units can be compared
+
+    Returns:
+        List of TimelineChange objects, adjacent ranges with the same
+        changes are coalesced
+    """
+    old_segments = flatten(_groups(old))
+    new_segments = flatten(_groups(new))
+
+    result = []
+    i = 0
+    j = 0
+    while i < len(old_segments) and j < len(new_segments):
+        old_start, old_end, old_group = old_segments[i]
+        new_start, new_end, new_group = new_segments[j]
+
+        start = max(old_start, new_start)
+        end = min(old_end, new_end)
+        if start < end:
+            if normalized:
+                changes = _compare(old_group.normalized, new_group.normalized, keys)
+            else:
+                changes = _compare(old_group.forecast, new_group.forecast, keys)
+            if changes:
+                last = result[-1] if result else None
+                if last is not None and last.end == start and last.changes == changes:
+                    last.end = end
+                else:
+                    result.append(TimelineChange(start, end, changes))
+
+        if old_end <= new_end:
+            i += 1
+        else:
+            j += 1
+
+    return result
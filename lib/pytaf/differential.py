@@ -0,0 +1,318 @@
+"""
+Differential testing of TAF parser/decoder implementations.
+
+A reference and a candidate implementation parse and decode the same
+reports; their headers, parsed groups, group time intervals, forecast
+dicts and decode_taf() text must be identical. Mismatching reports are
+minimized (tokens removed while the mismatch remains) to ease debugging,
+then both implementations are timed and their memory use measured.
+
+    python -m pytaf.differential corpus/ --candidate mypackage.fast
+
+An implementation is given as "module" or "module:attribute", naming
+anything with TAF and Decoder attributes that take the same arguments as
+pytaf.TAF and pytaf.Decoder (a module, a class), or an Implementation.
+"""
+
+import argparse
+import importlib
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from .taf import TAF
+from .tafdecoder import Decoder
+from .reader import read_reports
+
+
+# Compared outputs, in the order mismatches are reported
+ASPECTS = ["header", "groups", "intervals", "forecasts", "text"]
+
+# Upper bound of comparisons spent minimizing one report
+MINIMIZE_BUDGET = 500
+
+
+class Implementation(object):
+    """ A TAF parser and decoder pair """
+
+    def __init__(self, name, taf=TAF, decoder=Decoder):
+        self.name = name
+        self.taf = taf
+        self.decoder = decoder
+
+    def decode(self, report, timestamp):
+        taf = self.taf(report)
+        return (taf, self.decoder(taf, timestamp))
+
+    def __repr__(self):
+        return "<Implementation %s>" % self.name
+
+
+def load_implementation(spec):
+    """ Returns the Implementation named by "module" or "module:attribute" """
+    module_name, _, attribute = spec.partition(":")
+    obj = importlib.import_module(module_name)
+    for name in filter(None, attribute.split(".")):
+        obj = getattr(obj, name)
+    if isinstance(obj, Implementation):
+        return obj
+    if not (hasattr(obj, "TAF") and hasattr(obj, "Decoder")):
+        raise ValueError("%s has no TAF and Decoder attributes" % spec)
+    return Implementation(spec, obj.TAF, obj.Decoder)
+
+
+def _error(e):
+    return "%s: %s" % (e.__class__.__name__, getattr(e, "strerror", None) or e)
+
+
+def outcome(implementation, report, timestamp=None):
+    """ Parses and decodes a report, returns a dict of aspect -> output
+
+    An exception gives the "error" key alone if the report can't be parsed
+    and decoded, or the value of the aspect that raised it otherwise, so
+    failures are compared like any other output.
+    """
+    try:
+        taf, decoder = implementation.decode(report, timestamp)
+    except Exception as e:
+        return {"error": _error(e)}
+
+    getters = {
+        "header": lambda: dict(taf.get_header()),
+        "groups": lambda: [dict(group) for group in taf.get_groups()],
+        # Decoder leaves groups unset when decoding fails
+        "intervals": lambda: [(group.type, group.start_time, group.end_time) for group in decoder.groups],
+        "forecasts": lambda: [dict(group.forecast) for group in decoder.groups],
+        "text": decoder.decode_taf,
+    }
+    result = {}
+    for aspect in ASPECTS:
+        try:
+            result[aspect] = getters[aspect]()
+        except Exception as e:
+            result[aspect] = ("error", _error(e))
+    return result
+
+
+def _describe(reference, candidate):
+    # Short description of the first difference between two values
+    if isinstance(reference, list) and isinstance(candidate, list):
+        for i, (a, b) in enumerate(zip(reference, candidate)):
+            if a != b:
+                return "[%d] %s" % (i, _describe(a, b))
+        return "length %d != %d" % (len(reference), len(candidate))
+    if isinstance(reference, dict) and isinstance(candidate, dict):
+        for key in sorted(set(reference) | set(candidate), key=str):
+            if reference.get(key, KeyError) != candidate.get(key, KeyError):
+                return "%r: %r != %r" % (key, reference.get(key, "<missing>"), candidate.get(key, "<missing>"))
+    if isinstance(reference, str) and isinstance(candidate, str) and "\n" in reference + candidate:
+        for i, (a, b) in enumerate(zip(reference.split("\n"), candidate.split("\n"))):
+            if a != b:
+                return "line %d: %r != %r" % (i + 1, a, b)
+    return "%r != %r" % (reference, candidate)
+
+
+def compare(reference, candidate):
+    """ Compares two outcome() dicts
+
+    Returns:
+        List of (aspect, description of the first difference), empty if identical
+    """
+    if "error" in reference or "error" in candidate:
+        if reference.get("error") != candidate.get("error"):
+            return [("error", "%s != %s" % (reference.get("error", "<no error>"),
+                                            candidate.get("error", "<no error>")))]
+        return []
+    return [(aspect, _describe(reference[aspect], candidate[aspect]))
+            for aspect in ASPECTS if reference[aspect] != candidate[aspect]]
+
+
+def minimize(report, failing, budget=MINIMIZE_BUDGET):
+    """ Removes tokens from a report while failing(report) stays true
+
+    Tries removing chunks of whitespace separated tokens, halving the chunk
+    size when no chunk can go (delta debugging), within budget calls of
+    failing(). Returns the report unchanged if normalizing its whitespace
+    already makes the failure go away.
+    """
+    tokens = report.split()
+    if not failing(" ".join(tokens)):
+        return report
+    budget -= 1
+
+    chunks = 2
+    while len(tokens) > 1 and budget > 0:
+        size = -(-len(tokens) // chunks)
+        for start in range(0, len(tokens), size):
+            candidate = tokens[:start] + tokens[start + size:]
+            if not candidate or budget <= 0:
+                continue
+            budget -= 1
+            if failing(" ".join(candidate)):
+                tokens = candidate
+                chunks = max(chunks - 1, 2)
+                break
+        else:
+            if size == 1:
+                break
+            chunks = min(chunks * 2, len(tokens))
+    return " ".join(tokens)
+
+
+class Mismatch(object):
+    """ A report the implementations disagree on
+
+    Attributes:
+        report: the report as read
+        minimized: a reduced report with the same mismatch
+        differences: list of (aspect, description) for the report as read
+    """
+
+    __slots__ = ("report", "minimized", "differences")
+
+    def __init__(self, report, minimized, differences):
+        self.report = report
+        self.minimized = minimized
+        self.differences = differences
+
+    def __repr__(self):
+        return "<Mismatch %s: %s>" % (", ".join(aspect for aspect, description in self.differences),
+                                      self.minimized)
+
+
+def differential(reports, reference, candidate, timestamp=None, minimize_reports=True):
+    """ Compares two implementations on reports
+
+    Returns:
+        (number of reports compared, list of Mismatch)
+    """
+    count = 0
+    mismatches = []
+    for report in reports:
+        count += 1
+        differences = compare(outcome(reference, report, timestamp), outcome(candidate, report, timestamp))
+        if not differences:
+            continue
+        minimized = report
+        if minimize_reports:
+            aspect = differences[0][0]
+
+            def failing(text):
+                return aspect in [a for a, d in compare(outcome(reference, text, timestamp),
+                                                        outcome(candidate, text, timestamp))]
+            minimized = minimize(report, failing)
+        mismatches.append(Mismatch(report, minimized, differences))
+    return (count, mismatches)
+
+
+def _run(implementation, reports, timestamp):
+    kept = []
+    for report in reports:
+        try:
+            taf, decoder = implementation.decode(report, timestamp)
+            decoder.decode_taf()
+        except Exception:
+            continue
+        kept.append((taf, decoder))
+    return kept
+
+
+def benchmark(implementation, reports, timestamp=None, repeat=3):
+    """ Times parsing and decoding (with decode_taf()) of reports and measures their memory
+
+    Returns:
+        Dict with "seconds" (best of repeat runs), "reports_per_s",
+        "retained" (bytes held by the decoded reports) and "peak" (bytes)
+    """
+    best = None
+    for i in range(repeat):
+        started = time.perf_counter()
+        _run(implementation, reports, timestamp)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    # Separate run, tracing slows everything down
+    tracemalloc.start()
+    try:
+        kept = _run(implementation, reports, timestamp)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del kept
+
+    return {"seconds": best, "reports_per_s": len(reports) / best if best else 0.0,
+            "retained": retained, "peak": peak}
+
+
+def _format_summary(count, mismatches, reference, candidate, timings, out, shown):
+    out.write("%d reports compared, %d mismatches\n" % (count, len(mismatches)))
+    for mismatch in mismatches[:shown]:
+        out.write("\nmismatch: %s\n" % mismatch.minimized)
+        if mismatch.minimized != mismatch.report:
+            out.write("  original: %s\n" % " ".join(mismatch.report.split()))
+        for aspect, description in mismatch.differences:
+            out.write("  %s: %s\n" % (aspect, description))
+    if len(mismatches) > shown:
+        out.write("\n... %d more mismatches\n" % (len(mismatches) - shown))
+
+    if timings:
+        out.write("\n%-12s %12s %12s %14s %14s\n" % ("", "seconds", "reports/s", "retained KiB", "peak KiB"))
+        for label, implementation in (("reference", reference), ("candidate", candidate)):
+            timing = timings[implementation.name]
+            out.write("%-12s %12.3f %12.0f %14.1f %14.1f\n" % (label, timing["seconds"], timing["reports_per_s"],
+                                                              timing["retained"] / 1024.0, timing["peak"] / 1024.0))
+        ref, cand = timings[reference.name], timings[candidate.name]
+        if cand["seconds"] and ref["retained"]:
+            out.write("candidate is %.2fx as fast, retains %.1f%% of the memory\n" %
+                      (ref["seconds"] / cand["seconds"], 100.0 * cand["retained"] / ref["retained"]))
+
+
+def main(argv=None, out=None):
+    out = out or sys.stdout
+    parser = argparse.ArgumentParser(prog="python -m pytaf.differential",
+                                     description="Compares two TAF parser/decoder implementations on a corpus.")
+    parser.add_argument("paths", nargs="+", help="Corpus files or directories, \"-\" for stdin")
+    parser.add_argument("-r", "--reference", default="pytaf", help="Reference implementation (default: pytaf)")
+    parser.add_argument("-c", "--candidate", required=True, help="Candidate implementation, module[:attribute]")
+    parser.add_argument("-d", "--date", help="Year and month reports were issued in, YYYY-MM (default: current)")
+    parser.add_argument("-l", "--limit", type=int, help="Compare at most this many reports")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs per implementation (default: 3)")
+    parser.add_argument("--show", type=int, default=20, help="Mismatches to print (default: 20)")
+    parser.add_argument("--no-minimize", action="store_true", help="Don't minimize mismatching reports")
+    parser.add_argument("--no-benchmark", action="store_true", help="Only compare, don't time")
+    args = parser.parse_args(argv)
+
+    timestamp = None
+    if args.date:
+        try:
+            timestamp = datetime.strptime(args.date, "%Y-%m")
+        except ValueError:
+            parser.error("invalid date: %s" % args.date)
+    try:
+        reference = load_implementation(args.reference)
+        candidate = load_implementation(args.candidate)
+    except (ImportError, AttributeError, ValueError) as e:
+        parser.error(str(e))
+    if reference.name == candidate.name:
+        candidate.name += " (candidate)"
+
+    reports = []
+    for report in read_reports(args.paths):
+        if args.limit is not None and len(reports) >= args.limit:
+            break
+        reports.append(report)
+
+    count, mismatches = differential(reports, reference, candidate, timestamp,
+                                     minimize_reports=not args.no_minimize)
+    timings = {}
+    if not args.no_benchmark:
+        for implementation in (reference, candidate):
+            timings[implementation.name] = benchmark(implementation, reports, timestamp, max(1, args.repeat))
+
+    _format_summary(count, mismatches, reference, candidate, timings, out, args.show)
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
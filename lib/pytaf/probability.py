@@ -0,0 +1,181 @@
+from .alerts import OPERATORS
+from .tafdecoder import feature_field
+from .timeline import Timeline, PROB
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class BranchTable(object):
+    """ Prevailing and PROB branches of many decoded reports
+
+    The timelines of all stations are cut into intervals at every change
+    of the prevailing conditions and every PROB group boundary. Within an
+    interval each PROB group in effect is a branch weighted with its
+    probability (TafGroup.branch_forecast, the conditions it forecasts,
+    not the merged TafGroup.forecast), the prevailing conditions get the
+    remaining weight.
+
+    All branches of all stations are kept in flat columns, so expected
+    values and exceedance probabilities of a feature are computed in one
+    pass over the batch (with NumPy, if installed).
+
+    Values are None for the intervals of reports decoded without the
+    field of the feature (see Decoder fields=).
+
+    Attributes:
+        intervals: list of (station, start, end) tuples, one per interval
+    """
+
+    def __init__(self, decoders, normalized=True):
+        """
+        Args:
+            decoders: iterable of Decoder objects
+            normalized: use unit-normalized features (ceiling_ft, visibility_m, ...)
+        """
+        self.intervals = []
+        self._fields = []       # fields decoded for every interval, None for all
+        self._rows = []         # interval index of every branch
+        self._weights = []      # probability of every branch
+        self._forecasts = []    # feature dict of every branch
+        self._columns = {}
+
+        for decoder in decoders:
+            station = decoder._taf.get_header()["icao_code"]
+            self._add(station, Timeline(decoder), normalized, decoder.fields)
+
+    def _add(self, station, timeline, normalized, fields):
+        branches = [segment for segment in timeline.overlays if segment.layer == PROB]
+        boundaries = set()
+        for segment in timeline.base + branches:
+            boundaries.add(segment.start)
+            boundaries.add(segment.end)
+        boundaries = sorted(boundaries)
+
+        for start, end in zip(boundaries, boundaries[1:]):
+            base = timeline.base_at(start)
+            if base is None:
+                continue
+            row = len(self.intervals)
+            self.intervals.append((station, start, end))
+            self._fields.append(fields)
+
+            remaining = 1.0
+            for segment in timeline.overlays.stab(start):
+                if segment.layer != PROB or not segment.probability:
+                    continue
+                group = segment.group
+                forecast = group.branch_normalized if normalized else group.branch_forecast
+                if forecast is None:
+                    forecast = group.normalized if normalized else group.forecast
+                weight = min(segment.probability / 100.0, remaining)
+                remaining -= weight
+                self._append(row, weight, forecast)
+
+            base_group = base.group
+            self._append(row, remaining, base_group.normalized if normalized else base_group.forecast)
+
+    def _append(self, row, weight, forecast):
+        self._rows.append(row)
+        self._weights.append(weight)
+        self._forecasts.append(forecast)
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def _unknown(self, values, feature):
+        # None for the intervals where the feature's field was not decoded
+        field = feature_field(feature)
+        if field is not None:
+            for row, fields in enumerate(self._fields):
+                if fields is not None and field not in fields:
+                    values[row] = None
+        return values
+
+    def _column(self, feature):
+        # Feature values of all branches, NaN where missing
+        column = self._columns.get(feature)
+        if column is None:
+            nan = float("nan")
+            column = []
+            for forecast in self._forecasts:
+                value = forecast.get(feature)
+                column.append(nan if value is None else float(value))
+            self._columns[feature] = column
+        return column
+
+    def expected(self, feature, missing=None):
+        """ Probability-weighted expected value of a feature for every interval
+
+        Args:
+            feature: feature name
+            missing: value of the feature in branches without it, by default
+                     these branches are left out and the other weights rescaled
+
+        Returns:
+            List of expected values in interval order, None where no branch has the feature
+        """
+        values = self._column(feature)
+        n = len(self.intervals)
+        if numpy is not None:
+            v = numpy.asarray(values)
+            w = numpy.asarray(self._weights)
+            rows = numpy.asarray(self._rows, dtype=int)
+            present = ~numpy.isnan(v)
+            if missing is not None:
+                v = numpy.where(present, v, float(missing))
+                present = numpy.ones_like(present)
+            totals = numpy.bincount(rows, weights=numpy.where(present, w * numpy.nan_to_num(v), 0), minlength=n)
+            weights = numpy.bincount(rows, weights=numpy.where(present, w, 0), minlength=n)
+            return self._unknown([float(total / weight) if weight > 0 else None
+                                  for total, weight in zip(totals, weights)], feature)
+
+        totals = [0.0] * n
+        weights = [0.0] * n
+        for row, weight, value in zip(self._rows, self._weights, values):
+            if value != value:
+                if missing is None:
+                    continue
+                value = missing
+            totals[row] += weight * value
+            weights[row] += weight
+        return self._unknown([total / weight if weight > 0 else None for total, weight in zip(totals, weights)],
+                             feature)
+
+    def probability(self, feature, op, threshold):
+        """ Probability of a condition on a feature for every interval
+
+        e.g. table.probability("ceiling_ft", "<", 1000). Branches without
+        the feature do not meet the condition (no ceiling is not below 1000 ft).
+
+        Returns:
+            List of probabilities in interval order, None where the feature was not decoded
+        """
+        try:
+            compare = OPERATORS[op]
+        except KeyError:
+            raise ValueError("Unknown operator: %s" % op)
+        values = self._column(feature)
+        n = len(self.intervals)
+        if numpy is not None:
+            v = numpy.asarray(values)
+            with numpy.errstate(invalid="ignore"):
+                hits = compare(v, threshold) & ~numpy.isnan(v)
+            w = numpy.asarray(self._weights)
+            return self._unknown(numpy.bincount(numpy.asarray(self._rows, dtype=int), weights=numpy.where(hits, w, 0),
+                                                minlength=n).tolist(), feature)
+
+        result = [0.0] * n
+        for row, weight, value in zip(self._rows, self._weights, values):
+            if value == value and compare(value, threshold):
+                result[row] += weight
+        return self._unknown(result, feature)
+
+    def by_station(self, values):
+        """ Splits per-interval values into a dict of station -> list of (start, end, value) """
+        result = {}
+        for (station, start, end), value in zip(self.intervals, values):
+            result.setdefault(station, []).append((start, end, value))
+        return result
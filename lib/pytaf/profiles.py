@@ -0,0 +1,183 @@
+"""
+Regional parser profiles.
+
+TAF formats differ between regions: US (FAA) reports give visibility in
+statute miles and may contain wind shear groups, ICAO reports in Europe
+use 4-digit metric visibility and CAVOK. A profile lists the extractors
+TAF runs on every weather group. Every profile extracts all fields, they
+only differ in how ambiguous tokens are read: which visibility style
+wins when a group has both, and whether "TEMPO 1012" is an old style
+validity or a visibility.
+
+The profile of a report is chosen from its station's ICAO prefix, or
+detected from the report itself when the prefix is not known, so the same
+report always gets the same profile. Callers can override the profile of
+some stations with a dict of their own, e.g. {"ZBAA": "eu"}.
+"""
+
+import re
+
+
+class Profile(object):
+    """ Set of group extractors
+
+    Attributes:
+        name: profile name
+        extractors: (group key, TAF method name) pairs, run in order
+        skipped: group keys left empty
+    """
+
+    def __init__(self, name, extractors):
+        self.name = name
+        self.extractors = tuple(extractors)
+        used = set(key for key, method in self.extractors)
+        self.skipped = tuple(key for key in GROUP_KEYS if key not in used)
+        self._selections = {}
+
+    def select(self, fields):
+        """ Returns the profile restricted to the extractors of fields (see FIELDS), all if None """
+        if fields is None:
+            return self
+        fields = check_fields(fields)
+        profile = self._selections.get(fields)
+        if profile is None:
+            keys = set(key for field in fields for key in FIELDS[field])
+            profile = Profile(self.name, [(key, method) for key, method in self.extractors if key in keys])
+            self._selections[fields] = profile
+        return profile
+
+    def __repr__(self):
+        return "<Profile %s>" % self.name
+
+
+# Keys of a parsed group besides "header", with the value of a group that has none
+GROUP_KEYS = ("wind", "visibility", "clouds", "vertical_visibility", "weather", "windshear")
+
+EMPTY_VALUES = {
+    "wind": lambda: None,
+    "visibility": dict,
+    "clouds": list,
+    "vertical_visibility": lambda: None,
+    "weather": list,
+    "windshear": lambda: None,
+}
+
+
+# Fields callers can restrict parsing and decoding to (TafGroup.ATTRIBUTES),
+# with the group keys each one is decoded from. The ceiling is part of clouds.
+FIELDS = {
+    "wind": ("wind",),
+    "visibility": ("visibility", "vertical_visibility"),
+    "clouds": ("clouds",),
+    "weather": ("weather",),
+    "windshear": ("windshear",),
+}
+
+
+def check_fields(fields):
+    """ Returns fields as a frozenset (None for all fields)
+
+    Raises:
+        ValueError: unknown field name
+    """
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        fields = [fields]
+    fields = frozenset(fields)
+    unknown = fields.difference(FIELDS)
+    if unknown:
+        raise ValueError("Unknown field: %s" % ", ".join(sorted(unknown)))
+    return fields
+
+
+# Statute miles and metric visibility, wind shear: all extractors, as TAF always ran them
+DEFAULT = Profile("default", [
+    ("wind", "_parse_wind"),
+    ("visibility", "_parse_visibility"),
+    ("clouds", "_parse_clouds"),
+    ("vertical_visibility", "_parse_vertical_visibility"),
+    ("weather", "_parse_weather_phenomena"),
+    ("windshear", "_parse_wind_shear"),
+])
+
+US = Profile("us", [
+    ("wind", "_parse_wind"),
+    ("visibility", "_parse_visibility_us"),
+    ("clouds", "_parse_clouds"),
+    ("vertical_visibility", "_parse_vertical_visibility"),
+    ("weather", "_parse_weather_phenomena"),
+    ("windshear", "_parse_wind_shear"),
+])
+
+# Metric visibility first, with old style "TEMPO 1012" validity not taken for
+# visibility (the US profile looks for statute miles first). Profiles only
+# differ in how ambiguous tokens are read, every one extracts all keys.
+EU = Profile("eu", [
+    ("wind", "_parse_wind"),
+    ("visibility", "_parse_visibility_eu"),
+    ("clouds", "_parse_clouds"),
+    ("vertical_visibility", "_parse_vertical_visibility"),
+    ("weather", "_parse_weather_phenomena"),
+    ("windshear", "_parse_wind_shear"),
+])
+
+PROFILES = {profile.name: profile for profile in (DEFAULT, US, EU)}
+
+# ICAO prefix -> profile, the longest matching prefix wins
+PREFIXES = {
+    "K": US,    # contiguous US
+    "PA": US,   # Alaska
+    "PH": US,   # Hawaii
+    "PG": US,   # Guam
+    "TJ": US,   # Puerto Rico
+    "C": US,    # Canada reports in statute miles as well
+    "E": EU,    # northern Europe
+    "L": EU,    # southern Europe
+}
+
+_statute_miles_pattern = re.compile(r"\dSM(?=\s|$)")
+_metric_pattern = re.compile(r"(?<=\s)(?:\d{4}|CAVOK)(?=\s|$)")
+
+
+def get_profile(profile):
+    """ Returns a Profile given a Profile or its name """
+    if isinstance(profile, Profile):
+        return profile
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError("Unknown parser profile: %s" % profile)
+
+
+def profile_for_prefix(icao):
+    """ Returns the profile registered for the longest prefix of icao, or None """
+    for length in range(len(icao), 0, -1):
+        profile = PREFIXES.get(icao[:length])
+        if profile is not None:
+            return profile
+    return None
+
+
+def detect(report):
+    """ Guesses the profile from report text """
+    if _statute_miles_pattern.search(report):
+        return US
+    if _metric_pattern.search(report):
+        return EU
+    return DEFAULT
+
+
+def profile_for(icao, report, overrides=None):
+    """ Returns the profile of a report
+
+    Args:
+        icao: ICAO code of the station
+        report: report text, the profile is detected from it if the prefix is not known
+        overrides: dict of ICAO code -> profile (or its name) taking precedence, optional
+    """
+    if overrides:
+        profile = overrides.get(icao)
+        if profile is not None:
+            return get_profile(profile)
+    return profile_for_prefix(icao) or detect(report)
@@ -0,0 +1,113 @@
+import gzip
+import io
+import os
+import re
+import sys
+
+
+_GZIP_MAGIC = b"\x1f\x8b"
+
+_report_start = re.compile(r"^\s*TAF\b")
+
+
+class ReportSplitter(object):
+    """ Splits a stream of lines into individual TAF reports
+
+    A report ends with a line terminated by "=", with a blank line,
+    or when the next line starts a new report with "TAF".
+    Every line may carry a mark (e.g. the file offset of its end),
+    the mark of the last line of a report is returned with it,
+    so callers know how far the input has been consumed.
+    """
+
+    def __init__(self):
+        self._lines = []
+        self._mark = None
+
+    @property
+    def pending(self):
+        """ True if an incomplete report is buffered """
+        return bool(self._lines)
+
+    def push(self, line, mark=None):
+        """ Adds a line, returns a list of (report, mark) tuples completed by it """
+        reports = []
+        stripped = line.strip()
+
+        if not stripped:
+            if self._lines:
+                reports.append(self._flush())
+            self._mark = mark
+            return reports
+
+        if self._lines and _report_start.match(stripped):
+            reports.append(self._flush())
+
+        self._lines.append(stripped)
+        self._mark = mark
+
+        if stripped.endswith("="):
+            reports.append(self._flush())
+
+        return reports
+
+    def flush(self):
+        """ Returns the buffered incomplete report, if any, as a list of (report, mark) tuples """
+        if self._lines:
+            return [self._flush()]
+        return []
+
+    def _flush(self):
+        report = "\n".join(self._lines)
+        self._lines = []
+        return (report, self._mark)
+
+
+def iter_reports(lines):
+    """ Yields TAF report strings from an iterable of text lines """
+    splitter = ReportSplitter()
+    for line in lines:
+        for report, mark in splitter.push(line):
+            yield report
+    for report, mark in splitter.flush():
+        yield report
+
+
+def open_text(path):
+    """ Opens a file (or stdin for "-") for reading text, decompressing gzip transparently """
+    if path == "-":
+        stream = sys.stdin.buffer
+    else:
+        stream = open(path, "rb")
+
+    if not hasattr(stream, "peek"):
+        stream = io.BufferedReader(stream)
+    if stream.peek(2)[:2] == _GZIP_MAGIC:
+        stream = gzip.GzipFile(fileobj=stream)
+
+    return io.TextIOWrapper(stream, encoding="ascii", errors="replace")
+
+
+def iter_paths(paths):
+    """ Expands directories (recursively, in sorted order) into file paths """
+    for path in paths:
+        if path != "-" and os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def read_reports(paths):
+    """ Yields TAF report strings from files, directories and stdin ("-") """
+    for path in iter_paths(paths):
+        stream = open_text(path)
+        try:
+            for report in iter_reports(stream):
+                yield report
+        finally:
+            # Leave stdin open for whoever else wants it
+            if path != "-":
+                stream.close()
@@ -0,0 +1,180 @@
+from array import array
+from bisect import bisect_right
+from datetime import timedelta
+
+from .diff import flatten
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class FeatureRuns(object):
+    """ Run-length encoded samples of one feature
+
+    Sample i of the feature is the value of the run covering it, runs are
+    (value, repeat count) pairs, None where the feature is missing.
+    """
+
+    __slots__ = ("values", "counts", "_ends")
+
+    def __init__(self):
+        self.values = []
+        self.counts = []
+        self._ends = []
+
+    def append(self, value, count):
+        if self.values and self.values[-1] == value:
+            self.counts[-1] += count
+            self._ends[-1] += count
+        else:
+            self.values.append(value)
+            self.counts.append(count)
+            self._ends.append((self._ends[-1] if self._ends else 0) + count)
+
+    def runs(self):
+        """ Returns the list of (value, repeat count) pairs """
+        return list(zip(self.values, self.counts))
+
+    def __len__(self):
+        return self._ends[-1] if self._ends else 0
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("sample index out of range")
+        return self.values[bisect_right(self._ends, index)]
+
+    def expand(self, fill=None):
+        """ Returns the dense list of samples, missing values replaced by fill """
+        result = []
+        for value, count in zip(self.values, self.counts):
+            result.extend([fill if value is None else value] * count)
+        return result
+
+    def to_array(self, fill=float("nan")):
+        """ Returns the samples as a float array, a NumPy array if NumPy is installed """
+        values = [fill if value is None else float(value) for value in self.values]
+        if numpy is not None:
+            return numpy.repeat(numpy.asarray(values, dtype=float), self.counts)
+        result = array("d")
+        for value, count in zip(values, self.counts):
+            result.extend(array("d", [value]) * count)
+        return result
+
+    def __repr__(self):
+        return "<FeatureRuns %s>" % self.runs()
+
+
+class Resampled(object):
+    """ Forecast features sampled at fixed steps
+
+    Sample i is taken at start + i * step, with the values of the group
+    Decoder.get_group() would return for that time.
+
+    Attributes:
+        start: time of the first sample
+        step: timedelta between samples
+        count: number of samples
+        features: dict of feature name -> FeatureRuns
+    """
+
+    def __init__(self, start, step, count, features):
+        self.start = start
+        self.step = step
+        self.count = count
+        self.features = features
+
+    def __len__(self):
+        return self.count
+
+    def time(self, index):
+        """ Returns the time of sample index """
+        return self.start + index * self.step
+
+    def index(self, timestamp):
+        """ Returns the index of the last sample at or before timestamp, or None """
+        index = (timestamp - self.start) // self.step
+        if 0 <= index < self.count:
+            return index
+        return None
+
+    def __getitem__(self, index):
+        """ Returns the features of sample index as a dict (missing features left out) """
+        result = {}
+        for name, runs in self.features.items():
+            value = runs[index]
+            if value is not None:
+                result[name] = value
+        return result
+
+    def dense(self, fill=None):
+        """ Returns a dict of feature name -> list of all samples """
+        return {name: runs.expand(fill) for name, runs in self.features.items()}
+
+
+def _count(delta, step):
+    # Number of samples at start + i * step before start + delta, i >= 0
+    if delta <= timedelta(0):
+        return 0
+    return -(-delta // step)
+
+
+def resample(decoder, step, start=None, end=None, normalized=False, features=None):
+    """ Samples a decoded TAF at fixed steps
+
+    Samples are never computed one by one: every flattened segment of the
+    timeline covers a range of sample indexes, which is added to the runs
+    of each feature at once.
+
+    Args:
+        decoder: Decoder object
+        step: timedelta, or number of minutes
+        start, end: sampled time range [start, end), the validity period of the report by default
+        normalized: sample TafGroup.normalized instead of TafGroup.forecast
+        features: names of the features to sample, all features present by default
+
+    Returns:
+        Resampled object
+    """
+    if not isinstance(step, timedelta):
+        step = timedelta(minutes=step)
+    if step <= timedelta(0):
+        raise ValueError("Sampling step must be positive")
+    if start is None:
+        start = decoder.start_time
+    if end is None:
+        end = decoder.end_time
+    count = _count(end - start, step)
+
+    # (first sample, sample count, forecast) of every segment with samples, in time order
+    pieces = []
+    for segment_start, segment_end, group in flatten(decoder.groups):
+        first = _count(segment_start - start, step)
+        last = min(_count(segment_end - start, step), count)
+        if first < last:
+            pieces.append((first, last - first, group.normalized if normalized else group.forecast))
+
+    if features is None:
+        names = set()
+        for first, samples, forecast in pieces:
+            names.update(forecast)
+        features = sorted(names)
+
+    result = {}
+    for name in features:
+        runs = FeatureRuns()
+        position = 0
+        for first, samples, forecast in pieces:
+            if first > position:
+                # Not covered by any group
+                runs.append(None, first - position)
+            runs.append(forecast.get(name), samples)
+            position = first + samples
+        if count > position:
+            runs.append(None, count - position)
+        result[name] = runs
+
+    return Resampled(start, step, count, result)
@@ -0,0 +1,100 @@
+"""
+JSON serialization of parsed and decoded TAFs.
+
+Decoded TAF document (Decoder.to_json()):
+
+    {
+      "station":    "KDEN",                  ICAO code
+      "issued":     "2016-11-29T11:34Z",     issuance time, UTC
+      "valid_from": "2016-11-29T12:00Z",     start of the first group
+      "valid_till": "2016-11-30T18:00Z",     end of the last group
+      "raw":        "TAF KDEN 291134Z ...",  report text
+      "groups": [                            decoded groups sorted by start time
+        {"type": "FM", "start": "...", "end": "...",
+         "forecast": {"wind_speed_KT": 6, ...}}     TafGroup.forecast (or .normalized)
+      ]
+    }
+
+Parsed TAF document (TAF.to_json()):
+
+    {"raw": "...", "header": {...}, "groups": [{...}, ...], "maintenance": "$" or null}
+
+with the dicts returned by get_header() and get_groups().
+
+Documents are compact UTF-8 JSON bytes, produced by orjson when it
+is installed and by the standard json module otherwise.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj):
+    """ Serializes obj to compact JSON bytes """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def format_time(timestamp):
+    if timestamp is None:
+        return None
+    return timestamp.strftime("%Y-%m-%dT%H:%MZ")
+
+
+class DecodedDocument(object):
+    """ Pre-serialized JSON document of a decoded TAF
+
+    The document envelope and every group are serialized once, time
+    window slices are assembled from the cached group fragments.
+    """
+
+    def __init__(self, decoder, normalized=False):
+        groups = getattr(decoder, "groups", None) or []
+        envelope = {
+            "station": decoder._taf.get_header()["icao_code"],
+            "issued": format_time(getattr(decoder, "issued_timestamp", None)),
+            "valid_from": format_time(groups[0].start_time) if groups else None,
+            "valid_till": format_time(groups[-1].end_time) if groups else None,
+            "raw": decoder._taf.get_taf(),
+        }
+        # Envelope without the closing brace, groups are appended to it
+        self._prefix = dumps(envelope)[:-1] + b',"groups":['
+        self._suffix = b']}'
+
+        self._intervals = []
+        self._fragments = []
+        for group in groups:
+            self._intervals.append((group.start_time, group.end_time))
+            self._fragments.append(dumps({
+                "type": group.type,
+                "start": format_time(group.start_time),
+                "end": format_time(group.end_time),
+                "forecast": group.normalized if normalized else group.forecast,
+            }))
+
+        self._full = self._prefix + b",".join(self._fragments) + self._suffix
+
+    def full(self):
+        return self._full
+
+    def window(self, start=None, end=None):
+        """ Returns the document with only the groups overlapping [start, end) """
+        if start is None and end is None:
+            return self._full
+        fragments = [fragment for (group_start, group_end), fragment in zip(self._intervals, self._fragments)
+                     if (end is None or group_start < end) and (start is None or group_end > start)]
+        return self._prefix + b",".join(fragments) + self._suffix
+
+
+def taf_document(taf):
+    return dumps({
+        "raw": taf.get_taf(),
+        "header": taf.get_header(),
+        "groups": taf.get_groups(),
+        "maintenance": taf.get_maintenance(),
+    })
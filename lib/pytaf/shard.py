@@ -0,0 +1,422 @@
+"""
+Station-sharded forecast service.
+
+Stations (ICAO codes) are assigned to worker processes with a consistent
+hash ring. Every shard parses, decodes and keeps the latest report of its
+own stations; a ShardRouter in the calling process sends ingest batches
+and queries to the owning shards over pipes, talking to all shards
+involved in a request before waiting for any of them.
+
+    router = ShardRouter(shards=8)
+    router.ingest(reports, timestamp)
+    router.forecast(["KDEN", "KJFK"], datetime(2016, 11, 29, 18, 0))
+    router.close()
+
+A router is not thread safe, give each thread its own or serialize calls.
+"""
+
+import hashlib
+import multiprocessing
+import re
+from bisect import bisect_right
+
+from .taf import TAF, MalformedTAF
+from .tafdecoder import Decoder, DecodeError
+from .profiles import check_fields
+
+
+# Points per shard on the hash ring, more points spread stations more evenly
+REPLICAS = 64
+
+_station_pattern = re.compile(r"^\s*(?:TAF\s+)*(?:(?:COR|AMD|RTD)\s+)?(?P<icao_code>[A-Z]{4})\b")
+
+
+class ShardError(Exception):
+    def __init__(self, msg):
+        self.strerror = msg
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing(object):
+    """ Consistent hash ring
+
+    Each node is placed at several points of the ring, a key belongs to
+    the node of the first point at or after its hash. Adding or removing
+    a node only moves the keys of the ring sections it gains or loses,
+    about 1/N of them.
+    """
+
+    def __init__(self, nodes=(), replicas=REPLICAS):
+        self.replicas = replicas
+        self._points = []    # sorted hashes
+        self._owners = []    # node of each point
+        self._nodes = set()
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        if node in self._nodes:
+            return
+        self._nodes.add(node)
+        points = sorted(zip(self._points + [_hash("%s#%d" % (node, i)) for i in range(self.replicas)],
+                            self._owners + [node] * self.replicas))
+        self._points = [point for point, owner in points]
+        self._owners = [owner for point, owner in points]
+
+    def remove(self, node):
+        if node not in self._nodes:
+            return
+        self._nodes.discard(node)
+        points = [(point, owner) for point, owner in zip(self._points, self._owners) if owner != node]
+        self._points = [point for point, owner in points]
+        self._owners = [owner for point, owner in points]
+
+    @property
+    def nodes(self):
+        return sorted(self._nodes)
+
+    def node_for(self, key):
+        if not self._points:
+            raise ShardError("No shards")
+        index = bisect_right(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+    def __len__(self):
+        return len(self._nodes)
+
+
+def station_of(report):
+    """ ICAO code of a report, without parsing all of it """
+    m = _station_pattern.match(report)
+    if m:
+        return m.group("icao_code")
+    return None
+
+
+class _Store(object):
+    """ Latest decoded report of each station of a shard """
+
+    def __init__(self, fields=None):
+        self._fields = fields
+        self._stations = {}   # icao -> (report, issuance time, decoder)
+
+    def ingest(self, items):
+        """ Parses and decodes (report, timestamp) pairs, returns (stored, errors) """
+        stored = 0
+        errors = []
+        for report, timestamp in items:
+            try:
+                taf = TAF(report, fields=self._fields)
+                decoder = Decoder(taf, timestamp)
+                if not getattr(decoder, "groups", None):
+                    raise DecodeError("No decodable groups")
+            except (MalformedTAF, DecodeError) as e:
+                errors.append((report, e.strerror))
+                continue
+            except Exception as e:
+                errors.append((report, "%s: %s" % (e.__class__.__name__, e)))
+                continue
+
+            icao = taf.get_header()["icao_code"]
+            current = self._stations.get(icao)
+            if current is not None and decoder.issued_timestamp is not None and \
+                    current[2].issued_timestamp is not None and \
+                    current[2].issued_timestamp > decoder.issued_timestamp:
+                # Older than what we have, e.g. replayed traffic
+                continue
+            # The issuance time, not timestamp (the current time if None), decodes the
+            # report again in the same month when it moves to another shard
+            self._stations[icao] = (report, decoder.issued_timestamp or timestamp, decoder)
+            stored += 1
+        return (stored, errors)
+
+    def forecast(self, stations, timestamp, normalized):
+        result = {}
+        for icao in stations:
+            current = self._stations.get(icao)
+            group = None
+            if current is not None:
+                decoder = current[2]
+                if decoder.start_time <= timestamp < decoder.end_time:
+                    group = decoder.get_group(timestamp)
+            if group is None:
+                result[icao] = None
+            else:
+                result[icao] = dict(group.normalized if normalized else group.forecast)
+        return result
+
+    def decoded(self, stations):
+        result = {}
+        for icao in stations:
+            current = self._stations.get(icao)
+            result[icao] = current[2].decode_taf() if current is not None else None
+        return result
+
+    def stations(self):
+        return sorted(self._stations)
+
+    def export(self, stations):
+        return [self._stations[icao][:2] for icao in stations if icao in self._stations]
+
+    def drop(self, stations):
+        for icao in stations:
+            self._stations.pop(icao, None)
+        return len(self._stations)
+
+
+def _serve(conn, fields=None):
+    """ Shard process main loop: executes (method, args) requests on its store """
+    store = _Store(fields)
+    while True:
+        try:
+            method, args = conn.recv()
+        except EOFError:
+            break
+        if method == "stop":
+            conn.send((True, None))
+            break
+        try:
+            conn.send((True, getattr(store, method)(*args)))
+        except Exception as e:
+            conn.send((False, "%s: %s" % (e.__class__.__name__, e)))
+    conn.close()
+
+
+class _Shard(object):
+
+    def __init__(self, name, context, fields=None):
+        self.name = name
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child, fields), name="pytaf-shard-%s" % name,
+                                       daemon=True)
+        self.process.start()
+        child.close()
+
+    def send(self, method, *args):
+        try:
+            self.conn.send((method, args))
+        except OSError:
+            raise ShardError("Shard %s is not running" % self.name)
+
+    def receive(self):
+        try:
+            ok, result = self.conn.recv()
+        except (EOFError, OSError):
+            raise ShardError("Shard %s is not running" % self.name)
+        if not ok:
+            raise ShardError("Shard %s: %s" % (self.name, result))
+        return result
+
+    def call(self, method, *args):
+        self.send(method, *args)
+        return self.receive()
+
+    def stop(self):
+        try:
+            self.call("stop")
+        except ShardError:
+            pass
+        self.conn.close()
+        self.process.join()
+
+
+class ShardRouter(object):
+    """ Front end of a set of shard processes """
+
+    def __init__(self, shards=4, replicas=REPLICAS, context=None, fields=None):
+        """
+        Args:
+            shards: number of shard processes to start
+            replicas: points per shard on the hash ring
+            context: multiprocessing context, the default one if None
+            fields: fields shards parse and decode (see pytaf.TAF), all if None
+        """
+        self._context = context or multiprocessing.get_context()
+        self._fields = check_fields(fields)
+        self._ring = HashRing(replicas=replicas)
+        self._shards = {}
+        self._next_name = 0
+        for i in range(shards):
+            self._start_shard()
+
+    def _start_shard(self):
+        name = "shard-%d" % self._next_name
+        self._next_name += 1
+        self._shards[name] = _Shard(name, self._context, self._fields)
+        self._ring.add(name)
+        return name
+
+    @property
+    def shards(self):
+        return self._ring.nodes
+
+    def shard_for(self, station):
+        return self._ring.node_for(station)
+
+    def _partition(self, keys, station=lambda key: key):
+        parts = {}
+        for key in keys:
+            parts.setdefault(self._ring.node_for(station(key)), []).append(key)
+        return parts
+
+    def _fan_out(self, method, parts, *args, partial=False):
+        # Send everything first, so shards work in parallel, then collect. With
+        # partial=True the result of a failed (e.g. dead) shard is its ShardError,
+        # otherwise the first error is raised once all replies are read.
+        failed = {}
+        for name, part in parts.items():
+            try:
+                self._shards[name].send(method, part, *args)
+            except ShardError as e:
+                failed[name] = e
+        results = []
+        for name in parts:
+            # Read every reply even if one failed, or the pipes get out of step
+            if name not in failed:
+                try:
+                    results.append((name, self._shards[name].receive()))
+                    continue
+                except ShardError as e:
+                    failed[name] = e
+            results.append((name, failed[name]))
+        if failed and not partial:
+            raise failed[next(name for name in parts if name in failed)]
+        return results
+
+    def ingest(self, reports, timestamp=None):
+        """ Sends reports to the shards owning their stations
+
+        Args:
+            reports: iterable of report strings
+            timestamp: time the reports were received, used by Decoder to complete dates
+
+        Returns:
+            (number of reports stored, list of (report, error message)),
+            reports of a shard that is not running are errors too
+        """
+        errors = []
+        items = []
+        for report in reports:
+            if station_of(report) is None:
+                errors.append((report, "No valid TAF header found"))
+            else:
+                items.append((report, timestamp))
+
+        stored = 0
+        parts = self._partition(items, lambda item: station_of(item[0]))
+        for name, result in self._fan_out("ingest", parts, partial=True):
+            if isinstance(result, ShardError):
+                errors.extend((report, result.strerror) for report, timestamp in parts[name])
+                continue
+            count, shard_errors = result
+            stored += count
+            errors.extend(shard_errors)
+        return (stored, errors)
+
+    def forecast(self, stations, timestamp, normalized=False):
+        """ Returns a dict of station -> forecast features at timestamp (None if not available) """
+        result = {}
+        for name, part in self._fan_out("forecast", self._partition(stations), timestamp, normalized):
+            result.update(part)
+        return result
+
+    def decode_taf(self, stations):
+        """ Returns a dict of station -> decoded text of its latest report """
+        result = {}
+        for name, part in self._fan_out("decoded", self._partition(stations)):
+            result.update(part)
+        return result
+
+    def stations(self):
+        """ Returns a dict of shard name -> stations it holds """
+        for shard in self._shards.values():
+            shard.send("stations")
+        return {name: shard.receive() for name, shard in self._shards.items()}
+
+    def _rebalance(self):
+        # Move the stations whose owner changed, and only those. They are copied
+        # first and only dropped from their old shards once every copy is stored;
+        # otherwise the copies are dropped again and ShardError is raised.
+        moves = []
+        for name, stations in self.stations().items():
+            leaving = [station for station in stations if self._ring.node_for(station) != name]
+            if leaving:
+                moves.append((name, leaving, self._shards[name].call("export", leaving)))
+
+        copied = []
+        try:
+            for name, leaving, items in moves:
+                for target, part in self._partition(items, lambda item: station_of(item[0])).items():
+                    copied.append((target, [station_of(report) for report, timestamp in part]))
+                    stored, errors = self._shards[target].call("ingest", part)
+                    if stored != len(part):
+                        raise ShardError("Shard %s stored %d of %d moved stations%s" %
+                                         (target, stored, len(part), ": %s" % errors[0][1] if errors else ""))
+        except ShardError:
+            for target, stations in copied:
+                try:
+                    self._shards[target].call("drop", stations)
+                except ShardError:
+                    pass
+            raise
+
+        moved = 0
+        for name, leaving, items in moves:
+            self._shards[name].call("drop", leaving)
+            moved += len(leaving)
+        return moved
+
+    def add_shard(self):
+        """ Starts a new shard and moves the stations it now owns to it
+
+        Returns:
+            (shard name, number of stations moved)
+
+        Raises:
+            ShardError: a station could not be moved, the new shard is stopped
+                        and the stations stay where they were
+        """
+        name = self._start_shard()
+        try:
+            return (name, self._rebalance())
+        except ShardError:
+            self._ring.remove(name)
+            self._shards.pop(name).stop()
+            raise
+
+    def remove_shard(self, name):
+        """ Hands the stations of a shard over to the others and stops it
+
+        Returns:
+            number of stations moved
+
+        Raises:
+            ShardError: no such shard, it is the last one, or a station could
+                        not be moved (the shard then keeps running with its stations)
+        """
+        if name not in self._shards:
+            raise ShardError("No such shard: %s" % name)
+        if len(self._shards) == 1:
+            raise ShardError("Can't remove the last shard")
+        self._ring.remove(name)
+        try:
+            moved = self._rebalance()
+        except ShardError:
+            self._ring.add(name)
+            raise
+        self._shards.pop(name).stop()
+        return moved
+
+    def close(self):
+        for shard in self._shards.values():
+            shard.stop()
+        self._shards = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,380 @@
+"""
+Shared-memory snapshots of decoded forecast timelines.
+
+One ingest process publishes all current timelines into a
+multiprocessing.shared_memory segment per generation, any number of
+worker processes attach read-only and switch to the newest generation
+when they refresh.
+
+Segment layout (little endian, all sections 8-byte aligned):
+
+    header      magic "PYTAFSNP", version, station count, feature count,
+                row count, generation, length of the feature name list
+    features    feature names, comma separated ASCII
+    stations    per station: ICAO code (4 bytes), first row, row count
+    intervals   per row (non-overlapping, see diff.flatten): start and end as int64 seconds since the epoch
+    columns     per feature: one float64 per row, NaN where missing
+
+A separate small control segment holds the current generation number,
+which the publisher overwrites in one aligned 8-byte store after the new
+generation is complete.
+"""
+
+import math
+import mmap
+import os
+import struct
+import sys
+from bisect import bisect_right
+from calendar import timegm
+from datetime import datetime, timedelta
+from multiprocessing import shared_memory
+
+from .diff import flatten
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import _posixshmem
+except ImportError:
+    _posixshmem = None
+
+
+MAGIC = b"PYTAFSNP"
+VERSION = 1
+
+# Unit-normalized features (see TafGroup.normalized), plus flags
+DEFAULT_FEATURES = ["prob", "wind_dir_deg", "wind_speed_kt", "wind_gust_kt",
+                    "visibility_m", "vertical_visibility_ft", "ceiling_ft", "clouds_base_ft",
+                    "sky_clear", "weather", "windshear", "windshear_alt_ft", "windshear_speed_kt"]
+
+_header = struct.Struct("<8sIIIIQI")
+_station = struct.Struct("<4sII")
+_control = struct.Struct("<8sQ")
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class SnapshotError(Exception):
+    def __init__(self, msg):
+        self.strerror = msg
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def _segment_name(name, generation):
+    return "%s-%d" % (name, generation)
+
+
+class _Mapping(object):
+    """ Read-only view of a segment created by a SharedMemory elsewhere
+
+    Only the publisher owns and unlinks segments. On POSIX, attaching a
+    SharedMemory registers the segment with the resource tracker, which
+    unlinks it when the reader exits. Python 3.13 can opt out (track=False).
+    Before that, unregistering does not help either: the tracker is shared
+    with the parent process and keeps one entry per name, so a reader
+    unregistering would also drop the publisher's registration. Older
+    CPython versions therefore map the segment read-only with _posixshmem,
+    the module SharedMemory itself uses. Windows keeps named memory alive
+    while any handle is open and has no tracker, SharedMemory is used as is.
+    Without _posixshmem (other interpreters) the segment is attached with
+    SharedMemory, and a reader exiting may unlink it.
+    """
+
+    def __init__(self, name):
+        self._shm = None
+        self._mmap = None
+        if sys.version_info >= (3, 13):
+            self._shm = shared_memory.SharedMemory(name=name, track=False)
+        elif os.name == "posix" and _posixshmem is not None:
+            fd = _posixshmem.shm_open("/" + name, os.O_RDONLY, mode=0o600)
+            try:
+                self._mmap = mmap.mmap(fd, os.fstat(fd).st_size, access=mmap.ACCESS_READ)
+            finally:
+                os.close(fd)
+            self.buf = memoryview(self._mmap)
+            return
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self.buf = self._shm.buf.toreadonly()
+
+    def close(self):
+        """ Unmaps the segment, raises BufferError while views into it are alive """
+        self.buf.release()
+        if self._shm is not None:
+            self._shm.close()
+        else:
+            self._mmap.close()
+
+
+class _Layout(object):
+
+    def __init__(self, n_stations, features, n_rows):
+        self.names = ",".join(features).encode("ascii")
+        self.names_offset = _header.size
+        self.stations_offset = _align(self.names_offset + len(self.names))
+        self.intervals_offset = _align(self.stations_offset + _station.size * n_stations)
+        self.columns_offset = self.intervals_offset + 16 * n_rows
+        self.size = self.columns_offset + 8 * n_rows * len(features)
+
+
+class SnapshotPublisher(object):
+    """ Writes decoded timelines into shared memory, one segment per generation """
+
+    def __init__(self, name, features=None):
+        self._name = name
+        self._features = list(features or DEFAULT_FEATURES)
+        self._segments = []
+        self.generation = 0
+
+        self._control = shared_memory.SharedMemory(name=name, create=True, size=_control.size)
+        _control.pack_into(self._control.buf, 0, MAGIC, 0)
+
+    def publish(self, decoders):
+        """ Publishes a new generation
+
+        Args:
+            decoders: iterable of Decoder objects, one per station
+
+        Returns:
+            The new generation number
+        """
+        stations = []
+        n_rows = 0
+        for decoder in decoders:
+            segments = flatten(getattr(decoder, "groups", None) or [])
+            if not segments:
+                continue
+            icao = decoder._taf.get_header()["icao_code"].encode("ascii")
+            stations.append((icao, n_rows, segments))
+            n_rows += len(segments)
+
+        generation = self.generation + 1
+        layout = _Layout(len(stations), self._features, n_rows)
+        shm = shared_memory.SharedMemory(name=_segment_name(self._name, generation), create=True,
+                                         size=max(layout.size, 1))
+        buf = shm.buf
+
+        _header.pack_into(buf, 0, MAGIC, VERSION, len(stations), len(self._features), n_rows,
+                          generation, len(layout.names))
+        buf[layout.names_offset:layout.names_offset + len(layout.names)] = layout.names
+
+        intervals = buf[layout.intervals_offset:layout.columns_offset].cast("q")
+        columns = buf[layout.columns_offset:layout.size].cast("d")
+        nan = float("nan")
+        for index, (icao, first_row, segments) in enumerate(stations):
+            _station.pack_into(buf, layout.stations_offset + index * _station.size, icao, first_row, len(segments))
+            for row, (start, end, group) in enumerate(segments, first_row):
+                intervals[2 * row] = timegm(start.timetuple())
+                intervals[2 * row + 1] = timegm(end.timetuple())
+                values = group.normalized
+                for feature_index, feature in enumerate(self._features):
+                    value = values.get(feature)
+                    columns[feature_index * n_rows + row] = nan if value is None else value
+        intervals.release()
+        columns.release()
+
+        # Readers only see the new generation once it is complete
+        struct.pack_into("<Q", self._control.buf, 8, generation)
+        self.generation = generation
+
+        # Keep the previous generation around for readers still switching over
+        self._segments.append(shm)
+        while len(self._segments) > 2:
+            old = self._segments.pop(0)
+            old.close()
+            old.unlink()
+
+        return generation
+
+    def close(self):
+        """ Removes all segments, attached readers keep their current mapping """
+        for shm in self._segments:
+            shm.close()
+            shm.unlink()
+        self._segments = []
+        self._control.close()
+        self._control.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class StationSnapshot(object):
+    """ Read-only, zero-copy view of one station's timeline
+
+    Attributes:
+        icao: station ICAO code
+        starts, ends: interval bounds, seconds since the epoch
+        columns: dict of feature name -> values (NaN where missing)
+
+    The sequences are NumPy arrays when NumPy is installed,
+    memoryviews of the shared segment otherwise.
+    """
+
+    def __init__(self, icao, starts, ends, columns):
+        self.icao = icao
+        self.starts = starts
+        self.ends = ends
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.starts)
+
+    def index(self, timestamp):
+        """ Returns the row containing timestamp (a datetime), or None """
+        seconds = timegm(timestamp.timetuple())
+        row = bisect_right(self.starts, seconds) - 1
+        if row >= 0 and seconds < self.ends[row]:
+            return row
+        return None
+
+    def get(self, timestamp):
+        """ Returns the features in effect at timestamp as a dict (missing features left out) """
+        row = self.index(timestamp)
+        if row is None:
+            return None
+        result = {}
+        for feature, column in self.columns.items():
+            value = float(column[row])
+            if not math.isnan(value):
+                result[feature] = value
+        return result
+
+    def interval(self, row):
+        return (_EPOCH + timedelta(seconds=int(self.starts[row])),
+                _EPOCH + timedelta(seconds=int(self.ends[row])))
+
+
+class SnapshotReader(object):
+    """ Attaches to the snapshots of a SnapshotPublisher, read-only """
+
+    def __init__(self, name):
+        self._name = name
+        self._control = _Mapping(name)
+        magic, generation = _control.unpack_from(self._control.buf, 0)
+        if magic != MAGIC:
+            self._control.close()
+            raise SnapshotError("Not a pytaf snapshot: %s" % name)
+        self._shm = None
+        self._exported = []
+        self._retired = []
+        self._views = {}
+        self.generation = 0
+        self.features = []
+        self.refresh()
+
+    def refresh(self):
+        """ Switches to the newest published generation
+
+        Returns:
+            True if a new generation was attached
+        """
+        self._close_retired()
+        while True:
+            generation = struct.unpack_from("<Q", self._control.buf, 8)[0]
+            if generation == self.generation:
+                return False
+            try:
+                shm = _Mapping(_segment_name(self._name, generation))
+            except FileNotFoundError:
+                # Superseded while we were looking, try the next one
+                continue
+            break
+
+        buf = shm.buf
+        magic, version, n_stations, n_features, n_rows, _, names_len = _header.unpack_from(buf, 0)
+        if magic != MAGIC or version != VERSION:
+            shm.close()
+            raise SnapshotError("Unsupported snapshot segment")
+
+        names = bytes(buf[_header.size:_header.size + names_len]).decode("ascii")
+        features = names.split(",") if names else []
+        layout = _Layout(n_stations, features, n_rows)
+
+        readonly = buf.toreadonly()
+        if numpy is not None:
+            intervals = numpy.frombuffer(readonly, dtype="<i8", count=2 * n_rows, offset=layout.intervals_offset)
+            columns = numpy.frombuffer(readonly, dtype="<f8", count=n_features * n_rows,
+                                       offset=layout.columns_offset)
+        else:
+            intervals = readonly[layout.intervals_offset:layout.columns_offset].cast("q")
+            columns = readonly[layout.columns_offset:layout.size].cast("d")
+        exported = [readonly, intervals, columns]
+
+        views = {}
+        for index in range(n_stations):
+            icao, first_row, count = _station.unpack_from(buf, layout.stations_offset + index * _station.size)
+            icao = icao.decode("ascii")
+            starts = intervals[2 * first_row:2 * (first_row + count):2]
+            ends = intervals[2 * first_row + 1:2 * (first_row + count):2]
+            station_columns = {}
+            for feature_index, feature in enumerate(features):
+                start = feature_index * n_rows + first_row
+                station_columns[feature] = columns[start:start + count]
+            views[icao] = StationSnapshot(icao, starts, ends, station_columns)
+            exported.extend([starts, ends])
+            exported.extend(station_columns.values())
+
+        if self._shm is not None:
+            self._retired.append((self._shm, self._exported))
+        self._shm = shm
+        self._exported = exported
+        self._views = views
+        self.features = features
+        self.generation = generation
+        return True
+
+    def _close_retired(self):
+        # Old segments can only be unmapped once nobody holds views into them
+        still_used = []
+        for shm, exported in self._retired:
+            try:
+                shm.close()
+            except BufferError:
+                still_used.append((shm, exported))
+        self._retired = still_used
+
+    @property
+    def stations(self):
+        return sorted(self._views)
+
+    def station(self, icao):
+        """ Returns the StationSnapshot of a station, or None """
+        return self._views.get(icao)
+
+    def get(self, icao, timestamp):
+        """ Returns the features in effect for a station at timestamp """
+        view = self._views.get(icao)
+        if view is None:
+            return None
+        return view.get(timestamp)
+
+    def close(self):
+        """ Detaches from all generations, StationSnapshots obtained earlier become invalid """
+        if self._shm is not None:
+            self._retired.append((self._shm, self._exported))
+            self._shm = None
+        self._views = {}
+        self._exported = []
+        for shm, exported in self._retired:
+            for view in reversed(exported):
+                if isinstance(view, memoryview):
+                    view.release()
+        self._close_retired()
+        self._control.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,5 +1,11 @@
 import re
+import sys
 import logging
+from bisect import bisect_left
+from functools import lru_cache
+
+from . import profiles
+from .serialize import taf_document
 
 _modifiers = ['MI', 'BC', 'DR', 'BL', 'SH', 'TS', 'FZ', 'PR' ]
 _phenomena = ['DZ', 'RA', 'SN', 'SG', 'IC', 'PL', 'GR', 'GS', 'UP', 'BR', 'FG', 'FU', 'DU', 'SA', 'HZ', 'PY', 'VA',
@@ -9,6 +15,172 @@ _phenomena = ['DZ', 'RA', 'SN', 'SG', 'IC', 'PL', 'GR', 'GS', 'UP', 'BR', 'FG',
 WEATHER_PATTERNS = dict(zip(_modifiers, ['modifier']*len(_modifiers)))
 WEATHER_PATTERNS.update( dict(zip(_phenomena, ['phenomenon']*len(_phenomena))))
 
+## translation of the present-weather codes into english
+WEATHER_INT = {
+    "-": "light",
+    "+": "heavy",
+    "-VC": "nearby light",
+    "+VC": "nearby heavy",
+    "VC": "nearby"
+}
+
+# Real traffic contains a few hundred distinct weather words at most,
+# anything beyond that is garbage not worth remembering
+WEATHER_CACHE_SIZE = 1024
+
+_weather_intensity_pattern = re.compile("^(?P<intensity>[\+|\-|VC]{0,2})(?P<remainder>\w+)$")
+
+
+# Parsed values come from closed vocabularies (ICAO codes, layer codes,
+# units, zero-padded numbers), so every copy is replaced by a shared one
+_intern = sys.intern
+
+
+def _intern_values(values):
+    """ Interns the string values of a parsed dict in place """
+    for key, value in values.items():
+        if isinstance(value, str):
+            values[key] = _intern(value)
+    return values
+
+
+class WeatherWord(dict):
+    """ Parsed weather word, e.g. "-SNPL"
+
+    Behaves exactly like the dict TAF used to build for every word
+    ({"SN": "phenomenon", "PL": "phenomenon", "-": "intensity", "-SNPL": "weather"}),
+    but instances come from a shared table and must be treated as read-only.
+    The "features" attribute holds the wx_* keys TafGroup derives from the word.
+    """
+
+    __slots__ = ("features",)
+
+
+@lru_cache(maxsize=WEATHER_CACHE_SIZE)
+def parse_weather_word(weather_str):
+    """ Returns the shared WeatherWord for a weather descriptor string """
+
+    # First parse the intensity, which may or may not be present:
+    m = _weather_intensity_pattern.match(weather_str)
+    if not m:
+        logging.warning('Unable to parse weather viscinity %s', weather_str)
+
+    intensity = m.group('intensity')
+    remainder = m.group('remainder')
+    wx_parts = [remainder[i:i + 2] for i in range(0, len(remainder), 2)] # split into 2-character chunks
+
+    results = WeatherWord((x, WEATHER_PATTERNS.get(x, None)) for x in wx_parts)
+    results[intensity] = 'intensity'
+    results[weather_str] = 'weather'
+
+    features = []
+    for key, value in results.items():
+        if value == 'weather':
+            continue # The full weather string is represented in intensity, weather, and phenom
+        elif value == 'intensity':
+            key = WEATHER_INT.get(key, None)
+        if key:
+            features.append('wx_%s_%s' % (value, key))
+    results.features = tuple(features)
+
+    return results
+
+
+# Upper bounds for input size, real reports are well below 2000 characters
+MAX_REPORT_SIZE = 8192
+MAX_GROUP_SIZE = 2048
+
+# Characters allowed in a group body
+_group_body_chars = "A-Z0-9+\\-/\\s$"
+_group_keyword_pattern = re.compile("(?=FM|PROB|TEMPO|BECMG)")
+_group_invalid_pattern = re.compile("[^%s]" % _group_body_chars)
+_group_prob_pattern = re.compile("PROB(\\d{1,2})(\\s*)")
+
+# Old style "TEMPO 1012" validity (hours 10 to 12), both hours 00 to 24, which
+# sets it apart from a metric visibility such as "TEMPO 3000"
+_old_style_validity_pattern = re.compile(r"(?:PROB\d{1,2}\s*(?:TEMPO)?|TEMPO|BECMG)\s+"
+                                         r"(?:[01]\d|2[0-4])(?:[01]\d|2[0-4])(?=\s|$)")
+
+
+def split_group_spans(string):
+    """ Splits a report into weather groups without backtracking, returns their (start, end) spans
+
+    Produces the same groups as re.findall() with the pattern
+
+        (?:FM|(?:PROB(?:\\d{1,2})\\s*(?:TEMPO)?)|TEMPO|BECMG|[\\S\\s])[A-Z0-9\\+\\-/\\s$]+?(?=FM|PROB|TEMPO|BECMG|$)
+
+    which TAF used to apply directly, in O(n log n) time at worst (the regex
+    is quadratic on garbage input): a match starting with a prefix ending
+    at e extends to the first keyword (or the end) after e, and succeeds
+    if no invalid character comes before it.
+    Prefix alternatives are tried in the order the regex engine would.
+    """
+    length = len(string)
+
+    # Positions where the lookahead holds, "$" also matches before a final newline
+    ends = [m.start() for m in _group_keyword_pattern.finditer(string)]
+    if length and string[-1] == "\n":
+        ends.append(length - 1)
+    ends.append(length)
+    ends = sorted(set(ends))
+    invalid = [m.start() for m in _group_invalid_pattern.finditer(string)]
+    invalid.append(length + 1)
+
+    def match_end(prefix_end):
+        # End of the match for a prefix ending at prefix_end, or None
+        if prefix_end >= length:
+            return None
+        end = ends[bisect_left(ends, prefix_end + 1)]
+        if invalid[bisect_left(invalid, prefix_end)] < end:
+            return None
+        return end
+
+    groups = []
+    i = 0
+    while i < length:
+        end = None
+        if string.startswith("FM", i):
+            end = match_end(i + 2)
+        if end is None and string.startswith("PROB", i):
+            for prefix_end in _prob_prefix_ends(string, i):
+                end = match_end(prefix_end)
+                if end is not None:
+                    break
+        if end is None and string.startswith(("TEMPO", "BECMG"), i):
+            end = match_end(i + 5)
+        if end is None:
+            end = match_end(i + 1)
+
+        if end is None:
+            i += 1
+        else:
+            groups.append((i, end))
+            i = end
+
+    return groups
+
+
+def split_groups(string):
+    """ Splits a report into weather group strings, see split_group_spans() """
+    return [string[start:end] for start, end in split_group_spans(string)]
+
+
+def _prob_prefix_ends(string, start):
+    """ Ends of PROB\\d{1,2}\\s*(?:TEMPO)? at start, in backtracking order """
+    m = _group_prob_pattern.match(string, start)
+    if not m:
+        return
+    digits_end = m.end(1)
+    for digits in range(digits_end - start - 4, 0, -1):
+        position = start + 4 + digits
+        # Only the first digit count consumes the whitespace, one digit less leaves a digit in front of it
+        spaces_end = m.end(2) if position == digits_end else position
+        for spaces in range(spaces_end, position - 1, -1):
+            if string.startswith("TEMPO", spaces):
+                yield spaces + 5
+            yield spaces
+
+
 class MalformedTAF(Exception):
     def __init__(self, msg):
         self.strerror = msg
@@ -16,23 +188,38 @@ class MalformedTAF(Exception):
 class TAF(object):
     """ TAF "envelope" parser """
 
-    def __init__(self, string):
+    def __init__(self, string, max_report_size=MAX_REPORT_SIZE, max_group_size=MAX_GROUP_SIZE, profile=None,
+                 fields=None):
         """ 
         Initializes the object with TAF report text.
 
         Args:
             string: TAF report string
+            max_report_size: longest report accepted, in characters
+            max_group_size: longest weather group accepted, in characters
+            profile: regional parser profile (a pytaf.profiles.Profile or its
+                     name: "default", "us", "eu"), chosen per station if None,
+                     or a dict of ICAO code -> profile overriding the choice
+                     for some stations
+            fields: fields to extract from weather groups ("wind", "visibility",
+                    "clouds", "weather", "windshear"), all if None; the
+                    others are left empty. Headers are always parsed.
 
         Raises:
             MalformedTAF: An error parsing the TAF report
+            ValueError: Unknown profile or field
         """
 
         # Instance variables
+        self._json = None
         self._raw_taf = None
         self._taf_header = None
-        self._raw_weather_groups = []
+        self._header_span = None
+        self._group_spans = []
         self._weather_groups = []
         self._maintenance = None
+        self.profile = None
+        self.fields = profiles.check_fields(fields)
 
         if isinstance(string, str) and string != "":
             # strip out white space and =
@@ -45,15 +232,25 @@ class TAF(object):
         # leading/trailing spaces
         self._raw_taf = self._raw_taf.strip()
 
+        if len(self._raw_taf) > max_report_size:
+            raise MalformedTAF("Report too long (%d characters)" % len(self._raw_taf))
+        self._max_group_size = max_group_size
+
         # Initialize header part
         self._taf_header = self._init_header(self._raw_taf)
 
-        # Get weather groups
-        self._raw_weather_groups = self._init_groups(self._raw_taf)
+        if profile is None or isinstance(profile, dict):
+            self.profile = profiles.profile_for(self._taf_header["icao_code"], self._raw_taf, profile)
+        else:
+            self.profile = profiles.get_profile(profile)
+        self.profile = self.profile.select(self.fields)
 
-        for group in self._raw_weather_groups:
-            parsed_group = self._parse_group(group)
+        # Get weather groups, they are parsed in place in the report string
+        # and only the offsets of what was found are kept
+        for start, end in self._init_groups(self._raw_taf):
+            parsed_group, spans = self._parse_group(self._raw_taf, start, end)
             self._weather_groups.append(parsed_group)
+            self._group_spans.append(spans)
 
         self._maintenance = self._parse_maintenance(self._raw_taf)
 
@@ -97,7 +294,8 @@ class TAF(object):
 
         
         if header:
-            header = header.groupdict()
+            self._header_span = header.span()
+            header = _intern_values(header.groupdict())
             header["type"] = "MAIN"
             return header
         else:
@@ -111,38 +309,45 @@ class TAF(object):
 
         Raises:
             MalformedTAF: Group decoding error
-        
+
+        Returns:
+            List of (start, end) spans of the groups in the report string
         """
         
-        taf_group_pattern = """
-            (?:FM|(?:PROB(?:\d{1,2})\s*(?:TEMPO)?)|TEMPO|BECMG|[\S\s])[A-Z0-9\+\-/\s$]+?(?=FM|PROB|TEMPO|BECMG|$)
-        """
-
         group_list = []
 
-        groups = re.findall(taf_group_pattern, string, re.VERBOSE)
+        groups = split_group_spans(string)
         if not groups:
             raise MalformedTAF("No valid groups found")
 
-        for group in groups:
-            group_list.append(group)
+        for start, end in groups:
+            if end - start > self._max_group_size:
+                raise MalformedTAF("Group too long (%d characters)" % (end - start))
+            group_list.append((start, end))
 
         return(group_list)
 
-    def _parse_group(self, string):
+    # Group extractors search the report string between pos and endpos
+    # (the span of the group) rather than a copy of the group, and record
+    # the span of what they found in spans. A (?<= \s) lookbehind would see
+    # the character before pos, outside the group, so patterns starting with
+    # one search from pos + 1: a field at the very start of a group has no
+    # whitespace before it within the group, as in a copy of the group.
+
+    def _parse_group(self, string, pos, endpos):
         group = {}
+        spans = {"group": (pos, endpos)}
 
-        group["header"] = self._parse_group_header(string)
-        group["wind"] = self._parse_wind(string)
-        group["visibility"] = self._parse_visibility(string)
-        group["clouds"] = self._parse_clouds(string)
-        group["vertical_visibility"] = self._parse_vertical_visibility(string)
-        group["weather"] = self._parse_weather_phenomena(string)
-        group["windshear"] = self._parse_wind_shear(string)
+        group["header"] = self._parse_group_header(string, pos, endpos, spans)
+        # Only the extractors of the regional profile run, the others leave their key empty
+        for key, extractor in self.profile.extractors:
+            group[key] = getattr(self, extractor)(string, pos, endpos, spans)
+        for key in self.profile.skipped:
+            group[key] = profiles.EMPTY_VALUES[key]()
 
-        return(group)
+        return(group, spans)
          
-    def _parse_group_header(self, string):
+    def _parse_group_header(self, string, pos, endpos, spans):
         # From header pattern
         fm_pattern = """
             (?P<type> FM) (?P<from_date>\d{2}) (?P<from_hours>\d{2})(?P<from_minutes> \d{2})
@@ -162,17 +367,19 @@ class TAF(object):
         header = {}
 
         # Get type and associated fields
-        fm = re.search(fm_pattern, string, re.VERBOSE)
+        fm = re.compile(fm_pattern, re.VERBOSE).search(string, pos, endpos)
         if fm:
-            header = fm.groupdict()
+            header = _intern_values(fm.groupdict())
+            spans["header"] = fm.span()
 
-        ptb = re.search(ptb_pattern, string, re.VERBOSE)
+        ptb = re.compile(ptb_pattern, re.VERBOSE).search(string, pos, endpos)
         if ptb:
-            header = ptb.groupdict()
+            header = _intern_values(ptb.groupdict())
+            spans["header"] = ptb.span()
 
         return(header)
 
-    def _parse_wind(self, string):
+    def _parse_wind(self, string, pos, endpos, spans):
         wind_pattern = """
             (?<= \s )
             (?P<direction> (\d{3}|VRB)) # Three digits or VRB
@@ -182,15 +389,24 @@ class TAF(object):
             (?= \s|$ )
         """
 
-        wind = re.search(wind_pattern, string, re.VERBOSE)
+        wind = re.compile(wind_pattern, re.VERBOSE).search(string, pos + 1, endpos)
 
         if wind:
-            return(wind.groupdict())
+            spans["wind"] = wind.span()
+            return(_intern_values(wind.groupdict()))
         else:
             return(None)
 
-    def _parse_visibility(self, string):
-        # Visibility in statute miles
+    def _parse_visibility(self, string, pos, endpos, spans):
+        # Both styles, metric wins if a group has both
+        visibility = self._parse_visibility_sm(string, pos, endpos, spans)
+        visibility_meters = self._parse_visibility_m(string, pos, endpos, spans)
+        if visibility_meters:
+            visibility.update(visibility_meters)
+        return(visibility)
+
+    def _parse_visibility_sm(self, string, pos, endpos, spans):
+        # Visibility in statute miles (US-style)
         visibility_pattern = """
             (?<= \s )
             (?P<more> P){0,1} # "P" prefix indicates visibility more than
@@ -199,9 +415,14 @@ class TAF(object):
             (?= \s|$ )
         """
 
+        visibility_sm = re.compile(visibility_pattern, re.VERBOSE).search(string, pos + 1, endpos)
+        if visibility_sm:
+            spans["visibility"] = visibility_sm.span()
+            return(_intern_values(visibility_sm.groupdict()))
+        return({})
+
+    def _parse_visibility_m(self, string, pos, endpos, spans):
         # Visibility in meters
-        # XXX: In case "TEMPO 1012" style reports still exist,
-        # it will not work as is and I haven't came up with a fix yet
         visibility_meters_pattern = """
             (?<= \s )
             (?P<range> \d{4})
@@ -210,15 +431,10 @@ class TAF(object):
 
         visibility = {}
 
-        # US-style
-        visibility_sm = re.search(visibility_pattern, string, re.VERBOSE)
-        if visibility_sm:
-            visibility = visibility_sm.groupdict()
-         
-        # Metric style
-        visibility_meters = re.search(visibility_meters_pattern, string, re.VERBOSE)
+        visibility_meters = re.compile(visibility_meters_pattern, re.VERBOSE).search(string, pos + 1, endpos)
         if visibility_meters:
-            visibility["range"] = visibility_meters.group("range")
+            spans["visibility"] = visibility_meters.span()
+            visibility["range"] = _intern(visibility_meters.group("range"))
             # 9999 in fact means "more than 10 km"
             if visibility_meters.group("range") == "9999":
                 visibility["more"] = True
@@ -227,7 +443,19 @@ class TAF(object):
 
         return(visibility)
 
-    def _parse_clouds(self, string):
+    def _parse_visibility_us(self, string, pos, endpos, spans):
+        # Metric visibility is only looked for if there is none in statute miles
+        return(self._parse_visibility_sm(string, pos, endpos, spans) or
+               self._parse_visibility_m(string, pos, endpos, spans))
+
+    def _parse_visibility_eu(self, string, pos, endpos, spans):
+        # Old style "TEMPO 1012" validity (hours 10 to 12) is not a visibility
+        old_style_validity = _old_style_validity_pattern.match(string, pos, endpos)
+        visibility = self._parse_visibility_m(string, old_style_validity.end() if old_style_validity else pos,
+                                              endpos, spans)
+        return(visibility or self._parse_visibility_sm(string, pos, endpos, spans))
+
+    def _parse_clouds(self, string, pos, endpos, spans):
         clouds_pattern = """
             (?<= \s )
             (?P<layer> BKN|SCT|FEW|OVC)
@@ -240,23 +468,28 @@ class TAF(object):
 
         clouds = []
 
-        clear = re.search(special_case_pattern, string, re.VERBOSE)
+        clear = re.compile(special_case_pattern, re.VERBOSE).search(string, pos, endpos)
         if clear:
-            clouds.append({"layer": clear.group(0)})
+            clouds.append({"layer": _intern(clear.group(0))})
+            spans["clouds"] = [clear.span()]
             return(clouds)
 
-        cloud_layers = re.finditer(clouds_pattern, string, re.VERBOSE)
+        layer_spans = []
+        cloud_layers = re.compile(clouds_pattern, re.VERBOSE).finditer(string, pos + 1, endpos)
         for layer in cloud_layers:
             # SKC or CLR mean "sky clear", nothing to do
 #            if layer.group("layer") == "SKC" or layer.group("layer") == "CLR":
 #                clouds = []
 #                break
  #           else:
-            clouds.append(layer.groupdict())
+            clouds.append(_intern_values(layer.groupdict()))
+            layer_spans.append(layer.span())
+        if layer_spans:
+            spans["clouds"] = layer_spans
           
         return(clouds)
 
-    def _parse_vertical_visibility(self, string):
+    def _parse_vertical_visibility(self, string, pos, endpos, spans):
 
         vertical_visibility_pattern = """
             (?<= \s )
@@ -267,13 +500,14 @@ class TAF(object):
 
         vertical_visibility = None
 
-        vv = re.search(vertical_visibility_pattern, string, re.VERBOSE)
+        vv = re.compile(vertical_visibility_pattern, re.VERBOSE).search(string, pos + 1, endpos)
         if vv:
-            vertical_visibility = vv.group("vertical_visibility")
+            vertical_visibility = _intern(vv.group("vertical_visibility"))
+            spans["vertical_visibility"] = vv.span()
 
         return(vertical_visibility)
 
-    def _parse_weather_phenomena(self, string):
+    def _parse_weather_phenomena(self, string, pos, endpos, spans):
 
 
         # XXX: The problem here is that from the intensity (+|-|VC), modifier (MI|BC|...)
@@ -288,30 +522,23 @@ class TAF(object):
           ( (?: \+|\-|VC|MI|BC|DR|BL|SH|TS|FZ|PR|DZ|RA|SN|SG|IC|PL|GR|GS|UP|BR|FG|FU|DU|SA|HZ|PY|VA|PO|SQ|FC|SS|DS)+ )
           (?= \s|$)
         """
-        weather_words = re.findall(weather_word_pattern, string, re.VERBOSE)
+        weather_words = re.compile(weather_word_pattern, re.VERBOSE).finditer(string, pos + 1, endpos)
 
         weather = []
+        word_spans = []
         for word in weather_words:
-            weather.append(self._parse_weather_phenomena_str(word))
+            weather.append(self._parse_weather_phenomena_str(word.group(1)))
+            word_spans.append(word.span())
+        if word_spans:
+            spans["weather"] = word_spans
         return weather
 
     def _parse_weather_phenomena_str(self, weather_str):
-        # First parse the intensity, which may or may not be present:
-        viscinity_pattern = re.compile("^(?P<intensity>[\+|\-|VC]{0,2})(?P<remainder>\w+)$")
-        m = viscinity_pattern.match(weather_str)
-        if not m:
-            logging.warning('Unable to parse weather viscinity %s', weather_str)
-
-        intensity = m.group('intensity')
-        remainder = m.group('remainder')
-        wx_parts = [remainder[i:i + 2] for i in range(0, len(remainder), 2)] # split into 2-character chunks
-
-        results = {x: WEATHER_PATTERNS.get(x, None) for x in wx_parts}
-        results[intensity] = 'intensity'
-        results[weather_str] = 'weather'
-        return results
-
-    def _parse_wind_shear(self, string):
+        # Words repeat endlessly across reports, so they are parsed once
+        # and shared through a bounded table
+        return parse_weather_word(weather_str)
+
+    def _parse_wind_shear(self, string, pos, endpos, spans):
         wind_shear_pattern = """
             \s+
             WS (?P<altitude> \d{3})
@@ -321,10 +548,12 @@ class TAF(object):
             (?P<unit> KT|MPS)
         """
 
-        windshear = re.search(wind_shear_pattern, string, re.VERBOSE)
+        windshear = re.compile(wind_shear_pattern, re.VERBOSE).search(string, pos, endpos)
 
         if windshear:
-            return(windshear.groupdict())
+            # The span starts at "WS", not at the whitespace before it
+            spans["windshear"] = (windshear.start("altitude") - 2, windshear.end())
+            return(_intern_values(windshear.groupdict()))
         else:
             return(None)
 
@@ -334,7 +563,7 @@ class TAF(object):
         maintenance = re.search(maintenance_pattern, string, re.VERBOSE)
 
         if maintenance:
-            return(maintenance.group(0))
+            return(_intern(maintenance.group(0)))
         else:
             return(None)
             
@@ -350,9 +579,37 @@ class TAF(object):
         """ Return weather groups (initial and FM's) """
         return(self._weather_groups)
 
+    def get_header_span(self):
+        """ Return (start, end) offsets of the report header in get_taf() """
+        return(self._header_span)
+
+    def get_group_spans(self):
+        """ Return (start, end) offsets in get_taf() of what was parsed, one dict per weather group
+
+        Keys are "group", "header", "wind", "visibility", "vertical_visibility",
+        "windshear" (a span each) and "clouds", "weather" (a list of spans,
+        one per layer or word); fields not found in the group are left out.
+        """
+        return(self._group_spans)
+
+    def get_raw_groups(self):
+        """ Return the text of the weather groups """
+        return([self.get_text(spans["group"]) for spans in self._group_spans])
+
+    def get_text(self, span):
+        """ Return the text of a (start, end) span of get_taf() """
+        start, end = span
+        return(self._raw_taf[start:end])
+
     def get_maintenance(self):
         """ Return station maintenance indicator """
         return(self._maintenance)
 
+    def to_json(self):
+        """ Return the parsed report as JSON bytes (see pytaf.serialize), serialized once """
+        if self._json is None:
+            self._json = taf_document(self)
+        return(self._json)
+
     def __repr__(self):
         return self.get_taf()
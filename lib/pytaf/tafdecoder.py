@@ -4,8 +4,98 @@ import re
 from datetime import datetime, timedelta
 import logging
 import math
+import sys
+import threading
 from operator import attrgetter
-from .taf import TAF
+from .taf import TAF, WEATHER_INT
+from .profiles import check_fields
+from .serialize import DecodedDocument
+
+
+_intern = sys.intern
+
+# Feature keys that depend on parsed values ('wind_speed_KT', 'clouds_layer_BKN')
+# are built once and shared by all groups instead of being formatted per group
+_feature_keys = {}
+
+
+def _feature_key(*parts):
+    key = _feature_keys.get(parts)
+    if key is None:
+        key = _feature_keys[parts] = _intern('_'.join(parts))
+    return key
+
+
+KT_PER_MPS = 1.943844
+M_PER_SM = 1609.344
+
+# Unit-normalized numeric features: source key -> (canonical key, factor).
+# Speeds are in knots, horizontal distances in meters, heights in feet.
+# Everything else (flags, counts, prob) is copied unchanged.
+NORMALIZED_FEATURES = {
+    'wind_dir':                ('wind_dir_deg', 1),
+    'wind_speed_KT':           ('wind_speed_kt', 1),
+    'wind_speed_MPS':          ('wind_speed_kt', KT_PER_MPS),
+    'wind_gust_KT':            ('wind_gust_kt', 1),
+    'wind_gust_MPS':           ('wind_gust_kt', KT_PER_MPS),
+    'wind_gust_diff_KT':       ('wind_gust_diff_kt', 1),
+    'wind_gust_diff_MPS':      ('wind_gust_diff_kt', KT_PER_MPS),
+    'visibility_SM':           ('visibility_m', M_PER_SM),
+    'visibility_M':            ('visibility_m', 1),
+    'visibility_vertical_ft':  ('vertical_visibility_ft', 100),
+    'clouds_ceiling_ft':       ('clouds_base_ft', 100),
+    'clouds_ceiling_max_ft':   ('clouds_top_layer_ft', 100),
+    'windshear_alt_ft':        ('windshear_alt_ft', 100),
+    'windshear_dir':           ('windshear_dir_deg', 1),
+    'windshear_speed_KT':      ('windshear_speed_kt', 1),
+    'windshear_speed_MPS':     ('windshear_speed_kt', KT_PER_MPS),
+}
+
+class _Missing(object):
+    """ Value of a quantity that was not decoded because its field was not asked for """
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return "MISSING"
+
+    def __reduce__(self):
+        return "MISSING"
+
+
+# e.g. TafGroup.ceiling_ft when clouds were left out with fields=, unlike
+# None which means there is no ceiling
+MISSING = _Missing()
+
+
+def feature_field(feature):
+    """ Returns the field (TafGroup attribute) a forecast feature belongs to, None for "prob" """
+    for prefix, field in _feature_fields:
+        if feature.startswith(prefix):
+            return field
+    return None
+
+
+# Longest prefixes first, "windshear" features are not "wind" ones
+_feature_fields = [
+    ('windshear', 'windshear'),
+    ('wind', 'wind'),
+    ('visibility', 'visibility'),
+    ('vertical_visibility', 'visibility'),
+    ('clouds', 'clouds'),
+    ('sky_clear', 'clouds'),
+    ('ceiling', 'clouds'),
+    ('weather', 'weather'),
+    ('wx_', 'weather'),
+]
+
+
+# Crosswind components are in the unit of the wind speed
+_crosswind_features = {
+    'wind_crosswind_cos': 'wind_crosswind_cos_kt',
+    'wind_crosswind_sin': 'wind_crosswind_sin_kt',
+}
 
 
 class DecodeError(Exception):
@@ -13,47 +103,167 @@ class DecodeError(Exception):
         self.strerror = msg
 
 
+# A few thousand distinct cloud and weather fragments cover nearly all real traffic
+FRAGMENT_CACHE_SIZE = 4096
+
+
+def _freeze(fields):
+    """ Hashable copy of parsed fields: a list of dicts (cloud layers, weather words) """
+    # Parsed dicts of a kind always list their keys in the same order, so
+    # items are not sorted: equal fields in another order only cost a miss
+    return tuple([tuple(item.items()) for item in fields])
+
+
+class FragmentCache(object):
+    """ Bounded table of rendered decode_taf() fragments
+
+    Fragments are looked up by (decoder class, fragment kind, frozen parsed
+    fields). The oldest ones are dropped when more than maxsize are
+    remembered, which in practice only happens with garbage input.
+    Hit/miss counters are kept to help sizing it (they are approximate
+    when several threads render at once).
+    """
+
+    def __init__(self, maxsize=FRAGMENT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._fragments = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, key, function, fields):
+        """ Returns the fragment cached under key, calling function(fields) to render it if missing """
+        fragment = self._fragments.get(key)
+        if fragment is not None:
+            self.hits += 1
+            return fragment
+
+        fragment = function(fields)
+        self.misses += 1
+        with self._lock:
+            if len(self._fragments) >= self.maxsize:
+                del self._fragments[next(iter(self._fragments))]
+                self.evictions += 1
+            self._fragments[key] = fragment
+        return fragment
+
+    def __len__(self):
+        return len(self._fragments)
+
+    def stats(self):
+        """ Returns a dict of hits, misses, evictions, size, maxsize and hit_rate """
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "size": len(self._fragments), "maxsize": self.maxsize,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def reset_stats(self):
+        self.hits = self.misses = self.evictions = 0
+
+    def clear(self):
+        """ Forgets all fragments and resets the counters """
+        with self._lock:
+            self._fragments.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+fragment_cache = FragmentCache()
+
+
 class Decoder(object):
-    def __init__(self, taf, taf_timestamp):
+    # Shared by all decoders, set to None (on a subclass or an instance) to render every fragment
+    fragment_cache = fragment_cache
+
+    def __init__(self, taf, taf_timestamp, normalize=False, fields=None):
+        """
+        Decodes a parsed TAF into a timeline of groups.
+
+        Args:
+            taf: TAF object
+            taf_timestamp: datetime in the month the report was issued (current time if None)
+            normalize: compute the unit-normalized view (TafGroup.normalized)
+                       of every group right away instead of on first use
+            fields: TafGroup.ATTRIBUTES to decode into forecasts, all if None.
+                    Fields the TAF was not parsed with are not decoded either,
+                    group times always are.
+        """
         if isinstance(taf, TAF):
             self._taf = taf
+            self.fields = check_fields(fields)
+            if taf.fields is not None:
+                self.fields = taf.fields if self.fields is None else self.fields & taf.fields
+            self._json = {}
             try:
                 self._decode_groups(taf_timestamp)
+                if normalize:
+                    for group in self.groups:
+                        group.normalized
             except ValueError:
                 logging.warning('Error decoding taf: ' + taf._raw_taf)
         else:
             raise DecodeError("Argument is not a TAF parser object")
 
     def decode_taf(self):
-        result = ""
+        return "".join(self.iter_decode_taf())
 
-        result += self._decode_header(self._taf.get_header()) + "\n"
+    def iter_decode_taf(self):
+        """ Yields the decode_taf() output line by line """
+        yield self._decode_header(self._taf.get_header()) + "\n"
+
+        # Fields left out with fields= are not rendered either
+        fields = self.fields
+        if fields is None:
+            fields = TafGroup.ATTRIBUTES
 
         for group in self._taf.get_groups():
             if group["header"]:
-                result += self._decode_group_header(group["header"]) + "\n"
+                yield self._decode_group_header(group["header"]) + "\n"
 
-            if group["wind"]:
-                result += "    Wind: %s \n" % self._decode_wind(group["wind"])
+            if group["wind"] and "wind" in fields:
+                yield "    Wind: %s \n" % self._decode_wind(group["wind"])
 
-            if group["visibility"]:
-                result += "    Visibility: %s \n" % self._decode_visibility(group["visibility"])
+            if group["visibility"] and "visibility" in fields:
+                yield "    Visibility: %s \n" % self._decode_visibility(group["visibility"])
 
-            if group["clouds"]:
-                result += "    Sky conditions: %s \n" % self._decode_clouds(group["clouds"])
+            if group["clouds"] and "clouds" in fields:
+                yield "    Sky conditions: %s \n" % self._decode_clouds(group["clouds"])
 
-            if group["weather"]:
-                result += "    Weather: %s \n" % self._decode_weather(group["weather"])
+            if group["weather"] and "weather" in fields:
+                yield "    Weather: %s \n" % self._decode_weather(group["weather"])
 
-            if group["windshear"]:
-                result += "    Windshear: %s\n" % self._decode_windshear(group["windshear"])
+            if group["windshear"] and "windshear" in fields:
+                yield "    Windshear: %s\n" % self._decode_windshear(group["windshear"])
 
-            result += " \n"
+            yield " \n"
 
         if self._taf.get_maintenance():
-            result += self._decode_maintenance(self._taf.get_maintenance())
+            yield self._decode_maintenance(self._taf.get_maintenance())
 
-        return(result)
+    def write_taf(self, stream):
+        """ Writes the decode_taf() output to a file-like object without building it in memory """
+        for line in self.iter_decode_taf():
+            stream.write(line)
+
+    def to_json(self, start=None, end=None, normalized=False):
+        """ Returns the decoded report as JSON bytes (see pytaf.serialize for the schema)
+
+        The document is serialized on first use and cached on the decoder,
+        which stands for a single issuance and does not change afterwards.
+
+        Args:
+            start, end: optional time window, only groups overlapping it are included
+            normalized: use TafGroup.normalized instead of TafGroup.forecast
+        """
+        document = self._json.get(normalized)
+        if document is None:
+            document = self._json[normalized] = DecodedDocument(self, normalized)
+        return document.window(start, end)
+
+    def resample(self, step, start=None, end=None, normalized=False, features=None):
+        """ Returns forecast features sampled at fixed steps, run-length encoded (see pytaf.resample) """
+        from .resample import resample
+        return resample(self, step, start, end, normalized, features)
 
     def get_group(self, timestamp):
         # return the group that contains timestamp
@@ -147,6 +357,9 @@ class Decoder(object):
         self.issued_timestamp = datetime(year, month, day, hours, minutes)
 
         self.groups = [TafGroup(group, taf_header, self) for group in self._taf.get_groups()]
+        # All groups in report order, including the ones gap filling and
+        # overlap resolution drop from self.groups (see pytaf.timeline)
+        self.source_groups = list(self.groups)
         self._set_missing_group_times()
         self._fill_gaps()
         self._complete_group_info()
@@ -219,6 +432,7 @@ class Decoder(object):
         for index, group in enumerate(self.groups[1:]):
             if group.header_starts_with(temp_keywords):
                 group.fill_in_information(prev_fm_group)
+                group.prevailing = prev_fm_group
             else:
                 prev_fm_group = group
 
@@ -226,7 +440,8 @@ class Decoder(object):
     def _decode_header(self, header):
         result = ""
 
-        # Ensure it's side effect free
+        # Side effect free: the header dict belongs to the TAF object and may be
+        # rendered concurrently, so ordinal dates go into a separate dict
         _header = header
 
         # Type
@@ -240,14 +455,19 @@ class Decoder(object):
             result += "TAF for "
 
         # Add ordinal suffix
-        _header["origin_date"] = _header["origin_date"] + self._get_ordinal_suffix(_header["origin_date"])
-        _header["valid_from_date"] = _header["valid_from_date"] + self._get_ordinal_suffix(_header["valid_from_date"]) 
-        _header["valid_till_date" ] = _header["valid_till_date"] + self._get_ordinal_suffix(_header["valid_till_date"])
+        values = { "icao_code":        _header["icao_code"],
+                   "origin_hours":     _header["origin_hours"],
+                   "origin_minutes":   _header["origin_minutes"],
+                   "origin_date":      self._add_ordinal_suffix(_header["origin_date"]),
+                   "valid_from_hours": _header["valid_from_hours"],
+                   "valid_from_date":  self._add_ordinal_suffix(_header["valid_from_date"]),
+                   "valid_till_hours": _header["valid_till_hours"],
+                   "valid_till_date":  self._add_ordinal_suffix(_header["valid_till_date"]) }
 
         result += ("%(icao_code)s issued %(origin_hours)s:%(origin_minutes)s UTC on the %(origin_date)s, " 
                    "valid from %(valid_from_hours)s:00 UTC on the %(valid_from_date)s to %(valid_till_hours)s:00 UTC on the %(valid_till_date)s")
 
-        result = result % _header
+        result = result % values
 
         return(result)
 
@@ -262,44 +482,58 @@ class Decoder(object):
         becmg_str = "Gradual change to the following between %(from_hours)s:00 on the %(from_date)s and %(till_hours)s:00 on the %(till_date)s: "
 
         if "type" in _header:
-            # Add ordinal suffix
+            # Add ordinal suffix, without touching the header dict
+            from_date = None
+            till_date = None
             if "from_date" in _header:
-                from_suffix = self._get_ordinal_suffix(_header["from_date"])
-                _header["from_date"] = _header["from_date"] + from_suffix
+                from_date = self._add_ordinal_suffix(_header["from_date"])
             if "till_date" in _header:
-                till_suffix = self._get_ordinal_suffix(_header["till_date"])
-                _header["till_date"] = _header["till_date"] + till_suffix
+                till_date = self._add_ordinal_suffix(_header["till_date"])
 
             if _header["type"] == "FM":
-                result += from_str % { "from_date":    _header["from_date"], 
+                result += from_str % { "from_date":    from_date, 
                                        "from_hours":   _header["from_hours"],
                                        "from_minutes": _header["from_minutes"] }
             elif _header["type"] == "PROB%s" % (_header["probability"]):
                 result += prob_str % { "probability": _header["probability"],
-                                       "from_date":   _header["from_date"], 
+                                       "from_date":   from_date, 
                                        "from_hours":  _header["from_hours"],
-                                       "till_date":   _header["till_date"],
+                                       "till_date":   till_date,
                                        "till_hours":  _header["till_hours"] }
             elif "PROB" in _header["type"] and "TEMPO" in _header["type"]:
                 result += prob_tempo_str % { "probability": _header["probability"],
-                                           "from_date":   _header["from_date"], 
+                                           "from_date":   from_date, 
                                            "from_hours":  _header["from_hours"],
-                                           "till_date":   _header["till_date"],
+                                           "till_date":   till_date,
                                            "till_hours":  _header["till_hours"] }
                                        
             elif _header["type"] == "TEMPO":
-                result += tempo_str % { "from_date":  _header["from_date"], 
+                result += tempo_str % { "from_date":  from_date, 
                                         "from_hours": _header["from_hours"], 
-                                        "till_date":  _header["till_date"], 
+                                        "till_date":  till_date, 
                                         "till_hours": _header["till_hours"] }
             elif _header["type"] == "BECMG":
-                result += becmg_str % { "from_date":  _header["from_date"], 
+                result += becmg_str % { "from_date":  from_date, 
                                         "from_hours": _header["from_hours"], 
-                                        "till_date":  _header["till_date"],
+                                        "till_date":  till_date,
                                         "till_hours": _header["till_hours"] }
 
         return(result)
 
+    def _render(self, kind, method, fields):
+        # Same fields rendered by the same class give the same text
+        cache = self.fragment_cache
+        if cache is None:
+            return(method(fields))
+        try:
+            key = (type(self), kind, _freeze(fields))
+        except AttributeError:
+            # Not parsed by TAF, rendered every time
+            return(method(fields))
+        return(cache.render(key, method, fields))
+
+    # Wind and visibility are rendered every time, a cache lookup costs about as much
+
     def _decode_wind(self, wind):
         unit = ""
         result = ""
@@ -343,6 +577,9 @@ class Decoder(object):
         return(result)
 
     def _decode_clouds(self, clouds):
+        return(self._render("clouds", self._render_clouds, clouds))
+
+    def _render_clouds(self, clouds):
         result = ""
         i_result = ""
         list = []
@@ -395,6 +632,9 @@ class Decoder(object):
         return(result)
 
     def _decode_weather(self, weather):
+        return(self._render("weather", self._render_weather, weather))
+
+    def _render_weather(self, weather):
         result = ""
         i_result = ""
         ii_result = ""
@@ -517,6 +757,9 @@ class Decoder(object):
         if maintenance:
             return "Station is under maintenance check\n"
 
+    def _add_ordinal_suffix(self, date):
+        return date + self._get_ordinal_suffix(date)
+
     def _get_ordinal_suffix(self, date):
         _date = str(date)
 
@@ -533,15 +776,38 @@ class Decoder(object):
 
         return(suffix)
 
-## translation of the present-weather codes into english
-WEATHER_INT = {
-    "-": "light",
-    "+": "heavy",
-    "-VC": "nearby light",
-    "+VC": "nearby heavy",
-    "VC": "nearby"
-}
-        
+
+def iter_decode_tafs(decoders, separator="\n"):
+    """ Yields decode_taf() output of many reports line by line, for streaming large batches """
+    for decoder in decoders:
+        for line in decoder.iter_decode_taf():
+            yield line
+        yield separator
+
+
+def _normalize_forecast(forecast, ceiling_ft):
+    data = {}
+    speed_factor = 1
+    if 'wind_speed_MPS' in forecast:
+        speed_factor = KT_PER_MPS
+
+    for key, value in forecast.items():
+        if key in NORMALIZED_FEATURES:
+            key, factor = NORMALIZED_FEATURES[key]
+            if factor != 1:
+                value = round(value * factor, 2)
+        elif key in _crosswind_features:
+            key = _crosswind_features[key]
+            if speed_factor != 1:
+                value = round(value * speed_factor, 2)
+        data[key] = value
+
+    # Lowest broken or overcast layer, already in feet
+    if ceiling_ft is not None and ceiling_ft is not MISSING:
+        data['ceiling_ft'] = ceiling_ft
+
+    return data
+
 
 class TafGroup:
 
@@ -561,14 +827,30 @@ class TafGroup:
         self.start_time = decoder._decode_timestamp(self.header, 'from_', 'valid_from_', 'origin_')
         self.end_time = decoder._decode_timestamp(self.header, 'till_')
 
+        # The prevailing (FM or main) group a TEMPO/PROB/BECMG group is overlaid on
+        self.prevailing = self
+
+        # Forecast of a PROB group as it would be if it happens, set by fill_in_information()
+        self.branch_forecast = None
+        self.branch_ceiling_ft = None
+
+        # Attributes decoded, all if None
+        self.fields = fields = decoder.fields
         for attr in self.ATTRIBUTES:
-            self._decode_attribute(attr)
+            if fields is None or attr in fields:
+                self._decode_attribute(attr)
+            else:
+                self._skip_attribute(attr)
         self._set_forecast()
 
     @staticmethod
     def get_attributes():
         return ['wind', 'visibility', 'clouds', 'weather', 'windshear']
 
+    def has_field(self, attr):
+        """ True if attr (one of ATTRIBUTES) was decoded, False if it was left out with fields= """
+        return self.fields is None or attr in self.fields
+
     def header_starts_with(self, keys):
         for key in keys:
             if self.header["type"].startswith(key):
@@ -576,6 +858,13 @@ class TafGroup:
         return False
 
     def fill_in_information(self, other_group):
+        # What the group forecasts by itself, for the branch of PROB groups
+        own = {}
+        for attr in self.ATTRIBUTES:
+            value = getattr(self, attr, None)
+            own[attr] = dict(value) if value else value
+        own_ceiling_ft = getattr(self, 'ceiling_ft', None)
+
         for attr in self.ATTRIBUTES:
             value = getattr(self, attr, None)
             if not value or value.get(attr) == 0:
@@ -586,16 +875,65 @@ class TafGroup:
                     if key not in current_values or self.forecast.get('prob', 100) < 50:
                         current_values[key] = value
 
+        if self.clouds is other_group.clouds:
+            self.ceiling_ft = other_group.ceiling_ft
+
         self._set_forecast()
 
+        if self.header['type'].startswith('PROB'):
+            self._set_branch(own, own_ceiling_ft, other_group)
+
+    def _set_branch(self, own, own_ceiling_ft, other_group):
+        # Below 50% the merge above keeps the prevailing values, so the
+        # conditions forecast with that probability are kept separately:
+        # every attribute the group gives replaces the prevailing one
+        self.branch_forecast = {}
+        if 'prob' in self.forecast:
+            self.branch_forecast['prob'] = self.forecast['prob']
+        self.branch_ceiling_ft = own_ceiling_ft
+        for attr in self.ATTRIBUTES:
+            value = own[attr]
+            if not value or value.get(attr) == 0:
+                value = getattr(other_group, attr)
+                if attr == 'clouds':
+                    self.branch_ceiling_ft = other_group.ceiling_ft
+            self.branch_forecast.update(value)
+        self._branch_normalized = None
+
+    @property
+    def branch_normalized(self):
+        """ branch_forecast with canonical keys and units, see normalized """
+        if self.branch_forecast is None:
+            return None
+        if self._branch_normalized is None:
+            self._branch_normalized = _normalize_forecast(self.branch_forecast, self.branch_ceiling_ft)
+        return self._branch_normalized
+
     def _set_forecast(self):
         self.forecast = {}
+        self._normalized = None
         prob = self._get_prob()
         if prob:
             self.forecast['prob'] = int(prob)
         for attr in self.ATTRIBUTES:
             self.forecast.update(getattr(self, attr, {}))
 
+    @property
+    def normalized(self):
+        """ Forecast features with one canonical unit and key per quantity
+
+        Wind speeds are in knots whatever the report used (wind_speed_kt),
+        visibility in meters (visibility_m), cloud, vertical visibility and
+        windshear heights in feet (clouds_base_ft, ceiling_ft, ...).
+        Computed on first access and kept until the forecast changes.
+        """
+        if self._normalized is None:
+            self._normalized = self._normalize()
+        return self._normalized
+
+    def _normalize(self):
+        return _normalize_forecast(self.forecast, getattr(self, 'ceiling_ft', None))
+
     def _get_prob(self):
         return self.header.get('probability', None)
 
@@ -603,6 +941,12 @@ class TafGroup:
         methodToCall = getattr(self, '_decode_' + attr)
         methodToCall()
 
+    def _skip_attribute(self, attr):
+        # Not asked for: no features at all, rather than the "none forecast" ones
+        setattr(self, attr, {})
+        if attr == 'clouds':
+            self.ceiling_ft = MISSING
+
     def _decode_range(self, range_str):
         if ' ' in range_str:
             a, rem = range_str.split(' ')
@@ -625,8 +969,12 @@ class TafGroup:
         if not vis:
             self.visibility = {}
         else:
-            range = self._decode_range(vis['range'])
-            self.visibility = {'visibility_' + vis['unit']: range}
+            if vis['unit'] == 'M':
+                # Meters, possibly "10 000" for 9999
+                range = int(vis['range'].replace(' ', ''))
+            else:
+                range = self._decode_range(vis['range'])
+            self.visibility = {_feature_key('visibility', vis['unit']): range}
 
         vv = self._group.get('vertical_visibility', None)
         if vv:
@@ -642,7 +990,7 @@ class TafGroup:
         data = {'wind': 1}
 
         wind_speed = int(wind["speed"])
-        data['wind_speed_' + wind['unit']] = wind_speed
+        data[_feature_key('wind_speed', wind['unit'])] = wind_speed
 
         if wind["direction"] == "VRB":
             data['wind_dir_variable'] = 1
@@ -655,12 +1003,16 @@ class TafGroup:
 
         if wind['gust']:
             wind_gust_speed = int(wind['gust'])
-            data['wind_gust_' + wind['unit']] = wind_gust_speed
-            data['wind_gust_diff_' + wind['unit']] =  wind_gust_speed - wind_speed
+            data[_feature_key('wind_gust', wind['unit'])] = wind_gust_speed
+            data[_feature_key('wind_gust_diff', wind['unit'])] =  wind_gust_speed - wind_speed
 
         self.wind = data
 
     def _decode_clouds(self):
+        # Height of the lowest broken or overcast layer in feet (None if there is none).
+        # Kept out of the forecast dict, clouds_ceiling_ft there is the lowest layer of any kind
+        self.ceiling_ft = None
+
         clouds = self._group.get('clouds', None)
         if not clouds:
             self.clouds = {}
@@ -676,8 +1028,12 @@ class TafGroup:
                 if not value:
                     continue
                 if key in ['layer', 'type']:
-                    data['clouds_%s_%s' % (key, value)] = 1
+                    data[_feature_key('clouds', key, value)] = 1
                 elif key == 'ceiling':
+                    if layer['layer'] in ('BKN', 'OVC'):
+                        height = int(value) * 100
+                        if self.ceiling_ft is None or height < self.ceiling_ft:
+                            self.ceiling_ft = height
                     if 'clouds_ceiling_ft' not in data:
                         data['clouds_ceiling_ft'] = int(value)
                     current_max_ft = data.get('clouds_ceiling_max_ft', int(value))
@@ -693,16 +1049,27 @@ class TafGroup:
 
         data = {'weather': 1}
         for wx in weather:
-            for key, value in wx.items():
-                if value == 'weather':
-                    continue # Skipping the full weather string because it's represented in intensity, weather, and phenom
-                elif value == 'intensity':
-                    key = WEATHER_INT.get(key, None)
-                if key:
-                    data['wx_%s_%s' % (value, key)] = 1
+            features = getattr(wx, 'features', None)
+            if features is None:
+                # Hand-built dict rather than a shared WeatherWord
+                features = self._weather_features(wx)
+            for key in features:
+                data[key] = 1
 
         self.weather = data
 
+    @staticmethod
+    def _weather_features(wx):
+        features = []
+        for key, value in wx.items():
+            if value == 'weather':
+                continue # Skipping the full weather string because it's represented in intensity, weather, and phenom
+            elif value == 'intensity':
+                key = WEATHER_INT.get(key, None)
+            if key:
+                features.append('wx_%s_%s' % (value, key))
+        return features
+
     def _decode_windshear(self):
         windshear = self._group.get('windshear', None)
         if not windshear:
@@ -713,7 +1080,7 @@ class TafGroup:
             'windshear': 1,
             'windshear_alt_ft': int(windshear["altitude"]),
             'windshear_dir': int(windshear["direction"]),
-            'windshear_speed_' + windshear['unit']: int(windshear["speed"])
+            _feature_key('windshear_speed', windshear['unit']): int(windshear["speed"])
         }
 
     def __repr__(self):
@@ -0,0 +1,257 @@
+import json
+import os
+import time
+
+from .reader import ReportSplitter
+
+
+# Bytes read from a file at a time
+READ_SIZE = 1 << 16
+
+
+def _identity(stat):
+    return (stat.st_dev, stat.st_ino)
+
+
+def _find_file(directory, identity):
+    """ Looks for a file with the given identity in directory (e.g. a log renamed by rotation) """
+    try:
+        entries = os.scandir(directory)
+    except OSError:
+        return None
+    with entries:
+        for entry in entries:
+            try:
+                if entry.is_file() and _identity(entry.stat()) == identity:
+                    return entry.path
+            except OSError:
+                continue
+    return None
+
+
+class _Source(object):
+    """ Read state of one tailed path """
+
+    def __init__(self, path):
+        self.path = path
+        self.stream = None
+        self.identity = None
+        self.position = 0      # end of the last complete line read
+        self.partial = b""     # incomplete last line
+        self.splitter = ReportSplitter()
+        self.offset = 0        # end of the last complete report handed out
+
+    def open(self, stream, offset=0):
+        if self.stream is not None and self.stream is not stream:
+            self.stream.close()
+        stream.seek(offset)
+        self.stream = stream
+        self.identity = _identity(os.fstat(stream.fileno()))
+        self.position = offset
+        self.partial = b""
+        self.splitter = ReportSplitter()
+        self.offset = offset
+
+    def read(self, final=False):
+        """ Reads appended data, returns the reports it completes
+
+        Args:
+            final: the file will not grow anymore, hand out the last report too
+        """
+        reports = []
+        while True:
+            data = self.stream.read(READ_SIZE)
+            if not data:
+                break
+            lines = (self.partial + data).split(b"\n")
+            self.partial = lines.pop()
+            for line in lines:
+                self.position += len(line) + 1
+                self._push(line, reports)
+
+        if final:
+            if self.partial:
+                self.position += len(self.partial)
+                self._push(self.partial, reports)
+                self.partial = b""
+            for report, mark in self.splitter.flush():
+                reports.append(report)
+                self.offset = mark
+        return reports
+
+    def _push(self, line, reports):
+        for report, mark in self.splitter.push(line.decode("ascii", "replace"), self.position):
+            reports.append(report)
+            self.offset = mark
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+
+class Tailer(object):
+    """ Incrementally reads TAF reports appended to log files
+
+    The byte offset just past the last complete report handed out is
+    tracked per file and saved in a checkpoint file by commit(), so after
+    a restart reading resumes there instead of at the start of the file.
+    Incomplete reports (still being written) are only handed out once
+    they are complete, and read again after a restart.
+
+    Rotation (the log renamed and a new one created under the same name)
+    is detected by file identity: the old file is read to its end before
+    switching to the new one, also across restarts as long as the old
+    file stays in the same directory. A file shorter than what was
+    already read was truncated, and is read again from its start.
+
+        tailer = Tailer(["/var/log/tafs.log"], "/var/lib/pytaf/tafs.checkpoint")
+        for path, report in tailer.follow():
+            decoder = pytaf.Decoder(pytaf.TAF(report), now)
+    """
+
+    def __init__(self, paths, checkpoint=None):
+        """
+        Args:
+            paths: paths of the log files to tail
+            checkpoint: path of the checkpoint file, None to always start from the beginning
+        """
+        self._checkpoint = checkpoint
+        self._sources = [_Source(path) for path in paths]
+        self._committed = None
+
+        state = self._load()
+        for source in self._sources:
+            self._resume(source, state.get(source.path))
+        self._committed = self._state()
+
+    def _load(self):
+        if self._checkpoint is None:
+            return {}
+        try:
+            with open(self._checkpoint) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _resume(self, source, entry):
+        try:
+            stream = open(source.path, "rb")
+        except FileNotFoundError:
+            stream = None
+
+        if entry is None:
+            if stream is not None:
+                source.open(stream)
+            return
+
+        identity = (entry["device"], entry["inode"])
+        offset = entry["offset"]
+        if stream is not None and _identity(os.fstat(stream.fileno())) == identity:
+            if os.fstat(stream.fileno()).st_size < offset:
+                offset = 0
+            source.open(stream, offset)
+            return
+
+        # Rotated while we were away, finish the old file first if it is still around
+        old_path = _find_file(os.path.dirname(source.path) or ".", identity)
+        if old_path is not None:
+            if stream is not None:
+                stream.close()
+            source.open(open(old_path, "rb"), offset)
+        elif stream is not None:
+            source.open(stream)
+
+    def poll(self):
+        """ Reads whatever was appended since the last call
+
+        Returns:
+            List of (path, report) tuples of complete reports
+        """
+        result = []
+        for source in self._sources:
+            for report in self._poll(source):
+                result.append((source.path, report))
+        return result
+
+    def _poll(self, source):
+        reports = []
+        if source.stream is not None:
+            reports.extend(source.read())
+
+        try:
+            stat = os.stat(source.path)
+        except FileNotFoundError:
+            # Rotated away and not recreated yet
+            return reports
+
+        if source.stream is None:
+            source.open(open(source.path, "rb"))
+        elif _identity(stat) != source.identity:
+            # Rotated: the old file is complete, the new one starts from scratch
+            reports.extend(source.read(final=True))
+            source.open(open(source.path, "rb"))
+        elif stat.st_size < source.position + len(source.partial):
+            # Truncated in place, whatever was buffered is gone
+            source.open(source.stream)
+        else:
+            return reports
+
+        reports.extend(source.read())
+        return reports
+
+    def _state(self):
+        return {source.path: {"device": source.identity[0], "inode": source.identity[1], "offset": source.offset}
+                for source in self._sources if source.identity is not None}
+
+    def commit(self):
+        """ Saves the offsets of all reports handed out so far in the checkpoint file
+
+        The file is replaced atomically, a crash leaves either the previous
+        or the new checkpoint behind.
+        """
+        state = self._state()
+        if self._checkpoint is None or state == self._committed:
+            return
+
+        tmp = self._checkpoint + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._checkpoint)
+        try:
+            fd = os.open(os.path.dirname(os.path.abspath(self._checkpoint)), os.O_RDONLY)
+        except OSError:
+            # Directories can't be opened on Windows, nothing to sync there
+            pass
+        else:
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        self._committed = state
+
+    def follow(self, interval=1.0):
+        """ Yields (path, report) tuples forever, polling every interval seconds when idle
+
+        Reports are committed once the caller asks for the next batch,
+        that is after it processed all reports of the previous one.
+        """
+        while True:
+            reports = self.poll()
+            for report in reports:
+                yield report
+            self.commit()
+            if not reports:
+                time.sleep(interval)
+
+    def close(self):
+        for source in self._sources:
+            source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,198 @@
+from bisect import bisect_right
+from datetime import timedelta
+
+
+BASE = "BASE"
+TEMPO = "TEMPO"
+PROB = "PROB"
+BECMG = "BECMG"
+
+
+def _time(timestamp):
+    # Decoder turns hour 24 into 23:59, the timeline wants the real boundary
+    if timestamp.minute == 59:
+        return timestamp + timedelta(minutes=1)
+    return timestamp
+
+
+def _layer(group):
+    if group.type.startswith("PROB"):
+        return PROB
+    if group.type.startswith("TEMPO"):
+        return TEMPO
+    if group.type.startswith("BECMG"):
+        return BECMG
+    return BASE
+
+
+class Segment(object):
+    """ A time range of one timeline layer
+
+    Attributes:
+        start, end: time range [start, end)
+        group: TafGroup the forecast comes from
+        layer: BASE for prevailing conditions, TEMPO, PROB or BECMG for
+               overlays (a BECMG overlay is the transition window,
+               the new conditions join the base layer at its end)
+        probability: percentage of a PROB overlay, None otherwise
+    """
+
+    __slots__ = ("start", "end", "group", "layer", "probability")
+
+    def __init__(self, start, end, group, layer, probability=None):
+        self.start = start
+        self.end = end
+        self.group = group
+        self.layer = layer
+        self.probability = probability
+
+    @property
+    def forecast(self):
+        return self.group.forecast
+
+    def __repr__(self):
+        return "%s-%s %s" % (self.start.strftime('%d %H:%M'), self.end.strftime('%d %H:%M'), self.layer)
+
+
+class IntervalTree(object):
+    """ Static interval tree over segments
+
+    Segments are sorted by start time and viewed as an implicit balanced
+    binary tree (the middle element of every range is the root of that range),
+    each node storing the maximum end time of its subtree. Stabbing and
+    overlap queries take O(min(n, k log n)) for k results: the walk may
+    descend through a subtree for each result.
+    """
+
+    def __init__(self, segments):
+        self._segments = sorted(segments, key=lambda segment: (segment.start, segment.end))
+        self._max_end = [None] * len(self._segments)
+        self._build(0, len(self._segments))
+
+    def _build(self, lo, hi):
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        max_end = self._segments[mid].end
+        for child in (self._build(lo, mid), self._build(mid + 1, hi)):
+            if child is not None and child > max_end:
+                max_end = child
+        self._max_end[mid] = max_end
+        return max_end
+
+    def _query(self, lo, hi, start, end, result):
+        # Collects segments overlapping [start, end), or containing start if start == end
+        if lo >= hi:
+            return
+        mid = (lo + hi) // 2
+        if self._max_end[mid] <= start:
+            return
+        self._query(lo, mid, start, end, result)
+        segment = self._segments[mid]
+        if segment.start > end or (segment.start == end and start != end):
+            return
+        if segment.end > start:
+            result.append(segment)
+        self._query(mid + 1, hi, start, end, result)
+
+    def stab(self, timestamp):
+        """ Returns segments containing timestamp, sorted by start """
+        result = []
+        self._query(0, len(self._segments), timestamp, timestamp, result)
+        return result
+
+    def overlap(self, start, end):
+        """ Returns segments overlapping [start, end), sorted by start """
+        result = []
+        if start < end:
+            self._query(0, len(self._segments), start, end, result)
+        return result
+
+    def __iter__(self):
+        return iter(self._segments)
+
+    def __len__(self):
+        return len(self._segments)
+
+
+class Timeline(object):
+    """ Layered timeline of a decoded TAF
+
+    Unlike Decoder.groups, which flattens all sections into one list,
+    the timeline keeps a prevailing base layer (main, FM and completed
+    BECMG groups, non-overlapping) and the TEMPO, PROB and BECMG
+    overlays with their own validity periods, overlapping or not.
+    """
+
+    def __init__(self, decoder):
+        groups = [group for group in decoder.source_groups
+                  if group.start_time is not None and group.end_time is not None]
+        valid_till = _time(decoder.end_time)
+
+        # Prevailing conditions change at every main/FM group start and at every BECMG end
+        changes = []
+        overlays = []
+        for group in groups:
+            layer = _layer(group)
+            start = _time(group.start_time)
+            end = _time(group.end_time)
+            if layer == BASE:
+                changes.append((start, group))
+            else:
+                probability = None
+                if layer == PROB:
+                    probability = group.forecast.get("prob")
+                overlays.append(Segment(start, end, group, layer, probability))
+                if layer == BECMG:
+                    changes.append((end, group))
+        changes.sort(key=lambda change: change[0])
+
+        self.base = []
+        for i, (start, group) in enumerate(changes):
+            end = changes[i + 1][0] if i + 1 < len(changes) else valid_till
+            if start < end:
+                self.base.append(Segment(start, end, group, BASE))
+        self._base_starts = [segment.start for segment in self.base]
+
+        self.overlays = IntervalTree(overlays)
+
+    @property
+    def start_time(self):
+        return self.base[0].start
+
+    @property
+    def end_time(self):
+        return self.base[-1].end
+
+    def base_at(self, timestamp):
+        """ Returns the base segment containing timestamp, or None """
+        index = bisect_right(self._base_starts, timestamp) - 1
+        if index >= 0 and timestamp < self.base[index].end:
+            return self.base[index]
+        return None
+
+    def at(self, timestamp):
+        """ Stabbing query
+
+        Returns:
+            (base segment or None, list of overlay segments in effect)
+        """
+        return (self.base_at(timestamp), self.overlays.stab(timestamp))
+
+    def between(self, start, end):
+        """ Range query
+
+        Returns:
+            (base segments, overlay segments) overlapping [start, end), sorted by start
+        """
+        base = []
+        index = max(bisect_right(self._base_starts, start) - 1, 0)
+        while index < len(self.base) and self.base[index].start < end:
+            if self.base[index].end > start:
+                base.append(self.base[index])
+            index += 1
+        return (base, self.overlays.overlap(start, end))
+
+    def transitions(self):
+        """ Returns BECMG transition windows """
+        return [segment for segment in self.overlays if segment.layer == BECMG]
@@ -1,7 +1,14 @@
+import io
+import random
+import re
 import unittest
 import pytaf
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+from pytaf.taf import split_groups
+from pytaf.tafdecoder import FragmentCache
+
 
 def _set_wx(name, contents, use_name=True):
     result = contents
@@ -88,6 +95,48 @@ class TafTests(unittest.TestCase):
         self.group = self.taf.get_group(datetime(2016, 11, 24, 5, 55))
         self.assertWeatherEquals(set_weather(), set_clouds())
 
+    def test_weather_words_are_shared(self):
+        first = pytaf.TAF("TAF KMSP 212348Z 2200/2306 11010KT 5SM -SNPL BKN050")
+        second = pytaf.TAF("TAF KMSN 212348Z 2200/2306 11010KT 3SM -SNPL OVC020")
+        wx = first.get_groups()[0]["weather"][0]
+        self.assertIs(wx, second.get_groups()[0]["weather"][0])
+        self.assertEqual(wx, {'SN': 'phenomenon', 'PL': 'phenomenon', '-': 'intensity', '-SNPL': 'weather'})
+        self.assertEqual(set(wx.features), {'wx_phenomenon_SN', 'wx_phenomenon_PL', 'wx_intensity_light'})
+
+    def test_decode_taf_is_repeatable(self):
+        self.raw_taf = """
+        TAF KMSP 212111Z 2121/2224 11011KT P6SM BKN250 FM220400 11011KT P6SM
+          SCT080 BKN110 PROB30 2212/2215 4SM -SNPL OVC020 FM221500 11014G20KT
+          2SM -SNPL SCT009 OVC020="""
+        self.timestamp = datetime(2016, 11, 21, 11, 11)
+        self.parse_taf()
+
+        expected = self.taf.decode_taf()
+        self.assertIn("issued 21:11 UTC on the 21st", expected)
+        self.assertIn("between 12:00 on the 22nd and 15:00 on the 22nd", expected)
+        self.assertEqual(self.taf.decode_taf(), expected)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda i: self.taf.decode_taf(), range(400)))
+        self.assertEqual(set(results), {expected})
+
+    def test_streaming_output(self):
+        self.raw_taf = """
+        TAF KEWR 230232Z 2303/2406 30012G18KT P6SM BKN040 FM230400 30011G17KT
+          P6SM SCT040 FM230600 29009KT P6SM SCT040 $="""
+        self.timestamp = datetime(2016, 11, 23, 2, 32)
+        self.parse_taf()
+
+        expected = self.taf.decode_taf()
+        lines = list(self.taf.iter_decode_taf())
+        self.assertEqual("".join(lines), expected)
+        self.assertTrue(all(line.endswith("\n") for line in lines))
+
+        stream = io.StringIO()
+        self.taf.write_taf(stream)
+        self.assertEqual(stream.getvalue(), expected)
+        self.assertEqual("".join(pytaf.iter_decode_tafs([self.taf, self.taf])), expected + "\n" + expected + "\n")
+
     def test_wind_gusts(self):
         self.raw_taf = """
         TAF KEWR 230232Z 2303/2406 30012G18KT P6SM BKN040 FM230400 30011G17KT
@@ -129,6 +178,40 @@ class TafTests(unittest.TestCase):
             'weather': 1, 'wx_phenomenon_RA': 1, 'wx_modifier_TS': 1
         })
 
+    def test_metric_visibility(self):
+        self.raw_taf = """
+        TAF EGLL 291100Z 2912/3018 24010KT 9999 SCT030 BKN045
+          FM291800 24008KT 4000 BR BKN008"""
+        self.timestamp = datetime(2016, 11, 29, 11, 0)
+        self.parse_taf()
+
+        # 9999 means 10 km or more
+        self.group = self.taf.get_group(datetime(2016, 11, 29, 12, 0))
+        self.assertEqual(self.group.forecast['visibility_M'], 10000)
+        self.group = self.taf.get_group(datetime(2016, 11, 29, 20, 0))
+        self.assertEqual(self.group.forecast['visibility_M'], 4000)
+
+    def test_normalized_features(self):
+        self.raw_taf = """
+        TAF EGLL 291100Z 2912/3018 24010MPS 9999 SCT030 BKN045
+          FM291800 24008KT 1/2SM FG VV002"""
+        self.timestamp = datetime(2016, 11, 29, 11, 0)
+        self.parse_taf()
+
+        self.group = self.taf.get_group(datetime(2016, 11, 29, 12, 0))
+        self.assertEqual(self.group.forecast['visibility_M'], 10000)
+        normalized = self.group.normalized
+        self.assertEqual(normalized['wind_speed_kt'], 19.44)
+        self.assertEqual(normalized['visibility_m'], 10000)
+        self.assertEqual(normalized['clouds_base_ft'], 3000)
+        self.assertEqual(normalized['ceiling_ft'], 4500)
+        self.assertNotIn('wind_speed_MPS', normalized)
+
+        normalized = self.taf.get_group(datetime(2016, 11, 29, 20, 0)).normalized
+        self.assertEqual(normalized['wind_speed_kt'], 8)
+        self.assertEqual(normalized['visibility_m'], 804.67)
+        self.assertEqual(normalized['vertical_visibility_ft'], 200)
+
     def test_prob_forecast(self):
         self.raw_taf = """
         TAF KMSP 212111Z 2121/2224 11011KT P6SM BKN250 FM220400 11011KT P6SM
@@ -170,4 +253,115 @@ class TafTests(unittest.TestCase):
             'weather': 1, 'wx_modifier_FZ': 1, 'wx_phenomenon_FG': 1,
             'visibility_vertical_ft': 2, 'visibility_SM': 0.5,
             'clouds_layer_OVC': 1, 'clouds_ceiling_ft': 4, 'clouds_num_layers': 1,
-        })
\ No newline at end of file
+        })
+
+    def test_group_splitter_matches_regex(self):
+        old_pattern = re.compile(r"(?:FM|(?:PROB(?:\d{1,2})\s*(?:TEMPO)?)|TEMPO|BECMG|[\S\s])[A-Z0-9\+\-/\s$]+?(?=FM|PROB|TEMPO|BECMG|$)")
+        tokens = ["FM", "PROB", "TEMPO", "BECMG", "PROB30", "PROB4", "TEMPO ", "BECMG",
+                  "3", "40", "  ", " ", "\n", "KT", "SM", "/", "+", "-", "$", "=", "x", "(", "OVC008", "TAF KDEN"]
+        rnd = random.Random(40)
+        for i in range(3000):
+            string = "".join(rnd.choice(tokens) for j in range(rnd.randint(0, 20)))
+            self.assertEqual(split_groups(string), old_pattern.findall(string), repr(string))
+
+        taf = pytaf.TAF("""TAF KDEN 291134Z 2912/3018 32006KT 1/4SM FG OVC001
+            TEMPO 2914/2918 1SM -BR PROB30 2916/2920 VRB20G30KT -TSRA
+            PROB40 TEMPO 2918/2920 BKN050CB FM291500 04006KT P6SM SKC BECMG 2922/2924 24010KT""")
+        self.assertEqual(split_groups(taf.get_taf()), old_pattern.findall(taf.get_taf()))
+
+    def test_size_limits(self):
+        report = "TAF KDEN 291134Z 2912/3018 32006KT P6SM SKC"
+        garbage = report + " " + "PROB30 " * 5000 + "x"
+
+        with self.assertRaises(pytaf.MalformedTAF):
+            pytaf.TAF(garbage)
+        with self.assertRaises(pytaf.MalformedTAF):
+            pytaf.TAF(report + " 32006KT" * 100, max_group_size=200)
+        self.assertEqual(len(pytaf.TAF(garbage, max_report_size=len(garbage)).get_groups()), 2501)
+
+    def test_selected_fields(self):
+        report = """TAF KDEN 291134Z 2912/3018 32006KT 1/4SM FG OVC001
+            TEMPO 2914/2918 1SM -BR FM291500 04006KT P6SM SKC"""
+        timestamp = datetime(2016, 11, 29)
+        full = pytaf.Decoder(pytaf.TAF(report), timestamp)
+
+        taf = pytaf.TAF(report, fields=["wind", "clouds"])
+        self.assertEqual(taf.get_groups()[0]["visibility"], {})
+        self.assertEqual(taf.get_groups()[0]["weather"], [])
+        self.assertEqual(taf.get_groups()[1]["header"], full._taf.get_groups()[1]["header"])
+
+        decoder = pytaf.Decoder(taf, timestamp)
+        self.assertEqual([(g.type, g.start_time, g.end_time) for g in decoder.groups],
+                         [(g.type, g.start_time, g.end_time) for g in full.groups])
+        group = decoder.get_group(datetime(2016, 11, 29, 14, 30))
+        self.assertEqual(group.forecast, dict(full.groups[1].wind, **full.groups[1].clouds))
+        self.assertEqual(group.normalized["ceiling_ft"], 100)
+        self.assertNotIn("Visibility", decoder.decode_taf())
+
+        # The decoder can narrow the fields down further, not widen them
+        decoder = pytaf.Decoder(taf, timestamp, fields=["wind", "weather"])
+        self.assertEqual(decoder.fields, frozenset(["wind"]))
+        self.assertEqual(decoder.groups[0].forecast, full.groups[0].wind)
+
+        # Restricted on the decoder only, the text leaves the other fields out too
+        decoder = pytaf.Decoder(pytaf.TAF(report), timestamp, fields=["wind"])
+        self.assertEqual(decoder.groups[0].forecast, full.groups[0].wind)
+        self.assertIs(decoder.groups[0].ceiling_ft, pytaf.tafdecoder.MISSING)
+        self.assertNotIn("ceiling_ft", decoder.groups[0].normalized)
+        text = decoder.decode_taf()
+        self.assertIn("Wind: from 320 degrees", text)
+        self.assertIn("Temporarily between", text)
+        for line in ("Visibility", "Sky conditions", "Weather"):
+            self.assertNotIn(line, text)
+
+        with self.assertRaises(ValueError):
+            pytaf.TAF(report, fields=["ceiling"])
+
+    def test_fragment_cache(self):
+        taf = pytaf.TAF("""TAF KMKE 172034Z 1721/1824 14013G19KT P6SM -RA BR BKN250
+            FM180100 17008KT P6SM -RA BR BKN250 FM181000 17007KT P6SM VCSH SCT040 BKN250""")
+        decoder = pytaf.Decoder(taf, datetime(2016, 11, 17))
+        decoder.fragment_cache = None
+        expected = decoder.decode_taf()
+
+        cache = decoder.fragment_cache = FragmentCache(maxsize=3)
+        self.assertEqual(decoder.decode_taf(), expected)
+        self.assertEqual(cache.stats()["hits"], 2)
+        self.assertEqual(cache.stats()["misses"], 4)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(decoder.decode_taf(), expected)
+
+    def test_source_spans(self):
+        taf = pytaf.TAF("""TAF KDEN 291134Z 2912/3018 32006KT 1/4SM FG OVC001
+            TEMPO 2914/2918 1SM -BR BKN005 OVC010 FM291500 04006KT P6SM SKC WS020/27050KT""")
+        self.assertEqual(taf.get_text(taf.get_header_span()), "TAF KDEN 291134Z 2912/3018")
+        self.assertEqual([group.strip() for group in taf.get_raw_groups()],
+                         ["TAF KDEN 291134Z 2912/3018 32006KT 1/4SM FG OVC001",
+                          "TEMPO 2914/2918 1SM -BR BKN005 OVC010", "FM291500 04006KT P6SM SKC WS020/27050KT"])
+
+        first, tempo, fm = taf.get_group_spans()
+        self.assertEqual(taf.get_text(first["wind"]), "32006KT")
+        self.assertEqual(taf.get_text(first["visibility"]), "1/4SM")
+        self.assertNotIn("header", first)
+        self.assertEqual(taf.get_text(tempo["header"]), "TEMPO 2914/2918")
+        self.assertEqual([taf.get_text(span) for span in tempo["clouds"]], ["BKN005", "OVC010"])
+        self.assertEqual([taf.get_text(span) for span in tempo["weather"]], ["-BR"])
+        self.assertNotIn("wind", tempo)
+        self.assertEqual(taf.get_text(fm["header"]), "FM291500")
+        self.assertEqual([taf.get_text(span) for span in fm["clouds"]], ["SKC"])
+        self.assertEqual(taf.get_text(fm["windshear"]), "WS020/27050KT")
+
+    def test_span_boundaries(self):
+        # Fields are found within the group only, as in a copy of it: a token right
+        # at the start of a span has no whitespace before it in the group
+        report = "TAF KDEN 291134Z 2912/3018 32006KT 9999 -RA BKN010 VV002 1/4SM"
+        taf = pytaf.TAF(report, profile="default")
+        for pos in range(len(report)):
+            for end in (len(report), report.find(" ", pos + 1)):
+                if end > pos:
+                    self.assertEqual(taf._parse_group(report, pos, end)[0],
+                                     taf._parse_group(report[pos:end], 0, end - pos)[0], (pos, end))
+        group, spans = taf._parse_group(report, report.index("32006KT"), len(report))
+        self.assertIsNone(group["wind"])
+        self.assertEqual(taf.get_text(spans["visibility"]), "9999")
@@ -0,0 +1,65 @@
+import unittest
+import pytaf
+from datetime import datetime, timedelta
+
+
+KIAH = """TAF KIAH 230259Z 2303/2406 16010KT P6SM VCSH FEW028 SCT050 BKN250 FM230900
+  18007KT P6SM -RA VCTS SCT015 BKN035CB
+ TEMPO 2311/2314 TSRA FM231600 32010KT P6SM SCT250 FM240000
+  34004KT P6SM SKC="""
+
+KEWR = """TAF KEWR 230232Z 2303/2406 30012G18KT P6SM BKN040 FM230400 30011G17KT
+  P6SM SCT040 FM230600 29009KT P6SM SCT040 FM231400 31011G17KT
+  P6SM SKC FM240200 34005KT P6SM BKN250="""
+
+
+def decode(raw, timestamp):
+    return pytaf.Decoder(pytaf.TAF(raw), timestamp)
+
+
+class AlertTests(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = pytaf.AlertEngine([
+            pytaf.Rule("low ceiling", "ceiling_ft < 4000"),
+            pytaf.Rule("thunder", "wx_modifier_TS and weather"),
+            pytaf.Rule("gusty", "wind_gust_diff_kt >= 6"),
+            pytaf.Rule("windshear", "windshear"),
+        ])
+        self.kiah = decode(KIAH, datetime(2016, 11, 23, 2, 59))
+        self.kewr = decode(KEWR, datetime(2016, 11, 23, 2, 32))
+
+    def test_invalid_rule(self):
+        self.assertRaises(pytaf.AlertError, pytaf.Rule, "bad", "ceiling <")
+
+    def test_first_crossing(self):
+        alerts = self.engine.update_many({"KIAH": self.kiah, "KEWR": self.kewr})
+        kiah = [(a.rule.name, a.start, a.duration) for a in alerts["KIAH"]]
+        self.assertEqual(kiah, [
+            ("low ceiling", datetime(2016, 11, 23, 9, 0), timedelta(hours=7)),
+            ("thunder", datetime(2016, 11, 23, 9, 0), timedelta(hours=7)),
+        ])
+        kewr = [(a.rule.name, a.start, a.duration) for a in alerts["KEWR"]]
+        self.assertEqual(kewr, [("gusty", datetime(2016, 11, 23, 3, 0), timedelta(hours=3))])
+
+    def test_unchanged_stations_are_skipped(self):
+        self.engine.update_many({"KIAH": self.kiah, "KEWR": self.kewr})
+        again = decode(KIAH, datetime(2016, 11, 23, 2, 59))
+        self.assertEqual(self.engine.update_many({"KIAH": again, "KEWR": self.kewr}), {})
+        self.assertEqual(len(self.engine.alerts("KIAH")), 2)
+
+    def test_normalized_features(self):
+        # Only broken and overcast layers make a ceiling, at their own height
+        engine = pytaf.AlertEngine([pytaf.Rule("low ceiling", "ceiling_ft < 500"),
+                                    pytaf.Rule("gusty", "wind_gust_diff_kt >= 10")])
+        timestamp = datetime(2016, 11, 23, 2, 59)
+        few = decode("TAF KIAH 230259Z 2303/2406 16010KT P6SM FEW004 SCT050", timestamp)
+        self.assertEqual(engine.evaluate("KIAH", few), [])
+        under = decode("TAF KIAH 230259Z 2303/2406 16010KT P6SM FEW002 BKN006", timestamp)
+        self.assertEqual(engine.evaluate("KIAH", under), [])
+        low = decode("TAF KIAH 230259Z 2303/2406 16010KT P6SM FEW002 BKN004", timestamp)
+        self.assertEqual([a.rule.name for a in engine.evaluate("KIAH", low)], ["low ceiling"])
+
+        # Wind rules hold whatever unit the station reports in
+        mps = decode("TAF UUEE 230259Z 2303/2406 16005G11MPS 9999 SCT050", timestamp)
+        self.assertEqual([a.rule.name for a in engine.evaluate("UUEE", mps)], ["gusty"])
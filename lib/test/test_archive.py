@@ -0,0 +1,86 @@
+import unittest
+import pytaf
+from datetime import datetime, timedelta
+
+
+KMSP_1 = """
+TAF KMSP 212111Z 2121/2224 11011KT P6SM BKN250 FM220400 11011KT P6SM
+  SCT080 BKN110 FM221000 11012KT P6SM -SN SCT035 BKN050
+  FM221200 11014KT 3SM -SN SCT020 OVC035="""
+
+KMSP_2 = """
+TAF KMSP 212348Z 2200/2306 11010KT P6SM BKN250 FM220600 11011KT
+  P6SM SCT080 BKN110 FM221100 11012KT 5SM -SNPL SCT035
+  BKN050 FM221600 11014KT 6SM -RAPL SCT020 OVC035="""
+
+
+def decode(raw, timestamp):
+    return pytaf.Decoder(pytaf.TAF(raw), timestamp)
+
+
+class ArchiveTests(unittest.TestCase):
+
+    def setUp(self):
+        self.archive = pytaf.Archive()
+        self.first = decode(KMSP_1, datetime(2016, 11, 21, 21, 11))
+        self.second = decode(KMSP_2, datetime(2016, 11, 21, 23, 48))
+
+    def tearDown(self):
+        self.archive.close()
+
+    def test_add_many_and_duplicates(self):
+        self.assertEqual(self.archive.add_many([self.first, self.second]), 2)
+        self.assertFalse(self.archive.add(self.first))
+        self.assertEqual(len(self.archive), 2)
+        self.assertEqual(self.archive.issuances("KMSP"),
+                         [datetime(2016, 11, 21, 21, 11), datetime(2016, 11, 21, 23, 48)])
+
+    def test_forecast_in_force(self):
+        self.archive.add(self.first)
+        self.archive.add(self.second)
+        at = datetime(2016, 11, 22, 11, 30)
+
+        group = self.archive.get_group("KMSP", datetime(2016, 11, 21, 22, 0), at)
+        self.assertEqual(group.issued, datetime(2016, 11, 21, 21, 11))
+        self.assertEqual(group.forecast, self.first.get_group(at).forecast)
+
+        group = self.archive.get_group("KMSP", datetime(2016, 11, 22, 0, 0), at)
+        self.assertEqual(group.forecast, self.second.get_group(at).forecast)
+
+        self.assertIsNone(self.archive.get_group("KMSP", datetime(2016, 11, 20), at))
+
+    def test_amendment_issued_with_report(self):
+        at = datetime(2016, 11, 22, 11, 30)
+        amended = decode(KMSP_1.replace("TAF KMSP", "TAF AMD KMSP").replace("3SM -SN", "1SM SN"),
+                         datetime(2016, 11, 21, 21, 11))
+        self.assertTrue(self.archive.add(self.first))
+        self.assertTrue(self.archive.add(amended))
+        self.assertFalse(self.archive.add(amended))
+        self.assertEqual(len(self.archive), 2)
+        self.assertEqual(self.archive.issuances("KMSP"), [datetime(2016, 11, 21, 21, 11)])
+        group = self.archive.get_group("KMSP", datetime(2016, 11, 21, 22, 0), datetime(2016, 11, 22, 12, 30))
+        self.assertEqual(group.kind, "AMD")
+        self.assertEqual(group.forecast["visibility_SM"], 1)
+
+        # A regular report is kept once, a re-sent amendment with new text replaces the archived one
+        self.assertFalse(self.archive.add(decode(KMSP_1.replace("BKN250", "BKN200"), datetime(2016, 11, 21, 21, 11))))
+        corrected = decode(KMSP_1.replace("TAF KMSP", "TAF AMD KMSP").replace("3SM -SN", "2SM -SN"),
+                           datetime(2016, 11, 21, 21, 11))
+        self.assertTrue(self.archive.add(corrected))
+        self.assertEqual(len(self.archive), 2)
+        groups = self.archive.query("KMSP", at, at + timedelta(hours=2))
+        self.assertEqual([(group.kind, group.forecast.get("visibility_SM")) for group in groups
+                          if group.type == "FM" and group.start_time.hour == 12], [(None, 3), ("AMD", 2)])
+
+    def test_range_and_lead_time_queries(self):
+        self.archive.add_many([self.first, self.second])
+        groups = self.archive.query("KMSP", datetime(2016, 11, 22, 10, 0), datetime(2016, 11, 22, 12, 0))
+        self.assertTrue(groups)
+        for group in groups:
+            self.assertTrue(group.start_time < datetime(2016, 11, 22, 12, 0))
+            self.assertTrue(group.end_time > datetime(2016, 11, 22, 10, 0))
+
+        groups = self.archive.query_lead_time("KMSP", timedelta(hours=6), timedelta(hours=12))
+        self.assertTrue(groups)
+        for group in groups:
+            self.assertTrue(timedelta(hours=6) <= group.lead_time <= timedelta(hours=12))
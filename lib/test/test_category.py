@@ -0,0 +1,74 @@
+import unittest
+import pytaf
+from datetime import datetime
+
+
+KDEN = """TAF AMD KDEN 291134Z 2912/3018 32006KT 1/4SM FG OVC001
+     TEMPO 2914/2915 1SM -BR CLR
+     FM291500 04006KT P6SM SKC
+     FM291900 05007KT P6SM SCT050 BKN090 WS010/13040KT
+     PROB30 2921/3001 VRB20G30KT 2SM -TSRA BKN008CB
+     FM300100 31007KT P6SM SCT070 BKN120"""
+
+EGLL = """TAF EGLL 291100Z 2912/3018 24010KT 9999 SCT030 BKN045
+     FM291800 24008KT 4000 BR BKN008"""
+
+KDEN_PROB_FOG = """TAF KDEN 291134Z 2912/3018 32006KT P6SM SCT050 BKN090
+     PROB30 2921/3001 1/2SM FG
+     FM300100 31007KT P6SM SCT070 BKN120"""
+
+
+class CategoryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.kden = pytaf.Decoder(pytaf.TAF(KDEN), datetime(2016, 11, 29, 11, 34))
+        self.egll = pytaf.Decoder(pytaf.TAF(EGLL), datetime(2016, 11, 29, 11, 0))
+
+    def test_single_group(self):
+        self.assertEqual(pytaf.flight_category(self.kden.get_group(datetime(2016, 11, 29, 12, 0))), "LIFR")
+        self.assertEqual(pytaf.flight_category(self.egll.get_group(datetime(2016, 11, 29, 12, 0))), "VFR")
+        self.assertEqual(pytaf.flight_category(self.egll.get_group(datetime(2016, 11, 29, 20, 0))), "IFR")
+
+    def test_fields_not_decoded(self):
+        # Without clouds or visibility the category is not known, rather than VFR
+        for taf_fields, decoder_fields in ((["wind"], None), (None, ["wind", "clouds"])):
+            decoder = pytaf.Decoder(pytaf.TAF(KDEN, fields=taf_fields), datetime(2016, 11, 29, 11, 34),
+                                    fields=decoder_fields)
+            group = decoder.get_group(datetime(2016, 11, 29, 12, 0))
+            self.assertIsNone(pytaf.flight_category(group))
+            self.assertIsNone(pytaf.category.group_ceiling(group))
+            timeline, = pytaf.category_timelines([decoder])
+            self.assertEqual(set(category for start, end, category in timeline.worst), set([None]))
+
+        decoder = pytaf.Decoder(pytaf.TAF(KDEN, fields=["clouds", "visibility"]), datetime(2016, 11, 29, 11, 34))
+        timeline, = pytaf.category_timelines([decoder])
+        self.assertEqual(timeline.worst, pytaf.category_timelines([self.kden])[0].worst)
+
+    def test_timelines(self):
+        kden, egll = pytaf.category_timelines([self.kden, self.egll])
+        self.assertEqual(kden.station, "KDEN")
+        self.assertEqual(kden.prevailing, [
+            (datetime(2016, 11, 29, 12, 0), datetime(2016, 11, 29, 15, 0), "LIFR"),
+            (datetime(2016, 11, 29, 15, 0), datetime(2016, 11, 30, 18, 0), "VFR"),
+        ])
+        self.assertEqual(kden.worst, [
+            (datetime(2016, 11, 29, 12, 0), datetime(2016, 11, 29, 15, 0), "LIFR"),
+            (datetime(2016, 11, 29, 15, 0), datetime(2016, 11, 29, 21, 0), "VFR"),
+            (datetime(2016, 11, 29, 21, 0), datetime(2016, 11, 30, 1, 0), "IFR"),
+            (datetime(2016, 11, 30, 1, 0), datetime(2016, 11, 30, 18, 0), "VFR"),
+        ])
+        self.assertEqual(egll.category_at(datetime(2016, 11, 30, 2, 0)), "IFR")
+
+    def test_prob_branch(self):
+        # A PROB group's own conditions count, not the prevailing ones it is merged with
+        decoder = pytaf.Decoder(pytaf.TAF(KDEN_PROB_FOG), datetime(2016, 11, 29, 11, 34))
+        prob = decoder.get_group(datetime(2016, 11, 29, 22, 0))
+        self.assertEqual(prob.forecast["visibility_SM"], 6)
+        self.assertEqual(pytaf.flight_category(prob), "LIFR")
+        timeline, = pytaf.category_timelines([decoder])
+        self.assertEqual(timeline.worst, [
+            (datetime(2016, 11, 29, 12, 0), datetime(2016, 11, 29, 21, 0), "VFR"),
+            (datetime(2016, 11, 29, 21, 0), datetime(2016, 11, 30, 1, 0), "LIFR"),
+            (datetime(2016, 11, 30, 1, 0), datetime(2016, 11, 30, 18, 0), "VFR"),
+        ])
+        self.assertEqual(timeline.category_at(datetime(2016, 11, 29, 22, 0)), "VFR")
@@ -0,0 +1,76 @@
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from pytaf import cli
+from pytaf.reader import iter_reports
+
+
+REPORTS = """TAF KEWR 230232Z 2303/2406 30012G18KT P6SM BKN040 FM230400 30011G17KT
+  P6SM SCT040 FM230600 29009KT P6SM SCT040 FM231400 31011G17KT
+  P6SM SKC FM240200 34005KT P6SM BKN250=
+TAF KIAH 230259Z 2303/2406 16010KT P6SM VCSH FEW028 SCT050 BKN250 FM230900
+  18007KT P6SM -RA VCTS SCT015 BKN035CB
+ TEMPO 2311/2314 TSRA FM231600 32010KT P6SM SCT250 FM240000
+  34004KT P6SM SKC
+
+not a taf at all
+"""
+
+
+class CliTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        with open(os.path.join(self.dir, "a.txt"), "w") as f:
+            f.write(REPORTS)
+        with gzip.open(os.path.join(self.dir, "b.txt.gz"), "wt") as f:
+            f.write(REPORTS)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def run_cli(self, format, jobs=1):
+        out = io.StringIO()
+        err = io.StringIO()
+        result = cli.run([self.dir], out, err, format=format, jobs=jobs,
+                         timestamp=datetime(2016, 11, 23))
+        return result, out.getvalue(), err.getvalue()
+
+    def test_report_splitting(self):
+        reports = list(iter_reports(io.StringIO(REPORTS)))
+        self.assertEqual(len(reports), 3)
+        self.assertTrue(reports[0].startswith("TAF KEWR"))
+        self.assertTrue(reports[1].endswith("34004KT P6SM SKC"))
+
+    def test_jsonl_with_workers(self):
+        (decoded, errors), out, err = self.run_cli("jsonl", jobs=2)
+        self.assertEqual((decoded, errors), (4, 2))
+        records = [json.loads(line) for line in out.splitlines()]
+        self.assertEqual([r["station"] for r in records], ["KEWR", "KIAH", "KEWR", "KIAH"])
+        self.assertEqual(records[0]["groups"][0]["start"], "2016-11-23T03:00Z")
+        self.assertEqual(err.count("error:"), 2)
+
+    def test_csv_and_text(self):
+        (decoded, errors), out, err = self.run_cli("csv")
+        rows = list(csv.DictReader(io.StringIO(out)))
+        self.assertEqual(rows[0]["station"], "KEWR")
+        self.assertEqual(rows[0]["wind_gust_KT"], "18")
+
+        (decoded, errors), out, err = self.run_cli("text")
+        self.assertEqual(decoded, 4)
+        self.assertIn("TAF for KIAH", out)
+
+    def test_fields(self):
+        out = io.StringIO()
+        cli.run([self.dir], out, io.StringIO(), format="csv", timestamp=datetime(2016, 11, 23),
+                fields=["wind"])
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        self.assertEqual(rows[0]["wind_gust_KT"], "18")
+        self.assertEqual(rows[0]["clouds_ceiling_ft"], "")
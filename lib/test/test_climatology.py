@@ -0,0 +1,104 @@
+import pickle
+import unittest
+from datetime import datetime
+
+import pytaf
+from pytaf.climatology import Climatology, Histogram, QuantileSketch
+
+
+KDEN = """TAF KDEN 291134Z 2912/3018 32006KT 1/4SM FG OVC001
+     TEMPO 2914/2918 1SM -BR FM291500 04012G25KT P6SM SKC
+     FM300600 04006KT P6SM BKN050="""
+
+KJFK = """TAF KJFK 291130Z 2912/3018 18010KT P6SM -SHRA BKN020
+     FM292000 20015G30KT 3SM -RA OVC008="""
+
+KDEN_LATER = """TAF KDEN 291734Z 2918/3024 04010KT P6SM SCT050
+     FM300000 VRB03KT P6SM SKC="""
+
+KDEN_PROB_FOG = """TAF KDEN 291134Z 2912/3018 32012G25KT P6SM -RA SCT050 BKN090
+     PROB30 2921/3001 VRB03KT 1/2SM FG
+     FM300100 31007KT P6SM SCT070 BKN120"""
+
+
+class ClimatologyTests(unittest.TestCase):
+
+    def setUp(self):
+        timestamp = datetime(2016, 11, 29)
+        self.decoders = [pytaf.Decoder(pytaf.TAF(report), timestamp) for report in (KDEN, KJFK, KDEN_LATER)]
+
+    def test_hourly_samples(self):
+        clim = Climatology().add_many(self.decoders[:1])
+        self.assertEqual(clim.reports, 1)
+        # 30 hours of validity, one sample per hour of day, two at 12 to 17 UTC
+        self.assertEqual(len(clim), 24)
+        stats = clim[("KDEN", 11, 12)]
+        self.assertEqual(stats.samples, 2)
+        self.assertEqual(stats.category_frequencies()["LIFR"], 0.5)
+        self.assertEqual(stats.ceilings.quantile(0), 100)
+
+        # TEMPO wins over the main group as in Decoder.get_group()
+        stats = clim[("KDEN", 11, 14)]
+        self.assertEqual(stats.weather, {"wx_intensity_light": 1, "wx_phenomenon_BR": 1})
+        self.assertEqual(clim[("KDEN", 11, 20)].gust_frequency(), 1.0)
+        self.assertEqual(clim[("KDEN", 11, 20)].gusts.counts[6], 1)
+
+    def test_prob_branch(self):
+        # A PROB group is sampled with its own conditions, not the prevailing ones
+        decoder = pytaf.Decoder(pytaf.TAF(KDEN_PROB_FOG), datetime(2016, 11, 29, 11, 34))
+        clim = Climatology()
+        clim.add(decoder)
+        stats = clim[("KDEN", 11, 22)]
+        self.assertEqual(stats.category_frequencies()["LIFR"], 1.0)
+        self.assertNotIn("wx_phenomenon_RA", stats.weather)
+        self.assertEqual(stats.gust_frequency(), 0.0)
+        stats = clim[("KDEN", 11, 20)]
+        self.assertEqual(stats.category_frequencies()["VFR"], 1.0)
+        self.assertEqual(stats.gust_frequency(), 1.0)
+
+    def test_max_lead(self):
+        clim = Climatology(max_lead=6).add_many(self.decoders)
+        self.assertEqual(sum(stats.samples for stats in clim.buckets.values()), 18)
+        self.assertEqual(sorted(hour for station, month, hour in clim.buckets if station == "KDEN"),
+                         list(range(12, 24)))
+
+    def test_fields_not_decoded(self):
+        wind_only = pytaf.Decoder(pytaf.TAF(KDEN, fields=["wind"]), datetime(2016, 11, 29, 11, 34))
+        with self.assertRaises(ValueError):
+            Climatology().add(wind_only)
+
+    def test_merge_is_exact(self):
+        whole = Climatology().add_many(self.decoders)
+        parts = [Climatology().add_many([decoder]) for decoder in self.decoders]
+        merged = pickle.loads(pickle.dumps(parts[0]))
+        for part in parts[1:]:
+            merged.merge(pickle.loads(pickle.dumps(part)))
+        self.assertEqual(merged, whole)
+        self.assertEqual(list(merged.rows()), list(whole.rows()))
+
+        with self.assertRaises(ValueError):
+            merged.merge(Climatology(max_lead=6))
+
+    def test_accumulators(self):
+        histogram = Histogram(0, 5, 4)
+        for value in (-1, 0, 4.9, 5, 19, 20, 100):
+            histogram.add(value)
+        self.assertEqual(histogram.counts, [1, 2, 1, 0, 1, 2])
+        self.assertEqual(histogram.edges(), [0, 5, 10, 15, 20])
+
+        sketch = QuantileSketch(0.01)
+        values = [100 * (i % 250) for i in range(1000)] + [float("inf")] * 100
+        for value in values:
+            sketch.add(value)
+        values.sort()
+        for q in (0.05, 0.25, 0.5, 0.9):
+            exact = values[int(q * (len(values) - 1))]
+            self.assertLessEqual(abs(sketch.quantile(q) - exact), 0.01 * exact)
+        self.assertEqual(sketch.quantile(0.95), float("inf"))
+        self.assertEqual(sketch.quantile(0), 0)
+        self.assertEqual(sketch.quantile(1), float("inf"))
+        self.assertIsNone(QuantileSketch().quantile(0.5))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+from pytaf.dedup import Deduplicator, fingerprint, NEW, REPEAT, AMENDMENT
+
+
+ORIGINAL = """TAF KMSP 212348Z 2200/2306 11010KT P6SM BKN250 FM220600 11011KT
+  P6SM SCT080 BKN110="""
+
+REWRAPPED = """
+TAF KMSP 212348Z 2200/2306 11010KT P6SM
+   BKN250 FM220600 11011KT P6SM SCT080 BKN110
+"""
+
+AMENDED = """TAF AMD KMSP 220212Z 2202/2306 11010KT P6SM BKN200 FM220600 11011KT
+  P6SM SCT080 BKN110="""
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class DedupTests(unittest.TestCase):
+
+    def test_fingerprint(self):
+        fp = fingerprint(ORIGINAL)
+        self.assertEqual((fp.icao, fp.issued, fp.kind, fp.validity), ("KMSP", "212348Z", None, "2200/2306"))
+        self.assertEqual(fp, fingerprint(REWRAPPED))
+        self.assertEqual(fingerprint(AMENDED).kind, "AMD")
+        self.assertNotEqual(fp, fingerprint(AMENDED))
+
+    def test_classify(self):
+        dedup = Deduplicator()
+        self.assertEqual(dedup.classify(ORIGINAL)[0], NEW)
+        self.assertEqual(dedup.classify(REWRAPPED)[0], REPEAT)
+        status, fp, previous = dedup.classify(AMENDED)
+        self.assertEqual(status, AMENDMENT)
+        self.assertEqual(previous, fingerprint(ORIGINAL))
+        self.assertEqual(list(dedup.filter([ORIGINAL, AMENDED, REWRAPPED])), [])
+
+    def test_expiry_and_bound(self):
+        clock = FakeClock()
+        dedup = Deduplicator(max_size=2, ttl=60, clock=clock)
+        dedup.classify(ORIGINAL)
+        clock.now = 61
+        self.assertEqual(dedup.classify(REWRAPPED)[0], NEW)
+
+        dedup.classify(AMENDED)
+        dedup.classify("TAF KEWR 230232Z 2303/2406 30012G18KT P6SM BKN040=")
+        self.assertEqual(len(dedup), 2)
+        self.assertNotIn(ORIGINAL, dedup)
+
+    def test_repeat_then_expiry(self):
+        # The station's latest fingerprint goes away with the entry it belongs to,
+        # also when repeats refreshed the entry in between
+        clock = FakeClock()
+        dedup = Deduplicator(ttl=60, clock=clock)
+        dedup.classify(ORIGINAL)
+        clock.now = 30
+        self.assertEqual(dedup.classify(REWRAPPED)[0], REPEAT)
+        clock.now = 100
+        dedup.classify("TAF KEWR 230232Z 2303/2406 30012G18KT P6SM BKN040=")
+        self.assertEqual(list(dedup._latest), ["KEWR"])
@@ -0,0 +1,58 @@
+import unittest
+import pytaf
+from datetime import datetime
+
+from pytaf.diff import flatten
+
+
+OLD = """TAF KIAH 230259Z 2303/2406 16010KT P6SM VCSH FEW028 SCT050 BKN250 FM230900
+  18007KT P6SM -RA VCTS SCT015 BKN035CB
+ TEMPO 2311/2314 TSRA FM231600 32010KT P6SM SCT250 FM240000
+  34004KT P6SM SKC="""
+
+NEW = """TAF KIAH 230559Z 2306/2406 16010KT P6SM VCSH FEW028 SCT050 BKN250 FM230900
+  18007KT P6SM -RA VCTS SCT015 BKN008CB
+ TEMPO 2311/2314 TSRA FM231600 32010KT P6SM SCT250 FM240000
+  34004KT P6SM SKC="""
+
+
+def decode(raw, timestamp):
+    return pytaf.Decoder(pytaf.TAF(raw), timestamp)
+
+
+class DiffTests(unittest.TestCase):
+
+    def setUp(self):
+        self.old = decode(OLD, datetime(2016, 11, 23, 2, 59))
+        self.new = decode(NEW, datetime(2016, 11, 23, 5, 59))
+
+    def test_identical(self):
+        self.assertEqual(pytaf.diff_timelines(self.old, self.old), [])
+
+    def test_changed_ceiling(self):
+        changes = pytaf.diff_timelines(self.old, self.new, keys=["ceiling_ft", "weather"], normalized=True)
+        # BKN035CB became BKN008CB under SCT015: the ceiling drops from 3500 to 800 ft.
+        # The TEMPO period inherits the changed clouds, so the ranges coalesce
+        self.assertEqual(changes, [
+            pytaf.TimelineChange(datetime(2016, 11, 23, 9, 0), datetime(2016, 11, 23, 16, 0),
+                                 {"ceiling_ft": (3500, 800)}),
+        ])
+        # The lowest layer is SCT015 in both, the forecast dicts don't show the change
+        self.assertEqual(pytaf.diff_timelines(self.old, self.new, keys=["clouds_ceiling_ft"]), [])
+
+    def test_normalized_units(self):
+        # The same visibility in statute miles and meters only differs in the forecast dicts
+        metric = decode(OLD.replace("TAF KIAH 230259Z", "TAF KIAH 230559Z").replace("2303/2406", "2306/2406")
+                        .replace("16010KT P6SM", "16010KT 9999"), datetime(2016, 11, 23, 5, 59))
+        sm = decode(OLD.replace("TAF KIAH 230259Z", "TAF KIAH 230559Z").replace("2303/2406", "2306/2406")
+                    .replace("16010KT P6SM", "16010KT 1SM"), datetime(2016, 11, 23, 5, 59))
+        self.assertTrue(pytaf.diff_timelines(self.new, metric, keys=["visibility_SM", "visibility_M"]))
+        changes = pytaf.diff_timelines(sm, metric, keys=["visibility_m"], normalized=True)
+        self.assertEqual(changes, [
+            pytaf.TimelineChange(datetime(2016, 11, 23, 6, 0), datetime(2016, 11, 23, 9, 0),
+                                 {"visibility_m": (1609.34, 10000)}),
+        ])
+
+    def test_flatten_follows_get_group(self):
+        for start, end, group in flatten(self.old.groups):
+            self.assertIs(self.old.get_group(start), group)
@@ -0,0 +1,74 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+import pytaf
+from pytaf.differential import Implementation, outcome, compare, minimize, differential, main
+
+
+KDEN = """TAF KDEN 291134Z 2912/3018 32006KT 1/4SM FG OVC001
+     TEMPO 2914/2918 1SM -BR FM291500 04006KT P6SM SKC="""
+
+KMKE = """TAF KMKE 172034Z 1721/1824 14013G19KT P6SM SCT028 BKN035 BKN250
+     FM180100 17008KT P6SM SCT035 BKN120="""
+
+
+class QuarterMileDecoder(pytaf.Decoder):
+
+    def _decode_visibility(self, visibility):
+        if visibility["range"] == "1/4":
+            return "a quarter mile"
+        return pytaf.Decoder._decode_visibility(self, visibility)
+
+
+class DifferentialTests(unittest.TestCase):
+
+    def setUp(self):
+        self.timestamp = datetime(2016, 11, 29)
+        self.reference = Implementation("reference")
+        self.candidate = Implementation("candidate", decoder=QuarterMileDecoder)
+
+    def test_identical(self):
+        count, mismatches = differential([KDEN, KMKE, "garbage"], self.reference,
+                                         Implementation("same"), self.timestamp)
+        self.assertEqual(count, 3)
+        self.assertEqual(mismatches, [])
+        self.assertEqual(outcome(self.reference, "garbage"), {"error": "MalformedTAF: No valid TAF header found"})
+
+    def test_mismatch(self):
+        count, (mismatch,) = differential([KDEN, KMKE], self.reference, self.candidate, self.timestamp)
+        self.assertEqual(mismatch.report, KDEN)
+        self.assertEqual(mismatch.minimized, "TAF KDEN 1/4SM")
+        self.assertEqual([aspect for aspect, description in mismatch.differences], ["text"])
+        self.assertIn("a quarter mile", mismatch.differences[0][1])
+
+    def test_compare_errors(self):
+        self.assertEqual(compare({"error": "MalformedTAF: x"}, {"error": "MalformedTAF: x"}), [])
+        self.assertEqual(compare({"error": "MalformedTAF: x"}, outcome(self.reference, KMKE, self.timestamp)),
+                         [("error", "MalformedTAF: x != <no error>")])
+
+    def test_minimize(self):
+        report = "A B C D E F G H"
+        self.assertEqual(minimize(report, lambda text: "C" in text.split() and "G" in text.split()), "C G")
+        # Whitespace matters, nothing to remove
+        self.assertEqual(minimize("A  B", lambda text: "  " in text), "A  B")
+
+    def test_main(self):
+        directory = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(directory, "tafs.txt"), "w") as f:
+                f.write(KDEN + "\n" + KMKE + "\n")
+            out = io.StringIO()
+            status = main([directory, "-c", "pytaf", "-d", "2016-11", "--repeat", "1"], out)
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(status, 0)
+        self.assertIn("2 reports compared, 0 mismatches", out.getvalue())
+        self.assertIn("reports/s", out.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
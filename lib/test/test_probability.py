@@ -0,0 +1,74 @@
+import unittest
+import pytaf
+from datetime import datetime
+
+from pytaf.probability import BranchTable
+
+
+KDEN = """TAF KDEN 291134Z 2912/3018 32006KT 1/4SM FG OVC001
+     TEMPO 2914/2918 1SM -BR
+     PROB30 2916/2920 VRB20G30KT -TSRA BKN050CB
+     FM291500 04006KT P6SM SKC
+     FM300500 23006KT P6SM SCT120"""
+
+KJFK = """TAF KJFK 291130Z 2912/3018 18010KT P6SM BKN030
+     PROB40 TEMPO 2915/2918 2SM BR OVC008"""
+
+
+class ProbabilityTests(unittest.TestCase):
+
+    def setUp(self):
+        self.kden = pytaf.Decoder(pytaf.TAF(KDEN), datetime(2016, 11, 29, 11, 34))
+        self.kjfk = pytaf.Decoder(pytaf.TAF(KJFK), datetime(2016, 11, 29, 11, 30))
+        self.table = BranchTable([self.kden, self.kjfk])
+
+    def at(self, values, station, hour):
+        for start, end, value in self.table.by_station(values)[station]:
+            if start <= datetime(2016, 11, 29, hour) < end:
+                return value
+
+    def test_branch_forecast(self):
+        prob = [group for group in self.kden.groups if group.type == "PROB30"][0]
+        # The merged forecast keeps the prevailing wind, the branch has the group's own
+        self.assertEqual(prob.forecast["wind_speed_KT"], 6)
+        self.assertEqual(prob.branch_forecast["wind_speed_KT"], 20)
+        self.assertNotIn("sky_clear", prob.branch_forecast)
+        self.assertEqual(prob.branch_forecast["visibility_SM"], 6)
+        self.assertEqual(prob.branch_normalized["ceiling_ft"], 5000)
+
+    def test_expected_values(self):
+        wind = self.table.expected("wind_speed_kt")
+        self.assertAlmostEqual(self.at(wind, "KDEN", 17), 0.3 * 20 + 0.7 * 6)
+        self.assertEqual(self.at(wind, "KDEN", 21), 6)
+
+        visibility = self.table.expected("visibility_m")
+        self.assertAlmostEqual(self.at(visibility, "KJFK", 16), 0.4 * 3218.69 + 0.6 * 9656.06)
+
+        # Without a ceiling in the prevailing branch
+        self.assertEqual(self.at(self.table.expected("ceiling_ft"), "KDEN", 17), 5000)
+        self.assertIsNone(self.at(self.table.expected("ceiling_ft"), "KDEN", 21))
+        self.assertAlmostEqual(self.at(self.table.expected("ceiling_ft", missing=10000), "KDEN", 17),
+                               0.3 * 5000 + 0.7 * 10000)
+
+    def test_exceedance(self):
+        below = self.table.probability("ceiling_ft", "<", 1000)
+        self.assertEqual(self.at(below, "KDEN", 13), 1.0)
+        self.assertEqual(self.at(below, "KDEN", 17), 0.0)
+        self.assertAlmostEqual(self.at(below, "KJFK", 16), 0.4)
+        self.assertEqual(self.at(below, "KJFK", 19), 0.0)
+        self.assertEqual(len(below), len(self.table))
+
+        with self.assertRaises(ValueError):
+            self.table.probability("ceiling_ft", "~", 1000)
+
+    def test_fields_not_decoded(self):
+        # Values of fields left out are unknown, not those of an empty forecast
+        wind_only = pytaf.Decoder(pytaf.TAF(KDEN, fields=["wind"]), datetime(2016, 11, 29, 11, 34))
+        table = BranchTable([wind_only])
+        self.assertEqual(set(table.probability("ceiling_ft", "<", 1000)), set([None]))
+        self.assertEqual(set(table.expected("visibility_m")), set([None]))
+        self.assertEqual(table.expected("wind_speed_kt"), self.table.expected("wind_speed_kt")[:len(table)])
+
+
+if __name__ == '__main__':
+    unittest.main()
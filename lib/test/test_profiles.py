@@ -0,0 +1,67 @@
+import unittest
+import pytaf
+from datetime import datetime
+
+from pytaf import profiles
+
+
+EGLL = """TAF EGLL 291100Z 2912/3018 24010KT 9999 SCT030
+     TEMPO 1518 3000 RA BKN010"""
+
+KDEN = """TAF KDEN 291134Z 2912/3018 32006KT 1/4SM FG OVC001 WS020/27050KT
+     FM291500 04006KT P6SM SKC"""
+
+
+class ProfileTests(unittest.TestCase):
+
+    def test_prefixes(self):
+        self.assertIs(pytaf.TAF(KDEN).profile, profiles.US)
+        self.assertIs(pytaf.TAF(EGLL).profile, profiles.EU)
+        self.assertIs(profiles.profile_for_prefix("PHNL"), profiles.US)
+        self.assertIsNone(profiles.profile_for_prefix("ZBAA"))
+
+    def test_detection(self):
+        self.assertIs(pytaf.TAF("TAF ZBAA 291100Z 2912/3018 24004MPS 6000 BR NSC").profile, profiles.EU)
+        # Nothing is remembered between reports, the same report always gets the same profile
+        report = "TAF ZBAA 291700Z 2918/3024 24004MPS NSC"
+        self.assertIs(pytaf.TAF(report).profile, profiles.DEFAULT)
+
+        overrides = {"ZBAA": "eu", "KDEN": profiles.DEFAULT}
+        self.assertIs(pytaf.TAF(report, profile=overrides).profile, profiles.EU)
+        self.assertIs(pytaf.TAF(KDEN, profile=overrides).profile, profiles.DEFAULT)
+        self.assertIs(pytaf.TAF(EGLL, profile=overrides).profile, profiles.EU)
+        self.assertIs(pytaf.TAF(report).profile, profiles.DEFAULT)
+
+    def test_old_style_tempo_validity(self):
+        tempo = pytaf.TAF(EGLL).get_groups()[1]
+        self.assertEqual(tempo["visibility"], {"range": "3000", "unit": "M"})
+        self.assertIsNone(tempo["windshear"])
+
+        # The default profile still takes the validity for visibility
+        tempo = pytaf.TAF(EGLL, profile="default").get_groups()[1]
+        self.assertEqual(tempo["visibility"]["range"], "1518")
+
+        # Four digits that can't be two hours are a visibility
+        tempo = pytaf.TAF(EGLL.replace("TEMPO 1518 3000 RA", "TEMPO 3000 RA")).get_groups()[1]
+        self.assertEqual(tempo["visibility"], {"range": "3000", "unit": "M"})
+
+    def test_profiles_agree_on_regional_reports(self):
+        for report in (KDEN, EGLL.replace("TEMPO 1518", "TEMPO 2915/2918")):
+            self.assertEqual(pytaf.TAF(report).get_groups(), pytaf.TAF(report, profile="default").get_groups())
+
+        decoder = pytaf.Decoder(pytaf.TAF(KDEN), datetime(2016, 11, 29, 11, 34))
+        self.assertEqual(decoder.groups[0].forecast["windshear"], 1)
+
+    def test_windshear_in_every_profile(self):
+        report = EGLL.replace("SCT030", "SCT030 WS015/25045KT")
+        for profile in profiles.PROFILES:
+            self.assertEqual(pytaf.TAF(report, profile=profile).get_groups()[0]["windshear"],
+                             {"altitude": "015", "direction": "250", "speed": "45", "unit": "KT"})
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ValueError):
+            pytaf.TAF(KDEN, profile="mars")
+
+
+if __name__ == '__main__':
+    unittest.main()
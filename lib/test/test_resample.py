@@ -0,0 +1,52 @@
+import unittest
+import pytaf
+from datetime import datetime, timedelta
+
+
+KDEN = """TAF KDEN 291134Z 2912/3018 32006KT 1/4SM FG OVC001
+     TEMPO 2914/2918 1SM -BR
+     FM291500 04006KT P6SM SKC
+     FM300500 23006KT P6SM SCT120"""
+
+
+class ResampleTests(unittest.TestCase):
+
+    def setUp(self):
+        self.decoder = pytaf.Decoder(pytaf.TAF(KDEN), datetime(2016, 11, 29, 11, 34))
+
+    def test_matches_get_group(self):
+        for step in (5, 15, 60, 47):
+            resampled = self.decoder.resample(step)
+            self.assertEqual(resampled.time(0), self.decoder.start_time)
+            for i in range(len(resampled)):
+                timestamp = resampled.time(i)
+                self.assertEqual(resampled[i], self.decoder.get_group(timestamp).forecast, timestamp)
+
+    def test_runs(self):
+        resampled = self.decoder.resample(timedelta(minutes=15))
+        self.assertEqual(len(resampled), 30 * 4)
+        self.assertEqual(resampled.features["wind_speed_KT"].runs(), [(6, 120)])
+        self.assertEqual(resampled.features["visibility_SM"].runs(), [(0.25, 8), (1, 16), (6, 96)])
+        self.assertEqual(resampled.features["sky_clear"].runs(), [(None, 24), (1, 44), (None, 52)])
+
+        dense = resampled.dense()
+        self.assertEqual(len(dense["wind_dir"]), 120)
+        self.assertEqual(dense["wind_dir"][23:25], [320, 40])
+
+    def test_window_and_index(self):
+        resampled = self.decoder.resample(60, datetime(2016, 11, 29, 10, 0), datetime(2016, 11, 29, 16, 30),
+                                          normalized=True, features=["visibility_m", "ceiling_ft"])
+        self.assertEqual(len(resampled), 7)
+        self.assertEqual(sorted(resampled.features), ["ceiling_ft", "visibility_m"])
+        # Nothing forecast before the validity period
+        self.assertEqual(resampled[0], {})
+        self.assertEqual(resampled[resampled.index(datetime(2016, 11, 29, 12, 59))], {"visibility_m": 402.34,
+                                                                                      "ceiling_ft": 100})
+        self.assertIsNone(resampled.index(datetime(2016, 11, 29, 17, 0)))
+        self.assertEqual(len(resampled.features["ceiling_ft"].to_array()), 7)
+        with self.assertRaises(IndexError):
+            resampled.features["ceiling_ft"][7]
+
+
+if __name__ == '__main__':
+    unittest.main()
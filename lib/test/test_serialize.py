@@ -0,0 +1,51 @@
+import json
+import unittest
+import pytaf
+from datetime import datetime
+
+from pytaf import serialize
+
+
+KEWR = """TAF KEWR 230232Z 2303/2406 30012G18KT P6SM BKN040 -RA FM230400 30011G17KT
+  P6SM SCT040 FM230600 29009KT P6SM SCT040 FM231400 31011G17KT
+  P6SM SKC FM240200 34005KT P6SM BKN250="""
+
+
+class SerializeTests(unittest.TestCase):
+
+    def setUp(self):
+        self.taf = pytaf.TAF(KEWR)
+        self.decoder = pytaf.Decoder(self.taf, datetime(2016, 11, 23, 2, 32))
+
+    def test_document(self):
+        document = json.loads(self.decoder.to_json())
+        self.assertEqual(document["station"], "KEWR")
+        self.assertEqual(document["issued"], "2016-11-23T02:32Z")
+        self.assertEqual(document["valid_till"], "2016-11-24T06:00Z")
+        self.assertEqual(len(document["groups"]), len(self.decoder.groups))
+        self.assertEqual(document["groups"][2]["forecast"], self.decoder.groups[2].forecast)
+        self.assertIs(self.decoder.to_json(), self.decoder.to_json())
+
+        document = json.loads(self.taf.to_json())
+        self.assertEqual(document["header"], self.taf.get_header())
+        self.assertEqual(len(document["groups"]), 5)
+
+    def test_window(self):
+        document = json.loads(self.decoder.to_json(datetime(2016, 11, 23, 5, 0), datetime(2016, 11, 23, 7, 0)))
+        self.assertEqual([g["start"] for g in document["groups"]], ["2016-11-23T04:00Z", "2016-11-23T06:00Z"])
+        document = json.loads(self.decoder.to_json(datetime(2016, 11, 25)))
+        self.assertEqual(document["groups"], [])
+
+    def test_normalized(self):
+        document = json.loads(self.decoder.to_json(normalized=True))
+        self.assertEqual(document["groups"][0]["forecast"]["wind_speed_kt"], 12)
+
+    def test_standard_library_backend(self):
+        backend = serialize.orjson
+        serialize.orjson = None
+        try:
+            fallback = pytaf.Decoder(self.taf, datetime(2016, 11, 23, 2, 32)).to_json()
+        finally:
+            serialize.orjson = backend
+        self.assertIsInstance(fallback, bytes)
+        self.assertEqual(json.loads(fallback), json.loads(self.decoder.to_json()))
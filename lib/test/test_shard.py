@@ -0,0 +1,137 @@
+import multiprocessing
+import random
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from pytaf.shard import HashRing, ShardRouter, ShardError, station_of, _Store
+
+
+REPORT = """TAF %s 291134Z 2912/3018 32006KT P6SM BKN0%02d
+     FM291500 04006KT P6SM SKC"""
+
+
+def station_name(i):
+    return "K" + "".join(chr(ord("A") + (i // 26 ** k) % 26) for k in range(3))
+
+
+class ShardTests(unittest.TestCase):
+
+    def test_hash_ring_moves_few_keys(self):
+        keys = [station_name(i) for i in range(2000)]
+        ring = HashRing(["a", "b", "c", "d"])
+        before = {key: ring.node_for(key) for key in keys}
+        self.assertEqual(set(before.values()), {"a", "b", "c", "d"})
+
+        ring.add("e")
+        after = {key: ring.node_for(key) for key in keys}
+        moved = [key for key in keys if before[key] != after[key]]
+        # Only keys taken over by the new node move, about a fifth of them
+        self.assertTrue(all(after[key] == "e" for key in moved))
+        self.assertLess(len(moved), len(keys) * 0.35)
+
+        ring.remove("e")
+        self.assertEqual({key: ring.node_for(key) for key in keys}, before)
+
+        with self.assertRaises(ShardError):
+            HashRing().node_for("KDEN")
+
+    def test_station_of(self):
+        self.assertEqual(station_of("TAF AMD KDEN 291134Z 2912/3018"), "KDEN")
+        self.assertEqual(station_of("  KJFK 291134Z"), "KJFK")
+        self.assertIsNone(station_of("garbage"))
+
+    def test_router(self):
+        stations = [station_name(i) for i in range(40)]
+        reports = [REPORT % (station, i + 1) for i, station in enumerate(stations)]
+        at = datetime(2016, 11, 29, 13, 0)
+
+        with ShardRouter(shards=3) as router:
+            stored, errors = router.ingest(reports + ["garbage"], datetime(2016, 11, 29, 11, 34))
+            self.assertEqual(stored, 40)
+            self.assertEqual(len(errors), 1)
+
+            held = router.stations()
+            self.assertEqual(sorted(sum(held.values(), [])), sorted(stations))
+            self.assertTrue(all(router.shard_for(s) == name for name, part in held.items() for s in part))
+
+            expected = router.forecast(stations + ["EGLL"], at)
+            self.assertEqual(expected[stations[4]]["clouds_ceiling_ft"], 5)
+            self.assertIsNone(expected["EGLL"])
+            self.assertIn("broken clouds", router.decode_taf([stations[0]])[stations[0]])
+
+            owners = {s: router.shard_for(s) for s in stations}
+            name, moved = router.add_shard()
+            self.assertEqual(moved, sum(1 for s in stations if router.shard_for(s) != owners[s]))
+            self.assertEqual(router.stations()[name], sorted(s for s in stations if router.shard_for(s) == name))
+            self.assertEqual(router.forecast(stations, at), expected_without(expected, "EGLL"))
+
+            moved = router.remove_shard("shard-0")
+            self.assertEqual(len(router.shards), 3)
+            self.assertEqual(sorted(sum(router.stations().values(), [])), sorted(stations))
+            self.assertEqual(router.forecast(stations, at), expected_without(expected, "EGLL"))
+
+            with self.assertRaises(ShardError):
+                router.remove_shard("shard-0")
+
+    def test_moved_reports_keep_their_month(self):
+        # Moved reports are decoded again from their issuance time, not the current one
+        store = _Store()
+        self.assertEqual(store.ingest([(REPORT % ("KDEN", 1), None)]), (1, []))
+        (report, timestamp), = store.export(["KDEN"])
+        self.assertEqual(timestamp, store._stations["KDEN"][2].issued_timestamp)
+
+    def test_dead_shard(self):
+        stations = [station_name(i) for i in range(20)]
+        reports = [REPORT % (station, i + 1) for i, station in enumerate(stations)]
+
+        with ShardRouter(shards=2) as router:
+            shard = router._shards["shard-0"]
+            shard.process.terminate()
+            shard.process.join()
+
+            stored, errors = router.ingest(reports, datetime(2016, 11, 29, 11, 34))
+            lost = [s for s in stations if router.shard_for(s) == "shard-0"]
+            self.assertEqual(stored, len(stations) - len(lost))
+            self.assertEqual(sorted(station_of(report) for report, error in errors), sorted(lost))
+            self.assertEqual(set(error for report, error in errors), {"Shard shard-0 is not running"})
+
+            with self.assertRaises(ShardError):
+                router.forecast(stations, datetime(2016, 11, 29, 13, 0))
+            # The other shard's reply was read, its pipe is still in step
+            other = [s for s in stations if s not in lost]
+            self.assertEqual(sorted(router.forecast(other, datetime(2016, 11, 29, 13, 0))), sorted(other))
+
+    def test_failed_move_keeps_stations(self):
+        # Shards forked from here skip re-ingested reports (moved at their issuance time, 11:34)
+        ingest = _Store.ingest
+
+        def skip_moved(store, items):
+            return ingest(store, [(report, timestamp) for report, timestamp in items if timestamp.minute != 34])
+
+        stations = [station_name(i) for i in range(40)]
+        reports = [REPORT % (station, i + 1) for i, station in enumerate(stations)]
+        at = datetime(2016, 11, 29, 13, 0)
+        with mock.patch.object(_Store, "ingest", skip_moved), \
+                ShardRouter(shards=3, context=multiprocessing.get_context("fork")) as router:
+            self.assertEqual(router.ingest(reports, datetime(2016, 11, 29, 12, 0)), (40, []))
+            held = router.stations()
+            expected = router.forecast(stations, at)
+
+            with self.assertRaises(ShardError):
+                router.add_shard()
+            with self.assertRaises(ShardError):
+                router.remove_shard("shard-0")
+            self.assertEqual(router.shards, ["shard-0", "shard-1", "shard-2"])
+            self.assertEqual(router.stations(), held)
+            self.assertEqual(router.forecast(stations, at), expected)
+
+
+def expected_without(result, station):
+    result = dict(result)
+    del result[station]
+    return result
+
+
+if __name__ == '__main__':
+    unittest.main()
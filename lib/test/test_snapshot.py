@@ -0,0 +1,106 @@
+import multiprocessing
+import os
+import unittest
+import pytaf
+from datetime import datetime
+from multiprocessing import shared_memory
+
+from pytaf.snapshot import SnapshotPublisher, SnapshotReader, SnapshotError
+
+
+KDEN = """TAF KDEN 291134Z 2912/3018 32006KT 1/4SM FG OVC001
+     TEMPO 2914/2918 1SM -BR
+     FM291500 04006KT P6SM SKC
+     FM300500 23006KT P6SM SCT120"""
+
+KJFK = """TAF KJFK 291130Z 2912/3018 18010G20KT P6SM BKN030
+     FM300000 VRB05KT 3SM BR OVC008"""
+
+KJFK_AMD = """TAF AMD KJFK 291300Z 2913/3018 20015KT 2SM -RA OVC005"""
+
+
+def decode(report):
+    return pytaf.Decoder(pytaf.TAF(report), datetime(2016, 11, 29, 11, 34))
+
+
+def read_in_worker(name, queue):
+    reader = SnapshotReader(name)
+    queue.put((reader.generation, reader.stations, reader.get("KJFK", datetime(2016, 11, 30, 1, 0))))
+    reader.close()
+
+
+class SnapshotTests(unittest.TestCase):
+
+    def setUp(self):
+        self.name = "pytaf-test-%d" % os.getpid()
+        self.publisher = SnapshotPublisher(self.name)
+        self.publisher.publish([decode(KDEN), decode(KJFK)])
+
+    def tearDown(self):
+        self.publisher.close()
+
+    def test_read(self):
+        reader = SnapshotReader(self.name)
+        self.assertEqual(reader.generation, 1)
+        self.assertEqual(reader.stations, ["KDEN", "KJFK"])
+
+        kden = reader.station("KDEN")
+        self.assertEqual(len(kden), 4)
+        self.assertEqual(kden.interval(1), (datetime(2016, 11, 29, 14, 0), datetime(2016, 11, 29, 18, 0)))
+
+        values = reader.get("KDEN", datetime(2016, 11, 29, 12, 30))
+        self.assertEqual(values["ceiling_ft"], 100)
+        self.assertEqual(values["wind_speed_kt"], 6)
+        self.assertNotIn("sky_clear", values)
+        self.assertEqual(reader.get("KDEN", datetime(2016, 11, 29, 20, 0))["sky_clear"], 1)
+        self.assertIsNone(reader.get("KDEN", datetime(2016, 12, 2, 0, 0)))
+        self.assertIsNone(reader.get("EGLL", datetime(2016, 11, 29, 12, 30)))
+
+        # memoryviews raise TypeError, NumPy arrays ValueError
+        with self.assertRaises((TypeError, ValueError)):
+            kden.columns["ceiling_ft"][0] = 0
+        reader.close()
+
+    def test_generation_swap(self):
+        reader = SnapshotReader(self.name)
+        kjfk = reader.station("KJFK")
+        self.assertFalse(reader.refresh())
+
+        self.publisher.publish([decode(KDEN), decode(KJFK_AMD)])
+        self.publisher.publish([decode(KJFK_AMD)])
+        self.assertTrue(reader.refresh())
+        self.assertEqual(reader.generation, 3)
+        self.assertEqual(reader.stations, ["KJFK"])
+        self.assertEqual(reader.get("KJFK", datetime(2016, 11, 29, 14, 0))["ceiling_ft"], 500)
+
+        # Views into the old generation stay valid until released
+        self.assertEqual(kjfk.get(datetime(2016, 11, 29, 14, 0))["ceiling_ft"], 3000)
+        del kjfk
+        reader.close()
+
+    def test_worker_process(self):
+        queue = multiprocessing.Queue()
+        worker = multiprocessing.Process(target=read_in_worker, args=(self.name, queue))
+        worker.start()
+        generation, stations, values = queue.get(timeout=30)
+        worker.join()
+        self.assertEqual(generation, 1)
+        self.assertEqual(stations, ["KDEN", "KJFK"])
+        self.assertEqual(values["ceiling_ft"], 800)
+
+        # The worker exiting must not remove the segments
+        with SnapshotReader(self.name) as reader:
+            self.assertEqual(reader.generation, 1)
+
+    def test_not_a_snapshot(self):
+        shm = shared_memory.SharedMemory(name=self.name + "-other", create=True, size=16)
+        try:
+            with self.assertRaises(SnapshotError):
+                SnapshotReader(self.name + "-other")
+        finally:
+            shm.close()
+            shm.unlink()
+
+
+if __name__ == '__main__':
+    unittest.main()
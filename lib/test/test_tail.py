@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pytaf.tail import Tailer
+
+
+KEWR = """TAF KEWR 230232Z 2303/2406 30012G18KT P6SM BKN040 FM230400 30011G17KT
+  P6SM SCT040 FM230600 29009KT P6SM SCT040=
+"""
+
+KIAH = """TAF KIAH 230259Z 2303/2406 16010KT P6SM VCSH FEW028 SCT050 BKN250
+ TEMPO 2311/2314 TSRA FM231600 32010KT P6SM SCT250=
+"""
+
+KDEN = """TAF KDEN 230520Z 2306/2412 32006KT P6SM SKC
+  FM231500 04006KT P6SM SCT120=
+"""
+
+
+class TailTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.log = os.path.join(self.dir, "tafs.log")
+        self.checkpoint = os.path.join(self.dir, "tafs.checkpoint")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def append(self, text, path=None):
+        with open(path or self.log, "a") as f:
+            f.write(text)
+
+    def stations(self, tailer):
+        return [report.split()[1] for path, report in tailer.poll()]
+
+    def test_incremental_reads(self):
+        self.append(KEWR + KIAH[:40])
+        with Tailer([self.log], self.checkpoint) as tailer:
+            self.assertEqual(self.stations(tailer), ["KEWR"])
+            self.assertEqual(self.stations(tailer), [])
+            self.append(KIAH[40:])
+            self.assertEqual(self.stations(tailer), ["KIAH"])
+
+    def test_resume_from_checkpoint(self):
+        self.append(KEWR + KIAH)
+        with Tailer([self.log], self.checkpoint) as tailer:
+            self.assertEqual(self.stations(tailer), ["KEWR", "KIAH"])
+            tailer.commit()
+
+        # A report without "=" is only complete once the next one starts
+        self.append(KDEN.replace("=", ""))
+        with Tailer([self.log], self.checkpoint) as tailer:
+            self.assertEqual(self.stations(tailer), [])
+            tailer.commit()
+
+        self.append(KEWR)
+        with Tailer([self.log], self.checkpoint) as tailer:
+            self.assertEqual(self.stations(tailer), ["KDEN", "KEWR"])
+            # Not committed, handed out again after a restart
+        with Tailer([self.log], self.checkpoint) as tailer:
+            self.assertEqual(self.stations(tailer), ["KDEN", "KEWR"])
+
+    def test_rotation(self):
+        self.append(KEWR)
+        with Tailer([self.log], self.checkpoint) as tailer:
+            self.assertEqual(self.stations(tailer), ["KEWR"])
+            self.append(KIAH.replace("=", ""))
+            os.rename(self.log, self.log + ".1")
+            self.assertEqual(self.stations(tailer), [])
+            self.append(KDEN)
+            # The rest of the old file comes first
+            self.assertEqual(self.stations(tailer), ["KIAH", "KDEN"])
+
+    def test_rotation_while_stopped(self):
+        self.append(KEWR)
+        with Tailer([self.log], self.checkpoint) as tailer:
+            self.assertEqual(self.stations(tailer), ["KEWR"])
+            tailer.commit()
+
+        self.append(KIAH)
+        os.rename(self.log, self.log + ".1")
+        self.append(KDEN)
+        with Tailer([self.log], self.checkpoint) as tailer:
+            self.assertEqual(self.stations(tailer), ["KIAH", "KDEN"])
+
+    def test_truncation(self):
+        self.append(KEWR + KIAH)
+        with Tailer([self.log], self.checkpoint) as tailer:
+            self.assertEqual(self.stations(tailer), ["KEWR", "KIAH"])
+            tailer.commit()
+            with open(self.log, "w") as f:
+                f.write(KDEN)
+            self.assertEqual(self.stations(tailer), ["KDEN"])
+
+        with open(self.log, "w") as f:
+            f.write(KEWR)
+        with Tailer([self.log], self.checkpoint) as tailer:
+            self.assertEqual(self.stations(tailer), ["KEWR"])
+
+    def test_multiple_files(self):
+        other = os.path.join(self.dir, "other.log")
+        self.append(KEWR)
+        with Tailer([self.log, other], self.checkpoint) as tailer:
+            self.assertEqual(self.stations(tailer), ["KEWR"])
+            self.append(KIAH, other)
+            result = tailer.poll()
+            self.assertEqual([path for path, report in result], [other])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import random
+import unittest
+import pytaf
+from datetime import datetime, timedelta
+
+from pytaf.timeline import IntervalTree, Segment
+
+
+KDEN = """TAF KDEN 291134Z 2912/3018 32006KT 1/4SM FG OVC001
+     TEMPO 2914/2918 1SM -BR
+     PROB30 2916/2920 VRB20G30KT -TSRA BKN050CB
+     FM291500 04006KT P6SM SKC
+     BECMG 2922/2924 24010KT
+     FM300500 23006KT P6SM SCT120"""
+
+
+class TimelineTests(unittest.TestCase):
+
+    def setUp(self):
+        self.decoder = pytaf.Decoder(pytaf.TAF(KDEN), datetime(2016, 11, 29, 11, 34))
+        self.timeline = pytaf.Timeline(self.decoder)
+
+    def test_base_layer(self):
+        base = [(s.start.hour, s.end.hour, s.group.type) for s in self.timeline.base]
+        self.assertEqual(base, [(12, 15, "MAIN"), (15, 0, "FM"), (0, 5, "BECMG"), (5, 18, "FM")])
+
+    def test_stabbing(self):
+        base, overlays = self.timeline.at(datetime(2016, 11, 29, 17, 0))
+        self.assertEqual(base.group.type, "FM")
+        self.assertEqual([o.layer for o in overlays], ["TEMPO", "PROB"])
+        self.assertEqual(overlays[1].probability, 30)
+
+        base, overlays = self.timeline.at(datetime(2016, 11, 29, 23, 0))
+        self.assertEqual([o.layer for o in overlays], ["BECMG"])
+        self.assertEqual(len(self.timeline.transitions()), 1)
+
+    def test_range(self):
+        base, overlays = self.timeline.between(datetime(2016, 11, 29, 13, 0), datetime(2016, 11, 29, 16, 0))
+        self.assertEqual([s.group.type for s in base], ["MAIN", "FM"])
+        self.assertEqual([o.layer for o in overlays], ["TEMPO"])
+
+    def test_interval_tree_matches_linear_scan(self):
+        rng = random.Random(7)
+        origin = datetime(2016, 1, 1)
+        segments = []
+        for i in range(200):
+            start = rng.randint(0, 500)
+            segments.append(Segment(origin + timedelta(hours=start),
+                                    origin + timedelta(hours=start + rng.randint(1, 30)), None, "TEMPO"))
+        tree = IntervalTree(segments)
+        for i in range(200):
+            a = origin + timedelta(hours=rng.randint(-10, 540))
+            b = a + timedelta(hours=rng.randint(1, 20))
+            expected = set(id(s) for s in segments if s.start <= a < s.end)
+            self.assertEqual(set(id(s) for s in tree.stab(a)), expected)
+            expected = set(id(s) for s in segments if s.start < b and s.end > a)
+            self.assertEqual(set(id(s) for s in tree.overlap(a, b)), expected)
@@ -10,6 +10,9 @@ setup(name='pytaf',
       license='MIT',
       package_dir={'': 'lib'},
       packages=['pytaf'],
+      entry_points={
+          'console_scripts': ['pytaf = pytaf.cli:main'],
+      },
       zip_safe=True,
       classifiers = [
                         "Development Status :: 5 - Production/Stable",